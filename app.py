@@ -13,9 +13,23 @@ from leftoverreport import leftover_report_content
 # Import Uvicorn for running the FastAPI app
 import uvicorn
 # Import FastAPI for creating the backend API
-from fastapi import FastAPI
-from fastapi.responses import RedirectResponse, FileResponse, Response
+from fastapi import FastAPI, Header, HTTPException, Query, Request
+from fastapi.responses import RedirectResponse, FileResponse, Response, PlainTextResponse, StreamingResponse
 import os
+import asyncio
+import contextlib
+from utils.metrics import render_metrics
+from utils import profiler
+from utils import memory
+from utils import image_cache
+from utils import snapshots
+from utils.stock_ledger import site_ledger
+from utils import sites
+from utils.site_rollup import rollup
+from utils import export
+from utils.sales_import import parse_batch, import_sales
+from utils import weather_provider
+from utils import retention
 from testdatagen import test_data_gen_content
 from salesdetails import sales_details_content
 from weather import weather_page
@@ -23,8 +37,21 @@ from social_trends import social_trends_page
 from prediction import food_demand_prediction_page
 from current_day_sales import current_day_sales_page  # Import the new page
 
+# Keep the cached weather forecast fresh (and history compacted) in the background while the server runs
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    tasks = [asyncio.create_task(weather_provider.run_refresher())]
+    # Compact old sales and leftover history into rollups every ZEROBITE_COMPACT_EVERY_HOURS hours
+    if retention.COMPACT_EVERY_HOURS > 0:
+        tasks.append(asyncio.create_task(retention.run_compactor()))
+    try:
+        yield
+    finally:
+        for task in tasks:
+            task.cancel()
+
 # Create a FastAPI application instance
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Serve the favicon.ico using the same app logo
 @app.get("/favicon.ico", include_in_schema=False)
@@ -34,6 +61,152 @@ async def favicon():
         return FileResponse(path)
     return Response(status_code=204)  # No Content if favicon is missing
 
+# Expose per-handler latency histograms, error and row counters for Prometheus
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+# Admin routes are open unless ZEROBITE_ADMIN_TOKEN is set, then the X-Admin-Token header must match
+def require_admin(token):
+    expected = os.environ.get("ZEROBITE_ADMIN_TOKEN")
+    if expected and token != expected:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+# Show which handlers are being profiled and the latest profile files
+@app.get("/admin/profiling", include_in_schema=False)
+async def get_profiling(x_admin_token: str = Header(None)):
+    require_admin(x_admin_token)
+    return profiler.settings()
+
+# Switch profiling on/off at runtime, e.g. {"handlers": ["prediction.sample_prediction_model"], "rate": 0.05}
+@app.post("/admin/profiling", include_in_schema=False)
+async def set_profiling(settings: dict, x_admin_token: str = Header(None)):
+    require_admin(x_admin_token)
+    try:
+        rate = float(settings["rate"]) if "rate" in settings else None  # "abc" or null -> 400, not 500
+        profiler.configure(settings.get("handlers", []), rate, settings.get("mode"))
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return profiler.settings()
+
+# Retained bytes, peak memory and top allocation sites per handler, plus live matplotlib figures
+@app.get("/admin/memory", include_in_schema=False)
+def get_memory(top: int = 15, x_admin_token: str = Header(None)):
+    require_admin(x_admin_token)
+    return memory.report(top)
+
+# Switch memory diagnostics on/off at runtime, e.g. {"enabled": true, "frames": 25, "reset": true}
+@app.post("/admin/memory", include_in_schema=False)
+def set_memory(settings: dict, x_admin_token: str = Header(None)):
+    require_admin(x_admin_token)
+    try:
+        memory.configure(settings.get("enabled", True), settings.get("frames"))
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if settings.get("reset"):
+        memory.reset()
+    return memory.report(0)
+
+# List the published data snapshots and the one readers currently see
+@app.get("/admin/snapshots", include_in_schema=False)
+async def get_snapshots(x_admin_token: str = Header(None)):
+    require_admin(x_admin_token)
+    return {"current": snapshots.current_version(), "versions": snapshots.list_versions()}
+
+# Point readers back at the previous snapshot
+@app.post("/admin/snapshots/rollback", include_in_schema=False)
+async def rollback_snapshot(x_admin_token: str = Header(None)):
+    require_admin(x_admin_token)
+    try:
+        return {"current": snapshots.rollback()}
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+# Move sales and leftover history older than the detail window into daily/weekly/monthly rollups now
+@app.post("/admin/retention/compact", include_in_schema=False)
+def compact_history(site: str = None, x_admin_token: str = Header(None)):
+    require_admin(x_admin_token)
+    try:
+        root = sites.site_root(site)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return {"site": site or sites.DEFAULT_SITE, **retention.compact(root)}
+
+# Record one POS sale, e.g. {"menuitem": "Fish and Chips", "quantity": 2, "site": "hive-kitchen"}; updates Current Day Sales live
+@app.post("/api/sales/event")
+def record_sale_event(event: dict):
+    try:
+        remaining = site_ledger(sites.site_root(event.get("site"))).record_sale(event["menuitem"], int(event["quantity"]), event.get("date"))
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"menuitem": event["menuitem"], "remaining_stock": remaining}
+
+# Bulk import POS sale lines; the body is CSV or JSONL (format=csv|jsonl, default from the Content-Type).
+# Valid lines are merged into sales.json as one snapshot; the response lists every rejected line and why.
+@app.post("/api/sales/import")
+async def import_sales_batch(request: Request, format: str = None, site: str = None, dry_run: bool = False):
+    fmt = format or ("jsonl" if "json" in request.headers.get("content-type", "") else "csv")
+    body = await request.body()
+    try:
+        root = sites.site_root(site)
+        batch = parse_batch(body, fmt)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # Validation and the merge are CPU bound; keep them off the event loop
+    return await asyncio.to_thread(import_sales, batch, root, dry_run)
+
+# Select the site a browser works on, e.g. /site?name=hive-kitchen; every page then reads that site's data
+@app.get("/site", include_in_schema=False)
+async def select_site(name: str, request: Request):
+    if name not in sites.list_sites():
+        raise HTTPException(status_code=404, detail=f"Unknown site {name!r}")
+    response = RedirectResponse(url=request.headers.get("referer") or "/", status_code=303)
+    response.set_cookie(sites.SITE_COOKIE, name, max_age=365 * 24 * 60 * 60, samesite="lax")
+    return response
+
+# Sales, waste and forecast demand per site plus an all-sites total
+@app.get("/api/sites/rollup")
+def sites_rollup():
+    return rollup().to_dict(orient="records")
+
+# Stream flattened sales, leftover or forecast rows as CSV/JSONL, e.g.
+# /api/export/sales?format=csv&gzip=true&start=2025-01-01&end=2025-01-31&item=Fish%20and%20Chips&site=hive-kitchen
+@app.get("/api/export/{dataset}")
+def export_data(dataset: str, format: str = "csv", gzip: bool = False, start: str = None, end: str = None,
+                item: list[str] = Query(None), site: str = None):
+    if format not in export.FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown format {format!r}")
+    try:
+        columns, rows = export.rows(dataset, sites.site_root(site), start, end, item)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    filename = f"{dataset}-{site or sites.DEFAULT_SITE}.{format}" + (".gz" if gzip else "")
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    media_type = "application/gzip" if gzip else export.FORMATS[format]
+    return StreamingResponse(export.stream(columns, rows, format, gzip), media_type=media_type, headers=headers)
+
+# Image proxy: /img?src=<remote url> fetches and thumbnails the image once, then redirects to the
+# cached copy; cached copies are named by content hash, so browsers may keep them forever
+@app.get("/img", include_in_schema=False)
+def image_proxy(src: str):
+    try:
+        name = image_cache.thumbnail(src)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except OSError:
+        # Origin unreachable (e.g. offline): serve a local stand-in and let the browser retry later
+        return Response(image_cache.render_stand_in(src), media_type="image/png", headers={"Cache-Control": "public, max-age=300"})
+    return RedirectResponse(url=f"/img/{name}", status_code=302, headers={"Cache-Control": "public, max-age=86400"})
+
+@app.get("/img/{name}", include_in_schema=False)
+def cached_image(name: str):
+    path = image_cache.cached_path(name)
+    if path is None or not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Image not found")
+    return FileResponse(path, media_type="image/png", headers={"Cache-Control": "public, max-age=31536000, immutable"})
+
 # Add a start page route that redirects to /inventory
 @app.get("/", include_in_schema=False)
 async def startpage():
@@ -74,4 +247,4 @@ app = gr.mount_gradio_app(app, current_day_sales_app, path="/current_day_sales")
 
 # Run the FastAPI app with Uvicorn if this file is executed directly
 if __name__ == "__main__":
-    uvicorn.run(app, host="127.0.0.1", port=7860)
\ No newline at end of file
+    uvicorn.run(app, host="127.0.0.1", port=int(os.environ.get("ZEROBITE_PORT", "7860")))
\ No newline at end of file
@@ -0,0 +1,197 @@
+import argparse   # Import argparse for the command line options
+import contextlib # Import contextlib to silence handler output while timing
+import gc         # Import gc to collect garbage between timed calls
+import io         # Import io as the sink for handler output
+import json       # Import json to write results and read the baseline
+import os         # Import os for paths and the CPU count
+import platform   # Import platform to record where the numbers came from
+import shutil     # Import shutil to copy fixtures and remove temp data
+import sys        # Import sys to import the app modules and set the exit status
+import tempfile   # Import tempfile for the generated datasets
+import time       # Import time for high resolution timers
+import tracemalloc  # Import tracemalloc to measure peak memory per handler
+from datetime import datetime  # Import datetime to stamp the results
+
+os.environ.setdefault("MPLBACKEND", "Agg")  # Render plots off-screen
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import numpy as np   # Import NumPy for percentiles
+import matplotlib.pyplot as plt  # Import matplotlib to free figures between calls
+from utils import snapshots  # Point every loader at the generated dataset
+from testdatagen import generate_test_data
+from inventorylist import load_data
+from menuitems import load_menu
+from leftoverreport import load_leftover, plot_loss_per_item, plot_loss_by_date, loss_by_date_stack
+from salesdetails import load_sales_details, plot_quantity_trend
+from salesreport import sales_charts, plot_pie, plot_bar, plot_trending_day
+from current_day_sales import calculate_remaining_items
+from prediction import sample_prediction_model
+from weather import load_weather_data, plot_weather_graph
+from social_trends import load_trends_data, plot_trend_graph
+from utils.waste_cube import waste_cube
+from utils.sales_windows import site_windows, WINDOWS
+
+# Dataset sizes in sale lines: (days, catalog items, items prepared per day, POS lines per item).
+# Lines per item are split randomly and empty lines are dropped, so counts land slightly under the target.
+SIZES = {
+    "1k": (50, 20, 20, 1),
+    "100k": (334, 100, 100, 3),
+    "1M": (1000, 200, 200, 5),
+}
+SEED = 20250506
+FIXTURES = ["weather.json", "trends.json"]  # Copied from data/ so the forecast and trend pages have inputs
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+REGRESSION_THRESHOLD = 0.25  # p50 slower than the baseline by more than this fraction is a regression
+NOISE_FLOOR_MS = 2.0         # Differences below this are never reported
+
+def handlers():
+    # (name, setup, call): setup runs untimed and returns the call's arguments,
+    # so plot functions are timed on the same inputs their pages build
+    def sales_items():
+        # Daily totals and per-item totals of the longest window, as the Sales page plots them
+        windows = site_windows()
+        windows.ensure_current()
+        return windows.window(WINDOWS[-1])
+
+    return [
+        ("inventorylist.load_data", lambda: (), load_data),
+        ("menuitems.load_menu", lambda: (), load_menu),
+        ("leftoverreport.load_leftover", lambda: (), load_leftover),
+        ("salesdetails.load_sales_details", lambda: (), load_sales_details),
+        *[(f"salesreport.sales_charts[{w}]", lambda w=w: (w,), sales_charts) for w in WINDOWS],
+        ("current_day_sales.calculate_remaining_items", lambda: (), calculate_remaining_items),
+        ("prediction.sample_prediction_model", lambda: (7,), sample_prediction_model),
+        ("salesreport.plot_pie", lambda: (sales_items()[1],), plot_pie),
+        ("salesreport.plot_bar", lambda: (sales_items()[1].sort_values("quantity_sold", ascending=False).head(5),), plot_bar),
+        ("salesreport.plot_trending_day", lambda: (sales_items()[0],), plot_trending_day),
+        ("salesdetails.plot_quantity_trend", lambda: (load_sales_details()[3],), plot_quantity_trend),
+        ("leftoverreport.plot_loss_per_item", lambda: (waste_cube().per_item(),), plot_loss_per_item),
+        ("leftoverreport.plot_loss_by_date", lambda: (loss_by_date_stack(),), plot_loss_by_date),
+        ("weather.plot_weather_graph", lambda: (load_weather_data(),), plot_weather_graph),
+        ("social_trends.plot_trend_graph", lambda: (load_trends_data(), "Facebook"), plot_trend_graph),
+    ]
+
+def generate(size, root):
+    # Generate a dataset into `root` with the test data generator; returns (seconds, sale lines)
+    days, items, items_per_day, lines_per_item = SIZES[size]
+    for name in FIXTURES:
+        shutil.copy(os.path.join(REPO_DIR, "data", name), os.path.join(root, name))
+    start = time.perf_counter()
+    message = generate_test_data(days, items, items_per_day, lines_per_item, seed=SEED, data_root=root)
+    seconds = time.perf_counter() - start
+    if message.startswith("Error"):
+        raise RuntimeError(message)
+    return seconds, int(message.split(" sale lines")[0].split()[-1])
+
+def measure(call, args, repeat):
+    # One cold call, one traced call for peak memory, then `repeat` timed warm calls
+    sink = io.StringIO()
+    with contextlib.redirect_stdout(sink):
+        start = time.perf_counter()
+        call(*args)
+        cold = time.perf_counter() - start
+        plt.close("all")
+        tracemalloc.start()
+        call(*args)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        plt.close("all")
+        times = []
+        for _ in range(repeat):
+            gc.collect()  # Garbage of earlier calls (closed figures) is not collected during this one
+            start = time.perf_counter()
+            call(*args)
+            times.append(time.perf_counter() - start)
+            plt.close("all")
+    p50, p90, p99 = np.percentile(times, [50, 90, 99]) * 1000
+    return {
+        "cold_ms": round(cold * 1000, 2),
+        "p50_ms": round(p50, 2),
+        "p90_ms": round(p90, 2),
+        "p99_ms": round(p99, 2),
+        "max_ms": round(max(times) * 1000, 2),
+        "peak_mb": round(peak / 1e6, 2),
+    }
+
+def run_size(size, repeat, only):
+    root = tempfile.mkdtemp(prefix=f"zerobite-bench-{size}-")
+    try:
+        generate_s, lines = generate(size, root)
+        print(f"[{size}] generated {lines} sale lines in {generate_s:.1f}s", file=sys.stderr)
+        results = {}
+        with snapshots.using_root(root), snapshots.pinned(root):
+            for name, setup, call in handlers():
+                if only and not any(part in name for part in only):
+                    continue
+                with contextlib.redirect_stdout(io.StringIO()):
+                    args = setup()
+                results[name] = measure(call, args, repeat)
+                print(f"[{size}] {name}: p50 {results[name]['p50_ms']} ms, peak {results[name]['peak_mb']} MB", file=sys.stderr)
+        return {"sale_lines": lines, "generate_s": round(generate_s, 2), "handlers": results}
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+def compare(results, baseline, threshold):
+    # Rows of (size, handler, baseline p50, p50, ratio) for handlers slower than the baseline by more than `threshold`
+    regressions = []
+    for size, current in results["sizes"].items():
+        base_size = baseline.get("sizes", {}).get(size, {}).get("handlers", {})
+        for name, stats in current["handlers"].items():
+            base = base_size.get(name)
+            if base is None:
+                continue
+            slower = stats["p50_ms"] - base["p50_ms"]
+            if slower > NOISE_FLOOR_MS and stats["p50_ms"] > base["p50_ms"] * (1 + threshold):
+                regressions.append((size, name, base["p50_ms"], stats["p50_ms"], stats["p50_ms"] / base["p50_ms"]))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time page loaders, handlers and plots on generated datasets")
+    parser.add_argument("--sizes", default="1k,100k", help=f"Comma-separated dataset sizes from {list(SIZES)}")
+    parser.add_argument("--repeat", type=int, default=5, help="Warm calls timed per handler")
+    parser.add_argument("--only", default="", help="Comma-separated substrings of handler names to run")
+    parser.add_argument("--output", help="Write the results JSON here (default: stdout)")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="Baseline results to compare against")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD, help="Allowed p50 slowdown (0.25 = 25%%)")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline")
+    args = parser.parse_args(argv)
+
+    sizes = [s for s in args.sizes.split(",") if s]
+    unknown = [s for s in sizes if s not in SIZES]
+    if unknown:
+        parser.error(f"Unknown sizes {unknown}; choose from {list(SIZES)}")
+    only = [s for s in args.only.split(",") if s]
+    results = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()}, {os.cpu_count()} CPUs",
+        "repeat": args.repeat,
+        "sizes": {size: run_size(size, args.repeat, only) for size in sizes},
+    }
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("No baseline to compare against; run with --save-baseline to store one.", file=sys.stderr)
+        return 0
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.threshold)
+    for size, name, base, now, ratio in regressions:
+        print(f"REGRESSION [{size}] {name}: p50 {base} ms -> {now} ms ({ratio:.2f}x)", file=sys.stderr)
+    if not regressions:
+        print("No regressions against the baseline.", file=sys.stderr)
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,302 @@
+import argparse   # Import argparse for the command line options
+import asyncio    # Import asyncio to run many sessions in one process
+import json       # Import json for queue messages and the results
+import os         # Import os for paths and the server environment
+import random     # Import random for think times and session choices
+import shutil     # Import shutil to copy the data directory
+import subprocess # Import subprocess to start app.py
+import sys        # Import sys for the interpreter and exit status
+import tempfile   # Import tempfile for the server's data copy
+import time       # Import time for latency measurements
+import uuid       # Import uuid for session hashes
+from datetime import datetime  # Import datetime to stamp the results
+import httpx      # Import httpx for async HTTP and the queue event stream
+import numpy as np  # Import NumPy for percentiles
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_PATHS = ["/inventory", "/salesdetails", "/leftover", "/prediction"]
+QUEUE_API = "/gradio_api/queue"
+INPUT_TYPES = {"textbox", "number", "dropdown", "slider", "checkbox"}  # Components whose values a session tracks
+
+# What a simulated user does on each page: (component label, event, value). Typing sends one change
+# per keystroke; "$date" picks a random date from the dropdown; buttons are matched by their text.
+SCENARIOS = {
+    "/inventory": [
+        ("Filter by Material or Type", "change", "V"),
+        ("Filter by Material or Type", "change", "Ve"),
+        ("Filter by Material or Type", "change", "Veg"),
+        ("Page", "change", 2),
+        ("Page", "change", 3),
+        ("Filter by Material or Type", "change", ""),
+        ("Expiring within (days)", "change", 14),
+    ],
+    "/salesdetails": [
+        ("Search by Menu Item", "change", "P"),
+        ("Search by Menu Item", "change", "Pa"),
+        ("Search by Menu Item", "change", "Pas"),
+        ("Filter by Date", "change", "$date"),
+        ("Page", "change", 2),
+        ("Search by Menu Item", "change", ""),
+    ],
+    "/leftover": [
+        ("Filter by Menu Item or Reason", "change", "S"),
+        ("Filter by Menu Item or Reason", "change", "Sp"),
+        ("Filter by Date", "change", "$date"),
+        ("Page", "change", 2),
+        ("Filter by Menu Item or Reason", "change", ""),
+    ],
+    "/prediction": [
+        ("Forecast Days", "change", 7),
+        ("Predict Demand", "click", None),
+    ],
+}
+
+class Page:
+    # A mounted Gradio app's config: components by label and event listeners by trigger
+    def __init__(self, path, config):
+        self.path = path
+        self.components = {c["id"]: c for c in config["components"]}
+        self.dependencies = config["dependencies"]
+        self.labels = {}
+        for component in config["components"]:
+            props = component.get("props", {})
+            label = props.get("label") or (props.get("value") if component["type"] == "button" else None)
+            if isinstance(label, str):
+                self.labels.setdefault(label, component["id"])
+
+    def initial_values(self):
+        return {
+            cid: c.get("props", {}).get("value")
+            for cid, c in self.components.items() if c["type"] in INPUT_TYPES
+        }
+
+    def listeners(self, component_id, event):
+        return [d for d in self.dependencies if [component_id, event] in [list(t) for t in d["targets"]]]
+
+    def load_listeners(self):
+        # Events a browser runs when the page opens (skipping the ones that are also timer ticks)
+        return [d for d in self.dependencies if any(t[1] == "load" for t in d["targets"]) and not any(t[1] == "tick" for t in d["targets"])]
+
+    def choices(self, component_id):
+        values = [c[1] if isinstance(c, (list, tuple)) else c for c in self.components[component_id].get("props", {}).get("choices", [])]
+        return [v for v in values if v] or [None]
+
+def endpoint_name(page, dependency):
+    return f"{page.path}:{dependency.get('api_name') or dependency['id']}"
+
+async def fire(client, page, session_hash, dependencies, values, trigger_id, stats):
+    # Join the queue with each listener's inputs, then follow the session's event stream until all complete
+    pending = {}
+    for dependency in dependencies:
+        data = [values.get(cid) if cid in values else None for cid in dependency["inputs"]]
+        sent = time.perf_counter()
+        response = await client.post(f"{page.path}{QUEUE_API}/join", json={
+            "data": data, "fn_index": dependency["id"], "session_hash": session_hash,
+            "trigger_id": trigger_id, "event_data": None,
+        })
+        name = endpoint_name(page, dependency)
+        if response.status_code != 200:
+            stats.setdefault(name, []).append({"error": f"HTTP {response.status_code}"})
+            continue
+        pending[response.json()["event_id"]] = {"name": name, "sent": sent, "started": None, "dependency": dependency}
+    if not pending:
+        return
+    async with client.stream("GET", f"{page.path}{QUEUE_API}/data", params={"session_hash": session_hash}) as stream:
+        async for line in stream.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            message = json.loads(line[5:])
+            event = pending.get(message.get("event_id"))
+            if message.get("msg") == "close_stream":
+                break
+            if event is None:
+                continue
+            now = time.perf_counter()
+            if message["msg"] == "process_starts":
+                event["started"] = now
+            elif message["msg"] in ("process_completed", "unexpected_error"):
+                ok = message.get("success", False)
+                sample = {
+                    "latency": now - event["sent"],
+                    "queue_wait": (event["started"] or now) - event["sent"],
+                }
+                if not ok:
+                    sample["error"] = str(message.get("output", {}).get("error") or message.get("message"))[:200]
+                stats.setdefault(event["name"], []).append(sample)
+                if ok:
+                    _apply_outputs(event["dependency"], message["output"].get("data", []), values)
+                del pending[message["event_id"]]
+                if not pending:
+                    break
+
+def _apply_outputs(dependency, outputs, values):
+    # Keep tracked input values in sync with what handlers send back (e.g. a page reset to 1,
+    # or a new last page, kept under the "<id>:maximum" key so the session never pages past it)
+    for cid, output in zip(dependency["outputs"], outputs):
+        if cid not in values:
+            continue
+        if isinstance(output, dict) and output.get("__type__") == "update":
+            if "value" in output:
+                values[cid] = output["value"]
+            if "maximum" in output:
+                values[f"{cid}:maximum"] = output["maximum"]
+        elif not isinstance(output, dict):
+            values[cid] = output
+
+async def session(client, page, deadline, think, stats):
+    # One simulated browser: open the page, then repeat the page's scenario until the deadline
+    session_hash = uuid.uuid4().hex[:11]
+    values = page.initial_values()
+    await fire(client, page, session_hash, page.load_listeners(), values, None, stats)
+    while time.perf_counter() < deadline:
+        for label, event, value in SCENARIOS[page.path]:
+            if time.perf_counter() >= deadline:
+                return
+            component_id = page.labels.get(label)
+            if component_id is None:
+                continue
+            if value == "$date":
+                value = random.choice(page.choices(component_id))
+            maximum = values.get(f"{component_id}:maximum", page.components[component_id].get("props", {}).get("maximum"))
+            if isinstance(value, (int, float)) and maximum is not None:
+                value = min(value, maximum)  # Like the UI, which won't accept a page past the last one
+            if component_id in values:
+                values[component_id] = value
+            listeners = page.listeners(component_id, event)
+            await fire(client, page, session_hash, listeners, values, component_id, stats)
+            await asyncio.sleep(random.uniform(0, 2 * think))
+
+def summarize(stats, seconds):
+    # Per endpoint: calls, errors, throughput, latency and queue wait percentiles (ms)
+    summary = {}
+    for name, samples in sorted(stats.items()):
+        ok = [s for s in samples if "error" not in s]
+        latency = np.array([s["latency"] for s in ok]) * 1000
+        wait = np.array([s["queue_wait"] for s in ok]) * 1000
+        entry = {"calls": len(samples), "errors": len(samples) - len(ok), "throughput_per_s": round(len(ok) / seconds, 2)}
+        if len(ok):
+            entry.update({
+                "latency_p50_ms": round(float(np.percentile(latency, 50)), 1),
+                "latency_p95_ms": round(float(np.percentile(latency, 95)), 1),
+                "latency_p99_ms": round(float(np.percentile(latency, 99)), 1),
+                "latency_max_ms": round(float(latency.max()), 1),
+                "queue_wait_p50_ms": round(float(np.percentile(wait, 50)), 1),
+                "queue_wait_p95_ms": round(float(np.percentile(wait, 95)), 1),
+            })
+        errors = [s["error"] for s in samples if "error" in s]
+        if errors:
+            entry["first_error"] = errors[0]
+        summary[name] = entry
+    return summary
+
+async def run_level(base_url, pages, sessions, duration, think):
+    # `sessions` concurrent users spread round-robin over the pages for `duration` seconds
+    stats = {}
+    limits = httpx.Limits(max_connections=sessions * 2 + 10)
+    async with httpx.AsyncClient(base_url=base_url, timeout=httpx.Timeout(300.0), limits=limits) as client:
+        start = time.perf_counter()
+        deadline = start + duration
+        await asyncio.gather(*(session(client, pages[i % len(pages)], deadline, think, stats) for i in range(sessions)))
+        elapsed = time.perf_counter() - start
+    return {"sessions": sessions, "seconds": round(elapsed, 1), "endpoints": summarize(stats, elapsed)}
+
+async def load_pages(base_url, paths):
+    async with httpx.AsyncClient(base_url=base_url, timeout=60.0) as client:
+        pages = []
+        for path in paths:
+            response = await client.get(f"{path}/config")
+            response.raise_for_status()
+            pages.append(Page(path, response.json()))
+        return pages
+
+def _published_only(directory, names):
+    # copytree filter: of each site's snapshots/ copy only the CURRENT pointer and the snapshot it
+    # names, so the server reads the data published now (not the base files) without every older
+    # snapshot kept for rollback
+    if os.path.basename(directory) != "snapshots":
+        return []
+    try:
+        with open(os.path.join(directory, "CURRENT"), "r", encoding="utf-8") as f:
+            current = f.read().strip()
+    except FileNotFoundError:
+        return names  # Nothing published yet: the base files are current
+    return [name for name in names if name not in ("CURRENT", current)]
+
+def start_server(port, data_dir):
+    # Run app.py on a copy of the data so forecasts and live updates never touch the real files
+    env = dict(os.environ, ZEROBITE_PORT=str(port), ZEROBITE_DATA_DIR=data_dir, MPLBACKEND="Agg")
+    process = subprocess.Popen([sys.executable, "app.py"], cwd=REPO_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(240):
+        if process.poll() is not None:
+            raise RuntimeError(f"app.py exited with status {process.returncode}")
+        try:
+            if httpx.get(f"{url}/inventory/config", timeout=2.0).status_code == 200:
+                return process, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError("app.py did not start within 2 minutes")
+
+def print_table(levels):
+    header = f"{'sessions':>8}  {'endpoint':<40} {'calls':>6} {'err':>4} {'req/s':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'wait95':>8}"
+    print(header, file=sys.stderr)
+    for level in levels:
+        for name, e in level["endpoints"].items():
+            print(
+                f"{level['sessions']:>8}  {name:<40} {e['calls']:>6} {e['errors']:>4} {e['throughput_per_s']:>7} "
+                f"{e.get('latency_p50_ms', '-'):>8} {e.get('latency_p95_ms', '-'):>8} {e.get('latency_p99_ms', '-'):>8} "
+                f"{e.get('queue_wait_p95_ms', '-'):>8}",
+                file=sys.stderr
+            )
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Drive concurrent simulated dashboard sessions through the Gradio queue API")
+    parser.add_argument("--concurrency", default="1,5,10,25", help="Comma-separated session counts, run in order")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds per concurrency level")
+    parser.add_argument("--think", type=float, default=0.5, help="Mean seconds a user waits between actions")
+    parser.add_argument("--paths", default=",".join(DEFAULT_PATHS), help="Mounted pages to exercise")
+    parser.add_argument("--url", help="Test an already running server instead of starting app.py")
+    parser.add_argument("--port", type=int, default=7870, help="Port for the app.py started by the harness")
+    parser.add_argument("--data-dir", default=os.path.join(REPO_DIR, "data"), help="Data copied for the started server")
+    parser.add_argument("--output", help="Write the results JSON here (default: stdout)")
+    args = parser.parse_args(argv)
+
+    paths = [p for p in args.paths.split(",") if p]
+    unknown = [p for p in paths if p not in SCENARIOS]
+    if unknown:
+        parser.error(f"No scenario for {unknown}; choose from {list(SCENARIOS)}")
+    process = data_copy = None
+    try:
+        if args.url:
+            url = args.url.rstrip("/")
+        else:
+            data_copy = tempfile.mkdtemp(prefix="zerobite-load-")
+            shutil.copytree(args.data_dir, data_copy, dirs_exist_ok=True, ignore=_published_only)
+            process, url = start_server(args.port, data_copy)
+        pages = asyncio.run(load_pages(url, paths))
+        levels = []
+        for sessions in (int(n) for n in args.concurrency.split(",") if n):
+            print(f"Running {sessions} sessions for {args.duration:.0f}s...", file=sys.stderr)
+            levels.append(asyncio.run(run_level(url, pages, sessions, args.duration, args.think)))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+        if data_copy:
+            shutil.rmtree(data_copy, ignore_errors=True)
+
+    results = {"created": datetime.now().isoformat(timespec="seconds"), "url": url, "think_s": args.think, "levels": levels}
+    print_table(levels)
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,43 +1,20 @@
 import gradio as gr
 import pandas as pd
-import os
-import json
-from datetime import datetime
+from datetime import datetime  # Import datetime to simulate only the rest of today
+from utils.worker_lanes import interactive, INTERACTIVE_LANE  # Discounting is a cheap interactive callback
+from utils.metrics import instrument  # Record latency, errors and row counts for /metrics
+from utils.stock_ledger import site_ledger  # Live remaining stock per (date, menuitem) for the selected site
+from utils.discount_sim import simulate_discount_schedules, OPEN_HOUR, START_TIMES  # What-if discount schedules
 
-MENU_PATH = os.path.join(os.path.dirname(__file__), "data", "menu.json")
-SALES_PATH = os.path.join(os.path.dirname(__file__), "data", "sales.json")
+LEDGER_REFRESH_INTERVAL = 2  # Seconds between checks for new sales in the stock ledger
 
-def load_json(path, key):
-    if not os.path.exists(path):
-        return []
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f).get(key, [])
-
-def calculate_remaining_items(menu, sales):
-    # Map menu items
-    menu_map = {item["menuitem"]: item for item in menu}
-
-    # Calculate total sold quantities for each menu item
-    sold_quantities = {}
-    for day in sales:
-        for sold_item in day.get("items_sold", []):
-            menuitem = sold_item["menuitem"]
-            sold_quantities[menuitem] = sold_quantities.get(menuitem, 0) + sold_item["quantity_sold"]
-
-    # Calculate remaining stock
-    remaining_items = []
-    for menuitem, details in menu_map.items():
-        available_stock = details.get("available_stock", 0)
-        sold_quantity = sold_quantities.get(menuitem, 0)
-        remaining_stock = max(available_stock - sold_quantity, 0)
-        remaining_items.append({
-            "MenuItem": menuitem,
-            "Price": details.get("price", 0),
-            "RemainingStock": remaining_stock,
-            "Reason": "Normal"
-        })
-
-    return pd.DataFrame(remaining_items)
+@instrument
+def calculate_remaining_items(date=None):
+    # Remaining stock per menu item for one day, read from the live stock ledger.
+    # Defaults to the latest business day (today when today has a menu).
+    date = date or site_ledger().business_date()
+    rows = [dict(row, Reason="Normal") for row in site_ledger().remaining(date)]
+    return pd.DataFrame(rows, columns=["MenuItem", "Price", "RemainingStock", "Reason"]), date
 
 def apply_discount(df, discount, time):
     # Apply discount to each item
@@ -48,6 +25,18 @@ def apply_discount(df, discount, time):
         df["Reason"] = f"Discount of {discount}% applicable from {time}"
     return df
 
+@instrument
+def recommend_discount():
+    # Simulate every discount/start time schedule for the remaining stock and pick the best one
+    df, date = calculate_remaining_items()
+    if df.empty:
+        return None, pd.DataFrame()
+    # Only the rest of the day can still be sold when simulating today; past days are replayed in full
+    now = datetime.now()
+    from_hour = now.hour if date == now.strftime("%Y-%m-%d") else OPEN_HOUR
+    schedules = simulate_discount_schedules(df, from_hour=from_hour)
+    return schedules.iloc[0], schedules
+
 def current_day_sales_page():
     with gr.Blocks(title="Current Day Sales") as demo:
         gr.Markdown("## Current Day Sales and Remaining Items")
@@ -57,7 +46,7 @@ def current_day_sales_page():
         
         # Dropdown for time selection
         time_dropdown = gr.Dropdown(
-            ["12PM", "3PM", "5PM", "7PM", "9PM"],
+            list(START_TIMES),
             value="5PM",
             label="Discount Start Time"
         )
@@ -65,26 +54,80 @@ def current_day_sales_page():
         # Button to apply discount
         apply_discount_btn = gr.Button("Apply Discount")
         
-        # Output table
+        # Simulated schedules with expected revenue and waste; the best one is loaded into the controls
+        with gr.Accordion("Recommend a discount schedule", open=False):
+            recommend_btn = gr.Button("Recommend Schedule")
+            recommendation = gr.Markdown()
+            schedules_table = gr.Dataframe(label="Simulated Schedules (best first)", interactive=False)
+        
+        # Business day shown and output table
+        date_label = gr.Markdown()
         output_table = gr.Dataframe(label="Remaining Items with Discounts", interactive=False)
+        # Discount the user applied (None until "Apply Discount" is clicked) and ledger version shown
+        applied_discount = gr.State(None)
+        shown_version = gr.State(None)
+        # Poll the ledger so sales recorded through the API show up within seconds
+        ledger_timer = gr.Timer(LEDGER_REFRESH_INTERVAL)
 
-        # Load menu and sales data
-        menu = load_json(MENU_PATH, "menu")
-        sales = load_json(SALES_PATH, "daily_sales")
-        remaining_items_df = calculate_remaining_items(menu, sales)
+        def render(applied):
+            df, date = calculate_remaining_items()
+            if applied is not None:
+                df = apply_discount(df, *applied)
+            label = f"**Business day:** {date}" if date else "**No menu prepared yet.**"
+            return label, df
 
         # Function to handle discount application
+        @instrument
         def on_apply_discount(discount, time):
-            return apply_discount(remaining_items_df.copy(), discount, time)
+            site_ledger().ensure_current()
+            version = site_ledger().version
+            label, df = render((discount, time))
+            return label, df, (discount, time), version
+
+        def on_recommend():
+            best, schedules = recommend_discount()
+            if best is None:
+                return "**No remaining stock to discount.**", schedules, gr.skip(), gr.skip()
+            if best["Discount"] == 0:
+                text = f"**Recommendation:** no discount (expected revenue £{best['ExpectedRevenue']:.2f}, waste {best['ExpectedWasteUnits']:.0f} items)"
+                return text, schedules, gr.skip(), gr.skip()
+            text = (
+                f"**Recommendation:** {best['Discount']}% from {best['StartTime']} "
+                f"(expected revenue £{best['ExpectedRevenue']:.2f}, waste {best['ExpectedWasteUnits']:.0f} items)"
+            )
+            return text, schedules, best["Discount"], best["StartTime"]
+
+        # Re-render only when the ledger changed since this session last rendered
+        def on_tick(applied, shown):
+            site_ledger().ensure_current()  # Picks up newly published menu/sales snapshots
+            version = site_ledger().version
+            if shown == version:
+                return gr.skip(), gr.skip(), gr.skip()
+            label, df = render(applied)
+            return label, df, version
 
         # Set up button click event
         apply_discount_btn.click(
-            fn=on_apply_discount,
+            fn=interactive(on_apply_discount),
             inputs=[discount_slider, time_dropdown],
-            outputs=output_table
+            outputs=[date_label, output_table, applied_discount, shown_version],
+            **INTERACTIVE_LANE
         )
 
-        # Load the initial table without discounts
-        demo.load(fn=lambda: remaining_items_df, inputs=[], outputs=output_table)
+        recommend_btn.click(
+            fn=interactive(on_recommend),
+            outputs=[recommendation, schedules_table, discount_slider, time_dropdown],
+            **INTERACTIVE_LANE
+        )
+
+        # Load the initial table without discounts, then keep it current
+        demo.load(fn=interactive(on_tick), inputs=[applied_discount, shown_version], outputs=[date_label, output_table, shown_version], **INTERACTIVE_LANE)
+        ledger_timer.tick(
+            fn=interactive(on_tick),
+            inputs=[applied_discount, shown_version],
+            outputs=[date_label, output_table, shown_version],
+            show_progress="hidden",
+            **INTERACTIVE_LANE
+        )
 
     return demo
\ No newline at end of file
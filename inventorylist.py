@@ -1,7 +1,13 @@
 import gradio as gr                # Import Gradio for UI components
 import pandas as pd                # Import pandas for data manipulation
 from utils.data_loader import load_inventory   # Import custom function to load inventory data
+from utils.live_updates import live_refresh    # Push data file changes to open sessions
+from utils.worker_lanes import interactive, latest, INTERACTIVE_LANE  # Run filter/paging on the interactive lane
+from utils.metrics import instrument  # Record latency, errors and row counts for /metrics
+from utils.consumption import depletion_projection  # Sales x ingredient usage -> projected depletion dates
+from utils.inventory_index import site_index   # Stock lots ordered by expiry date, per site
 
+@instrument
 def load_data(filter_text="", page=1, page_size=15):
     inventory_data = load_inventory()          # Load inventory data from external source
     df = pd.DataFrame(inventory_data)          # Convert data to pandas DataFrame
@@ -17,6 +23,27 @@ def load_data(filter_text="", page=1, page_size=15):
     df_page = df.iloc[start:end]               # Slice DataFrame for current page
     return df_page, total, max_page            # Return page data, total rows, and max page
 
+@instrument
+def load_depletion():
+    # Materials ordered by days until they run out at the recent consumption rate
+    return (depletion_projection(),)
+
+@instrument
+def load_expiring(days=7, lot_type="All"):
+    # Lots expiring within `days` in first-expiry-first-out order, and the menu items they put at risk
+    index = site_index().ensure_current()
+    try:
+        days = int(days)
+    except (TypeError, ValueError):
+        days = 7
+    lots = [lot for lot in index.expiring_within(days) if lot_type in (None, "All") or lot.get("type") == lot_type]
+    at_risk = index.menu_items_expiring(days)
+    items = pd.DataFrame(
+        [(item, material, expiry) for item, (material, expiry) in sorted(at_risk.items(), key=lambda kv: kv[1][1])],
+        columns=["menuitem", "ingredient", "expiry_date"]
+    )
+    return pd.DataFrame(lots), items
+
 def inventory_list_content():
     with gr.Row():                            # Create a horizontal row layout
         with gr.Column(scale=3):              # First column (wider)
@@ -38,7 +65,13 @@ def inventory_list_content():
         render=True
     )
     refresh_btn = gr.Button("🔄 Refresh Data") # Button to refresh data
+    depletion_table = gr.Dataframe(           # Projected depletion per material from recent sales
+        value=load_depletion()[0],
+        interactive=False,
+        label="Projected Stock Depletion"
+    )
 
+    @instrument
     def update_table(filter_text, page):
         try:
             page = int(page)                  # Ensure page is integer
@@ -49,20 +82,65 @@ def inventory_list_content():
         page = min(max(1, page), max_page)    # Ensure page is within valid range
         return df_page, gr.update(minimum=1, maximum=max_page, value=page) # Return updated data and page control
 
+    # Filter, paging and refresh share one last-writer-wins group: only the newest query is rendered
     filter_box.change(
-        lambda filter_text, page: update_table(filter_text, 1),  # Reset to page 1 on filter change
+        latest(lambda filter_text, page: update_table(filter_text, 1), "inventorylist.table", 2),  # Reset to page 1 on filter change
         [filter_box, page_number],                               # Inputs: filter text and page number
-        [data_table, page_number]                                # Outputs: update table and page number
+        [data_table, page_number],                               # Outputs: update table and page number
+        trigger_mode="multiple",  # Send every keystroke; latest() debounces and drops stale ones
+        **INTERACTIVE_LANE
     )
     page_number.change(
-        update_table, 
+        latest(update_table, "inventorylist.table", 2, delay=0),
         [filter_box, page_number], 
-        [data_table, page_number]
+        [data_table, page_number],
+        **INTERACTIVE_LANE
     )
     refresh_btn.click(
-        lambda: update_table(filter_box.value, page_number.value), 
-        [], 
-        [data_table, page_number]
+        latest(update_table, "inventorylist.table", 2, delay=0),  # Use the filter and page the user currently has
+        [filter_box, page_number], 
+        [data_table, page_number],
+        **INTERACTIVE_LANE
+    )
+    live_refresh(                             # Re-query when inventory.json changes on disk
+        ["inventory.json"],
+        update_table,
+        [filter_box, page_number],
+        [data_table, page_number],
+        group="inventorylist.table"
+    )
+    with gr.Accordion("Expiring Stock", open=False):
+        with gr.Row():
+            expiry_days = gr.Number(value=7, label="Expiring within (days)", precision=0, minimum=0)
+            expiry_type = gr.Dropdown(["All"] + site_index().ensure_current().types(), value="All", label="Type")
+        expiring_lots, expiring_items = load_expiring()
+        expiring_table = gr.Dataframe(value=expiring_lots, interactive=False, label="Lots to Use First (FEFO)")
+        at_risk_table = gr.Dataframe(value=expiring_items, interactive=False, label="Menu Items with Soon-Expiring Ingredients")
+
+    def reload_expiring(days, lot_type):
+        # Page load and data changes: also re-list the lot types of the browser's site
+        types = ["All"] + site_index().ensure_current().types()
+        lot_type = lot_type if lot_type in types else "All"
+        return (*load_expiring(days, lot_type), gr.update(choices=types, value=lot_type))
+
+    for control in (expiry_days, expiry_type):
+        control.change(
+            interactive(load_expiring),
+            [expiry_days, expiry_type],
+            [expiring_table, at_risk_table],
+            **INTERACTIVE_LANE
+        )
+    live_refresh(                             # Re-index when stock lots or menu ingredients change
+        ["inventory.json", "menu.json"],
+        reload_expiring,
+        [expiry_days, expiry_type],
+        [expiring_table, at_risk_table, expiry_type]
+    )
+    live_refresh(                             # Re-project when sales, menu or stock change
+        ["menu.json", "sales.json", "inventory.json"],
+        load_depletion,
+        [],
+        [depletion_table]
     )
 
     data_table    # Return or display the data table
@@ -1,18 +1,41 @@
+import html  # Import html to escape site names
 import gradio as gr  # Import the Gradio library for UI components
+from utils import sites  # Site partitions for the site selector
+from utils.image_cache import local_url  # Serve the logo and profile icons from the local thumbnail cache
+from utils.worker_lanes import interactive, INTERACTIVE_LANE  # Render the selector for the browser's site
 
-def navbar():
-    # Returns a Gradio HTML component for the top navigation bar with logo, anonymous profile, and logout
-    return gr.HTML(
+LOGO_URL = "https://cdn-icons-png.flaticon.com/512/4712/4712035.png"
+PROFILE_URL = "https://cdn-icons-png.flaticon.com/512/149/149071.png"
+
+def site_selector(current=None):
+    # Dropdown of sites; choosing one sets the site cookie via /site and reloads the page
+    current = current or sites.DEFAULT_SITE
+    options = "".join(
+        f"<option value='{html.escape(site)}'{' selected' if site == current else ''}>{html.escape(sites.site_name(site))}</option>"
+        for site in sites.list_sites()
+    )
+    return (
+        "<form action='/site' method='get' style='margin:0;'>"
+        "<select name='name' onchange='this.form.submit()' style='background:#333;color:#ccc;border:none;font-size:0.9em;'>"
+        f"{options}</select></form>"
+    )
+
+def navbar(current_site=None):
+    # Returns a Gradio HTML component for the top navigation bar with logo, site selector, and logout
+    return gr.HTML(navbar_html(current_site))
+
+def navbar_html(current_site=None):
+    return (
         """
         <div style='width:100%;background:#222;color:#fff;padding:18px 32px;font-size:2em;font-weight:bold;letter-spacing:1px;display:flex;align-items:center;justify-content:space-between;'>
             <span style="display:flex;align-items:center;gap:16px;">
-                <img src="https://cdn-icons-png.flaticon.com/512/4712/4712035.png" alt="Zero Waste Ninjas Logo" style="width:38px;height:38px;border-radius:50%;background:#fff;padding:2px;">
+                <img src='""" + local_url(LOGO_URL) + """' alt="Zero Waste Ninjas Logo" style="width:38px;height:38px;border-radius:50%;background:#fff;padding:2px;">
                 Zero Waste Ninjas
             </span>
             <div style='display:flex;align-items:center;gap:18px;'>
                 <span style='display:flex;align-items:center;gap:8px;font-size:1em;'>
-                    <img src="https://cdn-icons-png.flaticon.com/512/149/149071.png" alt="Anonymous Profile" style="background:#444;border-radius:50%;width:32px;height:32px;display:inline-flex;align-items:center;justify-content:center;object-fit:cover;">
-                    <span style="font-size:0.9em;color:#ccc;">Hive Kitchen</span>
+                    <img src='""" + local_url(PROFILE_URL) + """' alt="Anonymous Profile" style="background:#444;border-radius:50%;width:32px;height:32px;display:inline-flex;align-items:center;justify-content:center;object-fit:cover;">
+                    """ + site_selector(current_site) + """
                 </span>
                 <a href="/logout" style='color:#fff;text-decoration:none;font-size:1em;padding:6px 16px;background:#e74c3c;border-radius:5px;font-weight:500;'>Logout</a>
             </div>
@@ -65,11 +88,13 @@ def footer():
 def layout(main_content_fn, selected="inventory"):
     # Example inside your layout function or main Gradio Blocks
     with gr.Blocks(title="Zero Waste Ninjas") as demo:
-        navbar()  # Add the navbar at the top
+        top_bar = navbar()  # Add the navbar at the top
         with gr.Row():  # Create a horizontal row for sidebar and main content
             with gr.Column(scale=1, min_width=180):  # Sidebar column
                 sidenav(selected)  # Add the side navigation
             with gr.Column(scale=5):  # Main content column
                 main_content_fn()  # Call the function to add main content
         footer()  # Add the footer at the bottom
+        # Show the site this browser selected (the page content is loaded for that site)
+        demo.load(interactive(lambda: navbar_html(sites.current_site())), None, top_bar, **INTERACTIVE_LANE)
     return demo  # Return the complete page layout
\ No newline at end of file
@@ -1,23 +1,16 @@
 import gradio as gr  # Import Gradio for UI components
-import pandas as pd  # Import pandas for data manipulation
-import json  # Import json for reading JSON files
-import os  # Import os for file path operations
 import matplotlib.pyplot as plt  # Import matplotlib for plotting
+from utils.live_updates import live_refresh  # Push data file changes to open sessions
+from utils.worker_lanes import latest, INTERACTIVE_LANE  # Run filter/paging on the interactive lane
+from utils.metrics import instrument  # Record latency, errors and row counts for /metrics
+from utils.waste_cube import waste_cube  # Priced leftover rows and the (date, item, reason) loss cube
 
+@instrument
 def load_leftover(filter_text="", date_filter=None, page=1, page_size=10):
-    # Build the path to the leftover.json data file
-    json_path = os.path.join(os.path.dirname(__file__), "data", "leftover.json")
-    # Open and load the JSON data
-    with open(json_path, "r", encoding="utf-8") as f:
-        waste_data = json.load(f)["leftover"]  # <-- FIXED KEY HERE
-    # Convert the data to a pandas DataFrame
-    df = pd.DataFrame(waste_data)
-    # Filter by menu item or waste reason if filter_text is provided
-    if filter_text:
-        df = df[df["menuitem"].str.contains(filter_text, case=False) | df["waste_reason"].str.contains(filter_text, case=False)]
-    # Filter by date if date_filter is provided
-    if date_filter:
-        df = df[df["date"] == date_filter]
+    # Leftover rows for the current snapshot, priced once and cached with the waste cube
+    cube = waste_cube()
+    # Filter by menu item or waste reason and by date if provided
+    df = cube.filter_rows(filter_text, date_filter)
     # Calculate total number of filtered rows
     total = len(df)
     # Calculate the maximum number of pages
@@ -25,39 +18,25 @@ def load_leftover(filter_text="", date_filter=None, page=1, page_size=10):
     # Calculate start and end indices for pagination
     start = (page - 1) * page_size
     end = start + page_size
-    # Get the current page of data
-    df_page = df.iloc[start:end].copy()
+    # Get the current page of data (without the loss column, as before)
+    df_page = df.iloc[start:end].drop(columns="estimated_loss_gbp")
     # Return the page, total count, max page, and the full filtered DataFrame
     return df_page, total, max_page, df
 
-def add_estimated_loss_gbp(df):
-    if df.empty or "menuitem" not in df.columns or "wasted_quantity" not in df.columns:
-        return df
-    # Load menu price map here to avoid NameError
-    menu_path = os.path.join(os.path.dirname(__file__), "data", "menu.json")
-    with open(menu_path, "r", encoding="utf-8") as f:
-        menu_price_map = {item["menuitem"]: float(item["price"]) for item in json.load(f)["menu"]}
-    df = df.copy()
-    df["estimated_loss_gbp"] = df.apply(
-        lambda row: menu_price_map.get(row["menuitem"], 0) * row.get("wasted_quantity", 0), axis=1
-    )
-    return df
+def _no_data(figsize):
+    plt.style.use("dark_background")
+    fig, ax = plt.subplots(figsize=figsize)
+    ax.text(0.5, 0.5, "No data to display", ha="center", va="center", fontsize=12, color="white")
+    ax.set_axis_off()
+    plt.close(fig)
+    return fig
 
-def plot_loss_per_item(df):
+def plot_loss_per_item(grouped):
+    # grouped: sold and wasted quantity per menu item (WasteCube.per_item)
+    if grouped.empty:
+        return _no_data((8, 4))
     plt.style.use("dark_background")
     fig, ax = plt.subplots(figsize=(8, 4))
-    # Check for empty DataFrame or missing columns
-    if df.empty or "menuitem" not in df.columns or "sold_quantity" not in df.columns or "wasted_quantity" not in df.columns:
-        ax.text(0.5, 0.5, "No data to display", ha="center", va="center", fontsize=12, color="white")
-        ax.set_axis_off()
-        plt.close(fig)
-        return fig
-    grouped = df.groupby("menuitem")[["sold_quantity", "wasted_quantity"]].sum()
-    if grouped.empty:
-        ax.text(0.5, 0.5, "No data to display", ha="center", va="center", fontsize=12, color="white")
-        ax.set_axis_off()
-        plt.close(fig)
-        return fig
     grouped.plot(kind="bar", ax=ax, color=["#00FF88", "#FFA500"])
     ax.set_ylabel("Quantity", color="white")
     ax.set_title("Sold vs Wasted Quantity per Menu Item", color="white")
@@ -69,50 +48,10 @@ def plot_loss_per_item(df):
     plt.close(fig)
     return fig
 
-def plot_loss_by_date(df):
-    import matplotlib.pyplot as plt
-    import os
-    import json
-
-    # Load menu prices
-    menu_path = os.path.join(os.path.dirname(__file__), "data", "menu.json")
-    with open(menu_path, "r", encoding="utf-8") as f:
-        menu_price_map = {item["menuitem"]: float(item["price"]) for item in json.load(f)["menu"]}
-
-    # If df is empty, reload from leftover.json to ensure we have all data
-    if df.empty or "menuitem" not in df.columns or "date" not in df.columns or "wasted_quantity" not in df.columns:
-        leftover_path = os.path.join(os.path.dirname(__file__), "data", "leftover.json")
-        with open(leftover_path, "r", encoding="utf-8") as f:
-            waste_data = json.load(f)["leftover"]
-        df = pd.DataFrame(waste_data)
-        if df.empty or "menuitem" not in df.columns or "date" not in df.columns or "wasted_quantity" not in df.columns:
-            # Still empty, show no data
-            plt.style.use("dark_background")
-            fig, ax = plt.subplots(figsize=(8, 3))
-            ax.text(0.5, 0.5, "No data to display", ha="center", va="center", fontsize=12, color="white")
-            ax.set_axis_off()
-            plt.close(fig)
-            return fig
-
-    # Calculate estimated loss per row
-    df = df.copy()
-    df["estimated_loss_gbp"] = df.apply(
-        lambda row: menu_price_map.get(row["menuitem"], 0) * row.get("wasted_quantity", 0), axis=1
-    )
-
-    # Group by date and menuitem
-    grouped = df.groupby(["date", "menuitem"])["estimated_loss_gbp"].sum().reset_index()
-
-    if grouped.empty:
-        plt.style.use("dark_background")
-        fig, ax = plt.subplots(figsize=(8, 3))
-        ax.text(0.5, 0.5, "No data to display", ha="center", va="center", fontsize=12, color="white")
-        ax.set_axis_off()
-        plt.close(fig)
-        return fig
-
-    # Pivot for plotting: dates as x, menuitems as lines/bars
-    pivot = grouped.pivot(index="date", columns="menuitem", values="estimated_loss_gbp").fillna(0)
+def plot_loss_by_date(pivot):
+    # pivot: estimated loss with dates as rows and menu items as columns (WasteCube.per_date)
+    if pivot.empty:
+        return _no_data((8, 3))
 
     plt.style.use("dark_background")
     fig, ax = plt.subplots(figsize=(10, 5))
@@ -128,6 +67,12 @@ def plot_loss_by_date(df):
     plt.close(fig)
     return fig
 
+def loss_by_date_stack(filter_text="", date_filter=None):
+    # Per-date stack for the filters; falls back to every date when nothing matches (as before)
+    cube = waste_cube()
+    pivot = cube.per_date(filter_text, date_filter)
+    return pivot if not pivot.empty else cube.per_date()
+
 def leftover_report_content():
     # Create a Gradio Blocks interface with custom CSS
     with gr.Blocks(css=".gradio-container {max-width: 100vw !important; padding: 0;}") as demo:
@@ -138,7 +83,7 @@ def leftover_report_content():
             filter_box = gr.Textbox(label="Filter by Menu Item or Reason", placeholder="Type to filter...", scale=3)
             # Dropdown for filtering by date
             date_filter = gr.Dropdown(
-                choices=[""] + sorted(list({row["date"] for row in json.load(open(os.path.join(os.path.dirname(__file__), "data", "leftover.json"), encoding="utf-8"))["leftover"]})),
+                choices=[""] + waste_cube().dates,
                 label="Filter by Date",
                 value="",
                 scale=1
@@ -158,11 +103,12 @@ def leftover_report_content():
         )
         with gr.Row():
             # Plot for loss per item
-            per_item_graph = gr.Plot(plot_loss_per_item(load_leftover()[3]), elem_classes="full-width")
+            per_item_graph = gr.Plot(plot_loss_per_item(waste_cube().per_item()), elem_classes="full-width")
             # Plot for loss by date
-            per_date_graph = gr.Plot(plot_loss_by_date(load_leftover()[3]), elem_classes="full-width")
+            per_date_graph = gr.Plot(plot_loss_by_date(loss_by_date_stack()), elem_classes="full-width")
 
         # Function to update the table and plots based on filters and pagination
+        @instrument
         def update_table(filter_text, date_filter_val, page):
             try:
                 page = int(page)  # Ensure page is an integer
@@ -172,36 +118,55 @@ def leftover_report_content():
             # Load filtered and paginated data
             df_page, total, max_page, df_all = load_leftover(filter_text, date_val, page)
             page = min(max(1, page), max_page)  # Clamp page number within valid range
-            # Return updated table, page number, and plots
+            # Return updated table, page number, and plots (aggregates are slices of the cached cube)
             return (
                 df_page,
                 gr.update(minimum=1, maximum=max_page, value=page),
-                plot_loss_per_item(df_all),
-                plot_loss_by_date(df_all)
+                plot_loss_per_item(waste_cube().per_item(filter_text, date_val)),
+                plot_loss_by_date(loss_by_date_stack(filter_text, date_val))
             )
 
+        def reload_table(filter_text, date_filter_val, page):
+            # Page load, refresh and data changes: also re-list the dates of the browser's site
+            dates = [""] + waste_cube().dates
+            date_val = date_filter_val if date_filter_val in dates else ""
+            return (*update_table(filter_text, date_val, page), gr.update(choices=dates, value=date_val))
+
         # Update table and plots when filter text changes (reset to page 1)
         filter_box.change(
-            lambda filter_text, date_filter_val, page: update_table(filter_text, date_filter_val, 1),
+            latest(lambda filter_text, date_filter_val, page: update_table(filter_text, date_filter_val, 1), "leftoverreport.table", 4),
             [filter_box, date_filter, page_number],
-            [data_table, page_number, per_item_graph, per_date_graph]
+            [data_table, page_number, per_item_graph, per_date_graph],
+            trigger_mode="multiple",  # Send every keystroke; latest() debounces and drops stale ones
+            **INTERACTIVE_LANE
         )
         # Update table and plots when date filter changes (reset to page 1)
         date_filter.change(
-            lambda date_filter_val, filter_text, page: update_table(filter_text, date_filter_val, 1),
+            latest(lambda date_filter_val, filter_text, page: update_table(filter_text, date_filter_val, 1), "leftoverreport.table", 4, delay=0),
             [date_filter, filter_box, page_number],
-            [data_table, page_number, per_item_graph, per_date_graph]
+            [data_table, page_number, per_item_graph, per_date_graph],
+            **INTERACTIVE_LANE
         )
         # Update table and plots when page number changes
         page_number.change(
-            update_table,
+            latest(update_table, "leftoverreport.table", 4, delay=0),
             [filter_box, date_filter, page_number],
-            [data_table, page_number, per_item_graph, per_date_graph]
+            [data_table, page_number, per_item_graph, per_date_graph],
+            **INTERACTIVE_LANE
         )
         # Refresh data when refresh button is clicked
         refresh_btn.click(
-            lambda: update_table(filter_box.value, date_filter.value, page_number.value),
-            [],
-            [data_table, page_number, per_item_graph, per_date_graph]
+            latest(reload_table, "leftoverreport.table", 5, delay=0),
+            [filter_box, date_filter, page_number],
+            [data_table, page_number, per_item_graph, per_date_graph, date_filter],
+            **INTERACTIVE_LANE
+        )
+        # Push updates when leftover, its rollups or menu prices change on disk
+        live_refresh(
+            ["leftover.json", "leftover_rollup.json", "menu.json"],
+            reload_table,
+            [filter_box, date_filter, page_number],
+            [data_table, page_number, per_item_graph, per_date_graph, date_filter],
+            group="leftoverreport.table"
         )
     return demo  # Return the Gradio Blocks interface
\ No newline at end of file
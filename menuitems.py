@@ -1,11 +1,16 @@
 import gradio as gr                # Import Gradio for UI components
 import pandas as pd                # Import pandas for data manipulation
 import json                        # Import json for reading JSON files
-import os                          # Import os for file path operations
+from utils.live_updates import live_refresh  # Push data file changes to open sessions
+from utils.worker_lanes import latest, INTERACTIVE_LANE  # Run filter/paging on the interactive lane
+from utils.metrics import instrument  # Record latency, errors and row counts for /metrics
+from utils.snapshots import data_path  # Resolve data files in the pinned snapshot
+from utils.image_cache import local_url  # Serve menu images from the local thumbnail cache
 
+@instrument
 def load_menu(filter_text="", page=1, page_size=15):
-    # Construct the path to the menu.json file in the data directory
-    json_path = os.path.join(os.path.dirname(__file__), "data", "menu.json")
+    # Construct the path to the menu.json file in the current data snapshot
+    json_path = data_path("menu.json")
     # Open and load the JSON file containing menu data
     with open(json_path, "r", encoding="utf-8") as f:
         menu_data = json.load(f)["menu"]
@@ -25,7 +30,7 @@ def load_menu(filter_text="", page=1, page_size=15):
     df_page = df.iloc[start:end].copy()
     # If image_url column exists, move it to the first column and convert to markdown for image preview
     if "image_url" in df_page.columns:
-        df_page.insert(0, "Image", df_page["image_url"].apply(lambda url: f"![img]({url})" if pd.notna(url) else ""))
+        df_page.insert(0, "Image", df_page["image_url"].apply(lambda url: f"![img]({local_url(url)})" if pd.notna(url) else ""))
         df_page = df_page.drop(columns=["image_url"])
     # Return the current page DataFrame, total rows, and max page number
     return df_page, total, max_page
@@ -51,6 +56,7 @@ def menu_list_content():
     refresh_btn = gr.Button("🔄 Refresh Data")
 
     # Define a function to update the table based on filter and page number
+    @instrument
     def update_table(filter_text, page):
         try:
             page = int(page)  # Ensure page is an integer
@@ -60,16 +66,20 @@ def menu_list_content():
         page = min(max(1, page), max_page)                      # Clamp page number within valid range
         return df_page, gr.update(minimum=1, maximum=max_page, value=page)  # Return updated data and page control
 
-    # When filter changes, update table and reset to page 1
+    # When filter changes, update table and reset to page 1 (debounced; only the newest query is rendered)
     filter_box.change(
-        lambda filter_text, page: update_table(filter_text, 1),
+        latest(lambda filter_text, page: update_table(filter_text, 1), "menuitems.table", 2),
         [filter_box, page_number],
-        [data_table, page_number]
+        [data_table, page_number],
+        trigger_mode="multiple",  # Send every keystroke; latest() debounces and drops stale ones
+        **INTERACTIVE_LANE
     )
     # When page number changes, update table
-    page_number.change(update_table, [filter_box, page_number], [data_table, page_number])
+    page_number.change(latest(update_table, "menuitems.table", 2, delay=0), [filter_box, page_number], [data_table, page_number], **INTERACTIVE_LANE)
     # When refresh button is clicked, update table with current filter and page
-    refresh_btn.click(lambda: update_table(filter_box.value, page_number.value), [], [data_table, page_number])
+    refresh_btn.click(latest(update_table, "menuitems.table", 2, delay=0), [filter_box, page_number], [data_table, page_number], **INTERACTIVE_LANE)
+    # When menu.json changes on disk, push the new rows to this session
+    live_refresh(["menu.json"], update_table, [filter_box, page_number], [data_table, page_number], group="menuitems.table")
 
     # Return the data table and refresh button (for Gradio Blocks API)
     data_table
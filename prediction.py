@@ -3,84 +3,69 @@ import json
 import os
 import random
 from datetime import datetime, timedelta
+import numpy as np
 import pandas as pd
+from utils.worker_lanes import heavy, HEAVY_LANE  # Forecasts run on the heavy lane
+from utils.metrics import instrument  # Record latency, errors and row counts for /metrics
+from utils.snapshots import data_path  # Resolve data files in the pinned snapshot
+from utils import feature_store  # Per (date, menuitem) sales, weather and trend features
+from utils.weather_provider import WEATHER_TYPES
 
-MENU_PATH = os.path.join(os.path.dirname(__file__), "data", "menu.json")
-SALES_PATH = os.path.join(os.path.dirname(__file__), "data", "sales.json")
-LEFTOVER_PATH = os.path.join(os.path.dirname(__file__), "data", "leftover.json")
-TRENDS_PATH = os.path.join(os.path.dirname(__file__), "data", "trends.json")
-WEATHER_PATH = os.path.join(os.path.dirname(__file__), "data", "weather.json")
+MENU_FILE = "menu.json"
+SALES_FILE = "sales.json"
+LEFTOVER_FILE = "leftover.json"
+TRENDS_FILE = "trends.json"
+WEATHER_FILE = "weather.json"
+# Weather code (index into WEATHER_TYPES, -1 unknown) -> label used in the Reason column
+WEATHER_LABELS = {-1: None, **{i: {"Rain": "Rainy"}.get(w, w) for i, w in enumerate(WEATHER_TYPES)}}
 
-def load_json(path, key):
+@instrument
+def load_json(name, key):
+    path = data_path(name)  # Resolve the file in the pinned data snapshot
     if not os.path.exists(path):
         return []
     with open(path, "r", encoding="utf-8") as f:
         return json.load(f).get(key, [])
 
-def sample_prediction_model(days):
-    # Load data
-    menu = load_json(MENU_PATH, "menu")
-    sales = load_json(SALES_PATH, "daily_sales")
-    leftover = load_json(LEFTOVER_PATH, "leftover")
-    trends = load_json(TRENDS_PATH, "trends")
-    weather = load_json(WEATHER_PATH, "weather")
+@instrument
+def sample_prediction_model(days, progress=None):
+    # progress(fraction, desc) is supplied by the heavy lane; it raises once the job is cancelled
+    progress = progress or (lambda fraction, desc=None: None)
+    # Menu stock and prices; sales, weather and trend inputs come from the feature store
+    menu = load_json(MENU_FILE, "menu")
+    menu_map = {item["menuitem"]: item for item in menu}
+    features = feature_store.feature_table()
 
     today = datetime.now()
     prediction = []
-    menu_map = {item["menuitem"]: item for item in menu}
-    trends_map = {item["menuitem"]: item for item in trends}
-    # Build weather map by date and period
-    weather_map = {(w["date"], w["period"]): w for w in weather}
-
     for i in range(days):
+        progress(i / days, desc="Forecasting demand")
         date = (today + timedelta(days=i)).strftime("%Y-%m-%d")
-        for menuitem in menu_map:
-            # --- AI logic: base demand on past sales, leftover, trends, weather ---
-            # Get last 7 days sales for this item
-            past_sales = [
-                sold["quantity_sold"]
-                for day in sales[-7:]
-                for sold in day.get("items_sold", [])
-                if sold["menuitem"] == menuitem
-            ]
-            avg_sales = sum(past_sales) / len(past_sales) if past_sales else random.randint(5, 15)
-            # Add trend boost
-            trend_status = trends_map.get(menuitem, {}).get("facebook_status", "Non-Trending")
-            trend_boost = 1.2 if trend_status == "Trending" else 1.0
-            # Add weather boost (forenoon/afternoon)
-            weather_forenoon = weather_map.get((date, "Forenoon"), {})
-            weather_afternoon = weather_map.get((date, "Afternoon"), {})
-            weather_reason = []
-            weather_boost = 1.0
-            for w in [weather_forenoon, weather_afternoon]:
-                if w.get("weather") == "Rain":
-                    weather_boost += 0.1
-                    weather_reason.append("Rainy")
-                elif w.get("weather") == "Sunny":
-                    weather_boost += 0.05
-                    weather_reason.append("Sunny")
-            # Estimate demand
-            quantity_in_demand = int(avg_sales * trend_boost * weather_boost + random.uniform(-2, 2))
+        # One feature row per menu item for this day
+        day = features.loc[pd.Timestamp(date)].reindex(list(menu_map))
+        # --- AI logic: base demand on past sales, trends, weather ---
+        # Average of the item's last 7 selling days (random baseline for items that never sold)
+        avg_sales = day["sales_mean_7"].to_numpy()
+        unknown = np.isnan(avg_sales)
+        avg_sales[unknown] = [random.randint(5, 15) for _ in range(unknown.sum())]
+        noise = np.array([random.uniform(-2, 2) for _ in range(len(day))])
+        # Estimate demand: trend (Facebook) and weather (forenoon/afternoon) boosts, shared with the forecast export
+        quantity_in_demand = (feature_store.expected_demand(day, avg_sales) + noise).astype(int)
+        for menuitem, demand, (_, row) in zip(menu_map, quantity_in_demand, day.iterrows()):
             actual_quantity = menu_map[menuitem].get("available_stock", 0)
-            demand_status = "High" if quantity_in_demand > actual_quantity else "Normal"
+            demand_status = "High" if demand > actual_quantity else "Normal"
             # Cost saved: if demand < actual, cost saved is (actual - demand) * price
             price = float(menu_map[menuitem].get("price", 0))
-            cost_saved = round(max(actual_quantity - quantity_in_demand, 0) * price, 2)
-            # Reason
-            reason = []
-            # Social trend
-            trend = trends_map.get(menuitem, {})
-            for platform in ["facebook", "instagram", "tiktok", "twitter"]:
-                status = trend.get(f"{platform}_status", "")
-                if status == "Trending":
-                    reason.append(f"{platform.capitalize()} Trending")
-            # Weather
+            cost_saved = round(max(actual_quantity - demand, 0) * price, 2)
+            # Reason: platforms where the item is currently trending, then the weather
+            reason = [f"{platform.capitalize()} Trending" for platform in feature_store.PLATFORMS if row[f"{platform}_trending"] == 1]
+            weather_reason = {WEATHER_LABELS[row[f"{period}_weather"]] for period in feature_store.PERIODS} & {"Rainy", "Sunny"}
             if weather_reason:
-                reason.append("Weather: " + ", ".join(set(weather_reason)))
+                reason.append("Weather: " + ", ".join(weather_reason))
             prediction.append({
                 "Date": date,
                 "MenuItem": menuitem,
-                "QuantityInDemand": quantity_in_demand,
+                "QuantityInDemand": int(demand),
                 "ActualQuantity": actual_quantity,
                 "Demand": demand_status,
                 "CostSaved": f"£{cost_saved:.2f}",  # <-- Show as GBP
@@ -95,11 +80,15 @@ def food_demand_prediction_page():
     with gr.Blocks(title="Food Demand Prediction") as demo:
         gr.Markdown("## Food Demand Prediction (Next 14 Days)")
         days_slider = gr.Slider(1, 14, value=7, step=1, label="Forecast Days")
-        predict_btn = gr.Button("Predict Demand")
+        with gr.Row():
+            predict_btn = gr.Button("Predict Demand")
+            cancel_btn = gr.Button("Cancel")
         output_table = gr.Dataframe(label="Prediction Table", interactive=False)
-        def on_predict(days):
-            df = sample_prediction_model(days)
+        @instrument
+        def on_predict(days, progress=None):
+            df = sample_prediction_model(days, progress)
             return df
-        predict_btn.click(fn=on_predict, inputs=days_slider, outputs=output_table)
-        demo.load(fn=lambda: sample_prediction_model(7), inputs=[], outputs=output_table)
+        predict_event = predict_btn.click(fn=heavy(on_predict), inputs=days_slider, outputs=output_table, **HEAVY_LANE)
+        load_event = demo.load(fn=heavy(lambda progress=None: sample_prediction_model(7, progress)), inputs=[], outputs=output_table, **HEAVY_LANE)
+        cancel_btn.click(fn=None, inputs=None, outputs=None, cancels=[predict_event, load_event])
     return demo
\ No newline at end of file
@@ -1,26 +1,17 @@
 import gradio as gr  # Import Gradio for building the UI
-import pandas as pd  # Import pandas for data manipulation
-import json  # Import json for reading JSON files
-import os  # Import os for file path operations
+from utils.live_updates import live_refresh  # Push data file changes to open sessions
+from utils.worker_lanes import latest, INTERACTIVE_LANE  # Run filter/paging on the interactive lane
+from utils.metrics import instrument  # Record latency, errors and row counts for /metrics
+from utils.retention import sales_lines, PERIOD_LABELS  # Sale lines across the detail and rollup tiers
 
-def load_sales_details(filter_text="", date_filter=None, page=1, page_size=10):
-    # Construct the path to the sales.json file
-    json_path = os.path.join(os.path.dirname(__file__), "data", "sales.json")
-    # Open and load the JSON data
-    with open(json_path, "r", encoding="utf-8") as f:
-        sales_data = json.load(f)["daily_sales"]
+COLUMNS = ["date", "menuitem", "quantity_sold", "total_sales_gbp", "period"]  # Table columns
 
-    # Flatten sales data into a list of rows for DataFrame
-    rows = []
-    for day in sales_data:
-        for item in day["items_sold"]:
-            rows.append({
-                "date": day["date"],  # Date of sale
-                "menuitem": item["menuitem"],  # Name of menu item
-                "quantity_sold": item["quantity_sold"],  # Quantity sold
-                "total_sales_gbp": item["total_sales_gbp"]  # Total sales in GBP
-            })
-    df = pd.DataFrame(rows)  # Create DataFrame from rows
+@instrument
+def load_sales_details(filter_text="", date_filter=None, page=1, page_size=10):
+    # Sale lines: recent days in full detail, older ones from the daily/weekly/monthly rollups
+    df = sales_lines()
+    # Show which rows are rollup totals: "day" for single days, "week"/"month" for the longer periods
+    df = df.assign(period=df["tier"].map(PERIOD_LABELS))[COLUMNS + ["days"]]
 
     # Filter by menu item text if provided
     if filter_text:
@@ -33,7 +24,7 @@ def load_sales_details(filter_text="", date_filter=None, page=1, page_size=10):
     max_page = max(1, -(-total // page_size))  # Calculate max number of pages (ceiling division)
     start = (page - 1) * page_size  # Start index for pagination
     end = start + page_size  # End index for pagination
-    df_page = df.iloc[start:end].copy()  # Get the current page of data
+    df_page = df.iloc[start:end][COLUMNS].copy()  # Get the current page of data
     return df_page, total, max_page, df  # Return page, total, max_page, and full filtered DataFrame
 
 def plot_quantity_trend(df):
@@ -46,15 +37,18 @@ def plot_quantity_trend(df):
         ax.set_axis_off()
         plt.close(fig)
         return fig
-    # Group by date and menuitem, sum quantity sold
-    df_trend = df.groupby(["date", "menuitem"])["quantity_sold"].sum().reset_index()
+    # Group by date and menuitem, sum quantity sold; rollup periods are shown as a per-day average
+    if "days" not in df:
+        df = df.assign(days=1)
+    df_trend = df.groupby(["date", "menuitem"]).agg(quantity_sold=("quantity_sold", "sum"), days=("days", "first")).reset_index()
+    df_trend["quantity_sold"] = df_trend["quantity_sold"] / df_trend["days"]
     # Pivot for plotting: dates as index, menuitems as columns
     pivot = df_trend.pivot(index="date", columns="menuitem", values="quantity_sold").fillna(0)
     fig, ax = plt.subplots(figsize=(12, 3))  # Set figure size
     pivot.plot(ax=ax, marker="o")  # Plot the trend lines
     ax.set_title("Quantity Sold per Item by Date", color="white")  # Set plot title
     ax.set_xlabel("Date", color="white")  # Set x-axis label
-    ax.set_ylabel("Quantity Sold", color="white")  # Set y-axis label
+    ax.set_ylabel("Quantity Sold per Day", color="white")  # Set y-axis label
     ax.tick_params(axis='x', colors='white', rotation=30)  # Style x-axis ticks
     ax.tick_params(axis='y', colors='white')  # Style y-axis ticks
     plt.legend(title="Menu Item", loc="upper left", fontsize=8)  # Add legend
@@ -62,15 +56,11 @@ def plot_quantity_trend(df):
     plt.close(fig)  # Close figure to prevent duplicate display
     return fig  # Return the figure
 
-def sales_details_content():
-    # Construct the path to the sales.json file
-    json_path = os.path.join(os.path.dirname(__file__), "data", "sales.json")
-    # Open and load the JSON data
-    with open(json_path, "r", encoding="utf-8") as f:
-        sales_data = json.load(f)["daily_sales"]
-    # Get all unique dates for the dropdown filter
-    all_dates = sorted({day["date"] for day in sales_data})
+def date_choices():
+    # Dropdown choices: no filter, then every date (and rollup period start) of the current site
+    return [""] + sorted(sales_lines()["date"].unique())
 
+def sales_details_content():
     # Start building the Gradio Blocks UI
     with gr.Blocks(title="Sales Details") as demo:
         gr.Markdown("### Sales Details")  # Section title
@@ -79,7 +69,7 @@ def sales_details_content():
             filter_box = gr.Textbox(label="Search by Menu Item", placeholder="Type to filter...", scale=3)
             # Dropdown for filtering by date
             date_filter = gr.Dropdown(
-                choices=[""] + all_dates,  # Empty string for no filter
+                choices=date_choices(),  # Empty string for no filter
                 label="Filter by Date",
                 value="",
                 scale=1
@@ -94,13 +84,14 @@ def sales_details_content():
             interactive=False,
             label="Sales Details Table",
             render=True,
-            datatype=["str", "str", "int", "float"],
+            datatype=["str", "str", "int", "float", "str"],
             elem_classes="full-width"
         )
         # Plot to display quantity trend
         trend_graph = gr.Plot(plot_quantity_trend(load_sales_details()[3]), elem_classes="full-width")
 
         # Function to update table and plot based on filters and page
+        @instrument
         def update_table(filter_text, date_filter_val, page):
             try:
                 page = int(page)  # Ensure page is integer
@@ -115,28 +106,47 @@ def sales_details_content():
                 plot_quantity_trend(df_all)  # Updated plot
             )
 
+        def reload_table(filter_text, date_filter_val, page):
+            # Page load, refresh and data changes: also re-list the dates of the browser's site
+            dates = date_choices()
+            date_val = date_filter_val if date_filter_val in dates else ""
+            return (*update_table(filter_text, date_val, page), gr.update(choices=dates, value=date_val))
+
         # Update table and plot when filter text changes (reset to page 1)
         filter_box.change(
-            lambda filter_text, date_filter_val, page: update_table(filter_text, date_filter_val, 1),
+            latest(lambda filter_text, date_filter_val, page: update_table(filter_text, date_filter_val, 1), "salesdetails.table", 3),
             [filter_box, date_filter, page_number],
-            [data_table, page_number, trend_graph]
+            [data_table, page_number, trend_graph],
+            trigger_mode="multiple",  # Send every keystroke; latest() debounces and drops stale ones
+            **INTERACTIVE_LANE
         )
         # Update table and plot when date filter changes (reset to page 1)
         date_filter.change(
-            lambda date_filter_val, filter_text, page: update_table(filter_text, date_filter_val, 1),
+            latest(lambda date_filter_val, filter_text, page: update_table(filter_text, date_filter_val, 1), "salesdetails.table", 3, delay=0),
             [date_filter, filter_box, page_number],
-            [data_table, page_number, trend_graph]
+            [data_table, page_number, trend_graph],
+            **INTERACTIVE_LANE
         )
         # Update table and plot when page number changes
         page_number.change(
-            update_table,
+            latest(update_table, "salesdetails.table", 3, delay=0),
             [filter_box, date_filter, page_number],
-            [data_table, page_number, trend_graph]
+            [data_table, page_number, trend_graph],
+            **INTERACTIVE_LANE
         )
         # Refresh button reloads data with current filters and page
         refresh_btn.click(
-            lambda: update_table(filter_box.value, date_filter.value, page_number.value),
-            [],
-            [data_table, page_number, trend_graph]
+            latest(reload_table, "salesdetails.table", 4, delay=0),
+            [filter_box, date_filter, page_number],
+            [data_table, page_number, trend_graph, date_filter],
+            **INTERACTIVE_LANE
+        )
+        # Push updates when sales.json or its rollups change on disk
+        live_refresh(
+            ["sales.json", "sales_rollup.json"],
+            reload_table,
+            [filter_box, date_filter, page_number],
+            [data_table, page_number, trend_graph, date_filter],
+            group="salesdetails.table"
         )
     return demo  # Return the Gradio Blocks app
\ No newline at end of file
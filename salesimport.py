@@ -0,0 +1,37 @@
+import argparse  # Import argparse for the command line options
+import json      # Import json to print the import report
+import os        # Import os to infer the batch format
+import sys       # Import sys for the exit status
+from utils import sites  # Import into one site's data
+from utils.sales_import import FORMATS, parse_batch, import_sales
+
+# Import a batch of POS sale lines into the store, e.g.
+#   python salesimport.py pos-2025-05-14.csv --site hive-kitchen
+# Each line needs date, menuitem and quantity_sold (total_sales_gbp is optional). Valid lines are
+# merged into sales.json as one snapshot; rejected lines are listed with their row number and reason.
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import POS sale lines (CSV or JSONL) into sales.json")
+    parser.add_argument("path", help="CSV or JSONL file with date, menuitem, quantity_sold[, total_sales_gbp]")
+    parser.add_argument("--format", choices=FORMATS, help="Batch format (default: from the file extension)")
+    parser.add_argument("--site", default=None, help=f"Site to import into (default: {sites.DEFAULT_SITE})")
+    parser.add_argument("--dry-run", action="store_true", help="Validate only; don't write anything")
+    parser.add_argument("--json", action="store_true", help="Print the full report as JSON")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ("jsonl" if os.path.splitext(args.path)[1].lower() in (".jsonl", ".ndjson", ".json") else "csv")
+    with open(args.path, "rb") as f:
+        batch = parse_batch(f.read(), fmt)
+    report = import_sales(batch, sites.site_root(args.site), dry_run=args.dry_run)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        verb = "Would import" if args.dry_run else "Imported"
+        print(f"{verb} {report['imported']} of {report['received']} lines; {report['rejected']} rejected.")
+        for error in report["errors"]:
+            print(f"  row {error['row']}: {error['date']} {error['menuitem']}: {error['error']}")
+    return 1 if report["rejected"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
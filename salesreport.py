@@ -1,44 +1,22 @@
 import gradio as gr                # Import Gradio for UI components
-import pandas as pd                # Import pandas for data manipulation
-import json                        # Import json for reading JSON files
-import os                          # Import os for file path operations
 import matplotlib.pyplot as plt    # Import matplotlib for plotting
+from utils.metrics import instrument  # Record latency, errors and row counts for /metrics
+from utils.sales_windows import site_windows, WINDOWS  # Rolling last 7/30/90 day sales in ring buffers
+from utils.site_rollup import rollup   # Per-site sales, waste and forecast totals
+from utils.worker_lanes import interactive, heavy, INTERACTIVE_LANE, HEAVY_LANE  # Run page loads for the browser's site
 
-def load_sales_trend():
-    # Build the path to the sales.json file in the data directory
-    json_path = os.path.join(os.path.dirname(__file__), "data", "sales.json")
-    # Open and load the JSON data
-    with open(json_path, "r", encoding="utf-8") as f:
-        sales_data = json.load(f)["daily_sales"]
-    # Create a DataFrame for daily sales trend
-    df_trend = pd.DataFrame([
-        {"date": day["date"], "total_sales_gbp": day["total_sales_gbp"]}
-        for day in sales_data
-    ])
-    # Convert date column to datetime
-    df_trend["date"] = pd.to_datetime(df_trend["date"])
-    # Sort the DataFrame by date
-    df_trend = df_trend.sort_values("date")
-
-    # Flatten all items_sold for all days into a list of dicts
-    items = []
-    for day in sales_data:
-        for item in day["items_sold"]:
-            items.append({
-                "date": day["date"],
-                "menuitem": item["menuitem"],
-                "quantity_sold": item["quantity_sold"],
-                "total_sales_gbp": item["total_sales_gbp"]
-            })
-    # Create a DataFrame for items sold
-    df_items = pd.DataFrame(items)
-    # Convert date column to datetime
-    df_items["date"] = pd.to_datetime(df_items["date"])
-    return df_trend, df_items
+WINDOWS_REFRESH_INTERVAL = 5  # Seconds between checks for new sales in the rolling windows
 
 def plot_pie(top_items):
     plt.style.use("dark_background")  # Use dark background style for plot
     fig, ax = plt.subplots(figsize=(4, 2))  # Create a figure and axis
+    if top_items.empty:
+        # No sales in the selected window: a pie needs at least one slice
+        ax.text(0.5, 0.5, "No sales to display", ha="center", va="center", fontsize=10, color="white")
+        ax.set_axis_off()
+        fig.patch.set_facecolor("#222")
+        plt.close(fig)
+        return fig
     wedges, texts, autotexts = ax.pie(
         top_items["quantity_sold"],         # Data for pie slices
         labels=top_items["menuitem"],       # Labels for each slice
@@ -52,6 +30,7 @@ def plot_pie(top_items):
     for autotext in autotexts:
         autotext.set_color("white")         # Set percentage text color to white
     fig.patch.set_facecolor("#222")         # Set figure background color
+    plt.close(fig)                          # Close figure so pyplot doesn't keep it alive
     return fig
 
 def plot_bar(top5):
@@ -66,6 +45,7 @@ def plot_bar(top5):
     plt.xticks(rotation=30, ha="right", color="white")                # Rotate x-ticks
     plt.yticks(color="white")                                         # Y-tick color
     fig.patch.set_facecolor("#222")                                   # Set figure background color
+    plt.close(fig)                                                    # Close figure so pyplot doesn't keep it alive
     return fig
 
 def plot_trending_day(df_trend):
@@ -80,15 +60,35 @@ def plot_trending_day(df_trend):
     plt.xticks(rotation=30, ha="right", color="white")               # Rotate x-ticks
     plt.yticks(color="white")                                        # Y-tick color
     fig.patch.set_facecolor("#222")                                  # Set figure background color
+    plt.close(fig)                                                   # Close figure so pyplot doesn't keep it alive
     return fig
 
+@instrument
+def sales_charts(window=WINDOWS[0], windows=None):
+    # Trend line data, the three charts and the per-window totals for the current site's last `window` days.
+    # Pass `windows` when it was just brought up to date, to skip a second version check.
+    if windows is None:
+        windows = site_windows()
+        windows.ensure_current()  # Picks up new snapshots and journaled POS sales
+    df_trend, top_items = windows.window(int(window))
+    top5 = top_items.sort_values("quantity_sold", ascending=False).head(5)
+    return df_trend, plot_pie(top_items), plot_bar(top5), plot_trending_day(df_trend), windows.summary()
+
+def site_rollup_table(progress=None):
+    if progress:
+        progress(0, desc="Summarizing sites...")
+    return rollup()
+
 def sales_trend_content():
-    df_trend, df_items = load_sales_trend()
+    df_trend, pie, bar, trending, summary = sales_charts()
     with gr.Blocks() as demo:
         with gr.Row():
-            gr.Markdown("### Daily Sales Trend (Last 7 Days)")
+            gr.Markdown("### Daily Sales Trend")
+            window = gr.Radio(
+                [(f"Last {w} days", w) for w in WINDOWS], value=WINDOWS[0], label="Window", show_label=False
+            )
         with gr.Row():
-            gr.LinePlot(
+            trend_plot = gr.LinePlot(
                 value=df_trend,
                 x="date",
                 y="total_sales_gbp",
@@ -101,11 +101,37 @@ def sales_trend_content():
             )
         with gr.Row():
             with gr.Column():
-                top_items = df_items.groupby("menuitem")["quantity_sold"].sum().reset_index()
-                gr.Plot(plot_pie(top_items))
+                pie_plot = gr.Plot(pie)
             with gr.Column():
-                top5 = top_items.sort_values("quantity_sold", ascending=False).head(5)
-                gr.Plot(plot_bar(top5))
+                bar_plot = gr.Plot(bar)
             with gr.Column():
-                gr.Plot(plot_trending_day(df_trend))
+                trending_plot = gr.Plot(trending)
+        # Items sold, sales and best seller in each rolling window (windows end at the newest day with sales)
+        summary_table = gr.Dataframe(value=summary, interactive=False, label="Rolling Windows")
+        # Sales, waste and forecast demand across every site, summarized in parallel
+        with gr.Accordion("All Sites", open=False):
+            rollup_btn = gr.Button("Summarize All Sites")
+            rollup_table = gr.Dataframe(interactive=False)
+        rollup_btn.click(heavy(site_rollup_table), None, rollup_table, **HEAVY_LANE)
+
+        outputs = [trend_plot, pie_plot, bar_plot, trending_plot, summary_table]
+        shown = gr.State(None)  # (windows version, window) this session last rendered
+        windows_timer = gr.Timer(WINDOWS_REFRESH_INTERVAL)
+
+        # Re-render only when new sales moved the windows (or another window was picked) since the last render
+        def on_tick(window_val, shown_val):
+            windows = site_windows()
+            windows.ensure_current()  # Picks up new snapshots and journaled POS sales
+            if shown_val == (windows.version, window_val):
+                return [gr.skip()] * (len(outputs) + 1)
+            return [*sales_charts(window_val, windows), (windows.version, window_val)]
+
+        # Render for the site this browser selected, then keep it current
+        gr.on(
+            [demo.load, window.change],
+            interactive(on_tick), [window, shown], outputs + [shown], **INTERACTIVE_LANE
+        )
+        windows_timer.tick(
+            interactive(on_tick), [window, shown], outputs + [shown], show_progress="hidden", **INTERACTIVE_LANE
+        )
     return demo
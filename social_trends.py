@@ -1,19 +1,23 @@
 import gradio as gr
 import json
-import os
 import random
 from datetime import datetime
 import matplotlib.pyplot as plt
 import pandas as pd
+from utils.worker_lanes import heavy, HEAVY_LANE  # Chart regeneration runs on the heavy lane
+from utils.metrics import instrument  # Record latency, errors and row counts for /metrics
+from utils import snapshots  # Trends are published as a new data snapshot
+from utils import trends_store  # Append-only trend history with windowed queries
 
-TRENDS_PATH = os.path.join(os.path.dirname(__file__), "data", "trends.json")
-MENU_PATH = os.path.join(os.path.dirname(__file__), "data", "menu.json")
+TRENDS_FILE = "trends.json"
+MENU_FILE = "menu.json"
 SOCIAL_MEDIA = ["Facebook", "Instagram", "TikTok", "Twitter"]
-TREND_STATUS = ["Trending", "Non-Trending", "Similar"]
+TREND_STATUS = trends_store.STATUSES
+TREND_WINDOW_DAYS = 7  # Window for the moving score and days-trending table
 
 def generate_trends_data():
     # Load menu items
-    with open(MENU_PATH, "r", encoding="utf-8") as f:
+    with open(snapshots.data_path(MENU_FILE), "r", encoding="utf-8") as f:
         menu_items = [item["menuitem"] for item in json.load(f)["menu"]]
     trends_data = []
     for item in menu_items:
@@ -28,15 +32,24 @@ def generate_trends_data():
             trend[f"{platform.lower()}_status"] = status
             trend[f"{platform.lower()}_score"] = score
         trends_data.append(trend)
-    with open(TRENDS_PATH, "w", encoding="utf-8") as f:
-        json.dump({"trends": trends_data}, f, indent=2)
+    with snapshots.publish() as staging:
+        staging.write_records(TRENDS_FILE, "trends", trends_data)
+        # trends.json keeps the latest day; the history published with it keeps every day
+        trends_store.stage(staging, trends_data)
     return trends_data
 
+@instrument
 def load_trends_data():
-    if not os.path.exists(TRENDS_PATH):
+    # Latest day from the trend history (trends.json's rows for snapshots without one)
+    trends = trends_store.latest()
+    if not trends:
         return generate_trends_data()
-    with open(TRENDS_PATH, "r", encoding="utf-8") as f:
-        return json.load(f)["trends"]
+    return trends
+
+@instrument
+def load_trend_window(days=TREND_WINDOW_DAYS):
+    # Moving average score and days trending per platform over the last `days` days of history
+    return trends_store.moving_summary(days)
 
 def plot_trend_graph(trends_data, platform):
     df = pd.DataFrame(trends_data)
@@ -77,6 +90,8 @@ def social_trends_page():
         with gr.Row():
             tiktok_plot = gr.Plot(label="TikTok Trends")
             twitter_plot = gr.Plot(label="Twitter Trends")
+        window_table = gr.Dataframe(label=f"{TREND_WINDOW_DAYS}-Day Trend Window", interactive=False)
+        @instrument
         def on_generate():
             data = generate_trends_data()
             return (
@@ -85,7 +100,9 @@ def social_trends_page():
                 plot_trend_graph(data, "Instagram"),
                 plot_trend_graph(data, "TikTok"),
                 plot_trend_graph(data, "Twitter"),
+                load_trend_window(),
             )
+        @instrument
         def on_load():
             data = load_trends_data()
             return (
@@ -93,15 +110,18 @@ def social_trends_page():
                 plot_trend_graph(data, "Instagram"),
                 plot_trend_graph(data, "TikTok"),
                 plot_trend_graph(data, "Twitter"),
+                load_trend_window(),
             )
         generate_btn.click(
-            fn=on_generate,
+            fn=heavy(on_generate),
             inputs=[],
-            outputs=[output, facebook_plot, instagram_plot, tiktok_plot, twitter_plot]
+            outputs=[output, facebook_plot, instagram_plot, tiktok_plot, twitter_plot, window_table],
+            **HEAVY_LANE
         )
         demo.load(
-            fn=on_load,
+            fn=heavy(on_load),
             inputs=[],
-            outputs=[facebook_plot, instagram_plot, tiktok_plot, twitter_plot]
+            outputs=[facebook_plot, instagram_plot, tiktok_plot, twitter_plot, window_table],
+            **HEAVY_LANE
         )
     return demo
\ No newline at end of file
@@ -1,14 +1,21 @@
 import gradio as gr
 import json
 import os
-import random
+import secrets
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime, timedelta
+import numpy as np
+from utils.worker_lanes import heavy, HEAVY_LANE  # Generation runs on the heavy lane
+from utils.metrics import instrument  # Record latency, errors and row counts for /metrics
+from utils import snapshots  # Generated files are published as one atomic snapshot
+from utils import retention  # Rollup files reset along with the generated history
+from utils.sale_events import carry_events  # Live sale events of the replaced data stop applying
 
-DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
-INVENTORY_PATH = os.path.join(DATA_DIR, "inventory.json")
-MENU_PATH = os.path.join(DATA_DIR, "menu.json")
-SALES_PATH = os.path.join(DATA_DIR, "sales.json")
-LEFTOVER_PATH = os.path.join(DATA_DIR, "leftover.json")
+WASTE_REASONS = ["Overproduction", "Spoilage", "Customer Return"]
+SHARD_DAYS = 30          # Days per generation shard (fixed so a seed always yields the same data)
+WRITE_CHUNK_ROWS = 5000  # Records serialized per write call
 
 MATERIALS = [
     ("Flour", "Dry Goods", "kg"),
@@ -94,132 +101,231 @@ MENU_ITEMS_TEMPLATE = [
     }
 ]
 
-def generate_test_data(days):
+def _menu_catalog(items):
+    # Catalog of `items` distinct menu items, cycling the templates and numbering the repeats
+    catalog = []
+    for k in range(items):
+        template = MENU_ITEMS_TEMPLATE[k % len(MENU_ITEMS_TEMPLATE)]
+        name = template["menuitem"] if k < len(MENU_ITEMS_TEMPLATE) else f"{template['menuitem']} #{k // len(MENU_ITEMS_TEMPLATE) + 1}"
+        catalog.append(dict(template, menuitem=name))
+    return catalog
+
+def _generate_inventory(rng, today, days):
+    # One stock lot per material; purchase within the generated range, expiry after the next purchase
+    inventory = []
+    for material, mat_type, unit in MATERIALS:
+        purchase_date = today - timedelta(days=int(rng.integers(10, max(days, 10) + 1)))
+        next_purchase_date = purchase_date + timedelta(days=30)
+        expiry_date = next_purchase_date + timedelta(days=int(rng.integers(1, 91)))
+        qty = int(rng.integers(100, 201))
+        remaining = int(rng.integers(1, qty + 1))
+        inventory.append({
+            "material": material,
+            "type": mat_type,
+            "quantity": f"{qty} {unit}",
+            "purchase_date": purchase_date.strftime("%Y-%m-%d"),
+            "remaining_stock": f"{remaining} {unit}",
+            "next_purchase_tentative_date": next_purchase_date.strftime("%Y-%m-%d"),
+            "expiry_date": expiry_date.strftime("%Y-%m-%d")
+        })
+    for item in inventory:
+        pd = datetime.strptime(item["purchase_date"], "%Y-%m-%d")
+        nptd = datetime.strptime(item["next_purchase_tentative_date"], "%Y-%m-%d")
+        expd = datetime.strptime(item["expiry_date"], "%Y-%m-%d")
+        if not (expd > nptd and nptd == pd + timedelta(days=30)):
+            raise Exception("Inventory date rules violated.")
+    return inventory
+
+def _generate_history(rng, dates, catalog, items_per_day, lines_per_item, day_offset=0):
+    # Vectorized menu, sales and leftover generation; every step is linear in the number of rows.
+    # Each day prepares `items_per_day` catalog items (rotating through the catalog), and each
+    # prepared item sells in up to `lines_per_item` POS lines. `day_offset` is the index of
+    # dates[0] within the whole range, so shards continue the same rotation.
+    days, items = len(dates), len(catalog)
+    items_per_day = min(items_per_day, items)
+    # One menu entry per (day, item) prepared that day
+    entry_day = np.repeat(np.arange(days), items_per_day)
+    entry_item = ((entry_day + day_offset) * items_per_day + np.tile(np.arange(items_per_day), days)) % items
+    available_stock = rng.integers(50, 151, size=len(entry_day))
+    price = np.round(rng.uniform(5, 30, size=len(entry_day)), 2)
+    # Sold quantity per entry never exceeds what was prepared, then split it over POS lines
+    sold = rng.integers(0, available_stock + 1)
+    if lines_per_item > 1:
+        line_qty = rng.multinomial(sold, [1 / lines_per_item] * lines_per_item)
+    else:
+        line_qty = sold[:, None]
+    line_entry, line_slot = np.nonzero(line_qty)  # Drop empty lines; entries stay in day order
+    line_qty = line_qty[line_entry, line_slot]
+    line_total = np.round(line_qty * price[line_entry], 2)
+    day_total = np.round(np.bincount(entry_day[line_entry], weights=line_qty * price[line_entry], minlength=days), 2)
+    # Waste on ~30% of entries with stock left over, never more than what remained
+    remaining = available_stock - sold
+    wasted_mask = (remaining > 0) & (rng.random(len(entry_day)) < 0.3)
+    wasted_entry = np.nonzero(wasted_mask)[0]
+    wasted = rng.integers(1, remaining[wasted_entry] + 1)
+    reasons = rng.integers(0, len(WASTE_REASONS), size=len(wasted_entry))
+    if (sold > available_stock).any() or (wasted > remaining[wasted_entry]).any():
+        raise Exception("Sales or waste exceed available stock.")
+
+    # Build the JSON records from plain Python lists (one pass per output file)
+    entry_day_list, entry_item_list = entry_day.tolist(), entry_item.tolist()
+    menu_items = [
+        {
+            "menuitem": catalog[item]["menuitem"],
+            "type": catalog[item].get("type", ""),
+            "ingredient": catalog[item]["ingredient"],
+            "inventories_used": catalog[item]["inventories_used"],
+            "price": p,
+            "available_stock": stock,
+            "prepared_date": dates[day],
+            "image_url": f"https://placehold.co/120x120?text={catalog[item]['menuitem'].replace(' ', '+')}"
+        }
+        for day, item, p, stock in zip(entry_day_list, entry_item_list, price.tolist(), available_stock.tolist())
+    ]
+    daily_sales = [{"date": date, "total_sales_gbp": total, "items_sold": []} for date, total in zip(dates, day_total.tolist())]
+    for entry, qty, total in zip(line_entry.tolist(), line_qty.tolist(), line_total.tolist()):
+        daily_sales[entry_day_list[entry]]["items_sold"].append({
+            "menuitem": catalog[entry_item_list[entry]]["menuitem"],
+            "quantity_sold": qty,
+            "total_sales_gbp": total
+        })
+    leftover_records = [
+        {
+            "date": dates[entry_day_list[entry]],
+            "menuitem": catalog[entry_item_list[entry]]["menuitem"],
+            "sold_quantity": sold_qty,
+            "wasted_quantity": waste,
+            "reason": WASTE_REASONS[reason]
+        }
+        for entry, sold_qty, waste, reason in zip(wasted_entry.tolist(), sold[wasted_entry].tolist(), wasted.tolist(), reasons.tolist())
+    ]
+    return menu_items, daily_sales, leftover_records
+
+def _json_line(record):
+    # Compact, key-order-stable JSON for one record
+    return json.dumps(record, separators=(",", ":"))
+
+def _write_jsonl(path, records):
+    # Stream records to a JSONL file in chunks of WRITE_CHUNK_ROWS lines
+    with open(path, "w", encoding="utf-8") as f:
+        for start in range(0, len(records), WRITE_CHUNK_ROWS):
+            f.write("".join(_json_line(r) + "\n" for r in records[start:start + WRITE_CHUNK_ROWS]))
+
+def _merge_shards(part_paths, path, key):
+    # Concatenate JSONL shards into {"key": [...]} with one record per line, so the result is
+    # both regular JSON for json.load and streamable line by line (same layout as snapshots.write_records)
+    with open(path, "w", encoding="utf-8") as out:
+        out.write('{"%s":[' % key)
+        separator = "\n"
+        for part_path in part_paths:
+            with open(part_path, "r", encoding="utf-8") as part:
+                for line in part:
+                    out.write(separator + line.rstrip("\n"))
+                    separator = ",\n"
+        out.write("\n]}\n")
+
+def _generate_shard(shard_index, seed_seq, dates, day_offset, items, items_per_day, lines_per_item, shard_dir):
+    # Runs in a worker process: generate one date range and stream it to JSONL part files.
+    # Each shard draws from its own child SeedSequence, so output does not depend on worker count.
+    rng = np.random.default_rng(seed_seq)
+    menu_items, daily_sales, leftover_records = _generate_history(
+        rng, dates, _menu_catalog(items), items_per_day, lines_per_item, day_offset
+    )
+    for name, records in (("menu", menu_items), ("sales", daily_sales), ("leftover", leftover_records)):
+        _write_jsonl(os.path.join(shard_dir, f"{name}.{shard_index:05d}.jsonl"), records)
+    return len(menu_items), sum(len(day["items_sold"]) for day in daily_sales), len(leftover_records)
+
+@instrument
+def generate_test_data(days, items=len(MENU_ITEMS_TEMPLATE), items_per_day=1, lines_per_item=1,
+                       seed=None, end_date=None, workers=None, data_root=None, progress=None):
+    # Generate `days` of history ending at `end_date` (YYYY-MM-DD, default today).
+    # The range is split into SHARD_DAYS shards generated in parallel worker processes and merged,
+    # so the same seed and end date always produce byte-identical files. All four files are
+    # published together as one new snapshot; nothing is visible to readers until it completes.
+    # progress(fraction, desc) is supplied by the heavy lane; it raises once the job is cancelled
+    progress = progress or (lambda fraction, desc=None: None)
+    shard_dir = None
     try:
-        today = datetime.now()
-        # 1. Generate Inventory Data (unchanged)
-        inventory = []
-        for material, mat_type, unit in MATERIALS:
-            purchase_days_ago = random.randint(10, days)
-            purchase_date = today - timedelta(days=purchase_days_ago)
-            purchase_date_str = purchase_date.strftime("%Y-%m-%d")
-            next_purchase_date = purchase_date + timedelta(days=30)
-            next_purchase_date_str = next_purchase_date.strftime("%Y-%m-%d")
-            expiry_date = next_purchase_date + timedelta(days=random.randint(1, 90))
-            expiry_date_str = expiry_date.strftime("%Y-%m-%d")
-            qty = random.randint(100, 200)
-            remaining = random.randint(1, qty)
-            quantity = f"{qty} {unit}"
-            remaining_stock = f"{remaining} {unit}"
-            inventory.append({
-                "material": material,
-                "type": mat_type,
-                "quantity": quantity,
-                "purchase_date": purchase_date_str,
-                "remaining_stock": remaining_stock,
-                "next_purchase_tentative_date": next_purchase_date_str,
-                "expiry_date": expiry_date_str
-            })
-        for item in inventory:
-            pd = datetime.strptime(item["purchase_date"], "%Y-%m-%d")
-            nptd = datetime.strptime(item["next_purchase_tentative_date"], "%Y-%m-%d")
-            expd = datetime.strptime(item["expiry_date"], "%Y-%m-%d")
-            if not (expd > nptd and nptd == pd + timedelta(days=30)):
-                raise Exception("Inventory date rules violated.")
-
-        with open(INVENTORY_PATH, "w", encoding="utf-8") as f:
-            json.dump({"inventory": inventory}, f, indent=2)
-
-        # 2. Generate Menu Data (cycle menu items across all days)
-        menu_items = []
-        menu_dates = []
-        for i in range(days):
-            template = MENU_ITEMS_TEMPLATE[i % len(MENU_ITEMS_TEMPLATE)]
-            available_stock = random.randint(50, 150)
-            price = round(random.uniform(5, 30), 2)
-            prepared_date = (today - timedelta(days=(days - i - 1))).strftime("%Y-%m-%d")
-            menu_dates.append(prepared_date)
-            menuitem_text = template["menuitem"].replace(" ", "+")
-            image_url = f"https://placehold.co/120x120?text={menuitem_text}"
-            menu_items.append({
-                "menuitem": template["menuitem"],
-                "type": template.get("type", ""),
-                "ingredient": template["ingredient"],
-                "inventories_used": template["inventories_used"],
-                "price": price,
-                "available_stock": available_stock,
-                "prepared_date": prepared_date,
-                "image_url": image_url
-            })
-
-        with open(MENU_PATH, "w", encoding="utf-8") as f:
-            json.dump({"menu": menu_items}, f, indent=2)
-
-        # 3. Generate Sales Data (sales date matches menu prepared_date)
-        daily_sales = []
-        for i in range(days):
-            date = (today - timedelta(days=days - i - 1)).strftime("%Y-%m-%d")
-            items_sold = []
-            total_sales_gbp = 0
-            for item in menu_items:
-                if date == item["prepared_date"]:
-                    max_qty = item["available_stock"]
-                    qty = random.randint(0, max_qty)
-                    if qty > 0:
-                        item_total = qty * float(item.get("price", 5.0))
-                        items_sold.append({
-                            "menuitem": item["menuitem"],
-                            "quantity_sold": qty,
-                            "total_sales_gbp": round(item_total, 2)
-                        })
-                        total_sales_gbp += item_total
-            daily_sales.append({
-                "date": date,
-                "total_sales_gbp": round(total_sales_gbp, 2),
-                "items_sold": items_sold
-            })
-        with open(SALES_PATH, "w", encoding="utf-8") as f:
-            json.dump({"daily_sales": daily_sales}, f, indent=2)
-
-        # 4. Generate Leftover Data (date matches prepared_date)
-        leftover_records = []
-        for i in range(days):
-            date = (today - timedelta(days=days - i - 1)).strftime("%Y-%m-%d")
-            for item in menu_items:
-                if date == item["prepared_date"]:
-                    sold_quantity = 0
-                    for sale in daily_sales:
-                        if sale["date"] == date:
-                            for sold in sale["items_sold"]:
-                                if sold["menuitem"] == item["menuitem"]:
-                                    sold_quantity = sold["quantity_sold"]
-                    max_leftover = item["available_stock"] - sold_quantity
-                    if max_leftover > 0 and random.random() < 0.3:
-                        wasted_quantity = random.randint(1, max_leftover)
-                        reason = random.choice(["Overproduction", "Spoilage", "Customer Return"])
-                        leftover_records.append({
-                            "date": date,
-                            "menuitem": item["menuitem"],
-                            "sold_quantity": sold_quantity,
-                            "wasted_quantity": wasted_quantity,
-                            "reason": reason
-                        })
-        with open(LEFTOVER_PATH, "w", encoding="utf-8") as f:
-            json.dump({"leftover": leftover_records}, f, indent=2)
-
-        return "Test data generated successfully for inventory, menu, sales, and leftover."
+        days, items, items_per_day, lines_per_item = int(days), int(items), int(items_per_day), int(lines_per_item)
+        end = datetime.strptime(end_date, "%Y-%m-%d") if end_date else datetime.now()
+        dates = [(end - timedelta(days=days - i - 1)).strftime("%Y-%m-%d") for i in range(days)]
+        # A blank seed picks a random 32-bit one; it is reported back so the run can be reproduced
+        seed = secrets.randbelow(2 ** 32) if seed in (None, "") else int(seed)
+        root_seq = np.random.SeedSequence(seed)
+        shard_starts = list(range(0, days, SHARD_DAYS))
+        inventory_seq, *shard_seqs = root_seq.spawn(1 + len(shard_starts))
+
+        progress(0.0, desc="Generating inventory")
+        # 1. Generate Inventory Data
+        inventory = _generate_inventory(np.random.default_rng(inventory_seq), end, days)
+
+        # Leaving the block publishes the snapshot (nothing is published if anything raises)
+        with snapshots.publish(data_root) as staging:
+            # 2-4. Generate Menu, Sales and Leftover Data shard by shard (dates match menu prepared_date)
+            shard_dir = tempfile.mkdtemp(prefix=".shards-", dir=os.path.dirname(staging.dir))
+            _write_jsonl(os.path.join(shard_dir, "inventory.00000.jsonl"), inventory)
+            workers = int(workers) if workers else min(len(shard_starts), os.cpu_count() or 1)
+            totals = [0, 0, 0]
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [
+                    executor.submit(_generate_shard, index, shard_seqs[index], dates[start:start + SHARD_DAYS],
+                                    start, items, items_per_day, lines_per_item, shard_dir)
+                    for index, start in enumerate(shard_starts)
+                ]
+                try:
+                    for done, future in enumerate(as_completed(futures), start=1):
+                        totals = [t + n for t, n in zip(totals, future.result())]
+                        progress(0.8 * done / len(futures), desc=f"Generated {done}/{len(futures)} shards")
+                except BaseException:
+                    executor.shutdown(cancel_futures=True)  # Don't start the remaining shards
+                    raise
+
+            # Merge the shards in date order into the data files
+            for step, (name, key) in enumerate(
+                (("inventory", "inventory"), ("menu", "menu"), ("sales", "daily_sales"), ("leftover", "leftover"))
+            ):
+                progress(0.8 + 0.05 * step, desc=f"Writing {name}")
+                part_paths = sorted(os.path.join(shard_dir, f) for f in os.listdir(shard_dir) if f.startswith(name + "."))
+                _merge_shards(part_paths, staging.path(f"{name}.json"), key)
+            # The generated history replaces any compacted history too
+            staging.write_records(retention.SALES_ROLLUP_FILE, "sales_rollup", [])
+            staging.write_records(retention.LEFTOVER_ROLLUP_FILE, "leftover_rollup", [])
+            # Live sale events were sold against the old data; none carry over to the new history
+            carry_events(staging, covered=lambda event: True)
+
+        return (
+            "Test data generated successfully for inventory, menu, sales, and leftover.\n"
+            f"{totals[0]} menu entries, {totals[1]} sale lines, {totals[2]} leftover records.\n"
+            f"Reproduce with seed {seed} and end date {end.strftime('%Y-%m-%d')}."
+        )
     except Exception as e:
         return f"Error: {str(e)}"
+    finally:
+        if shard_dir:
+            shutil.rmtree(shard_dir, ignore_errors=True)
 
 def test_data_gen_content():
     with gr.Blocks(title="Test Data Generator") as demo:
         gr.Markdown("## Generate Test Data for Inventory, Menu, Sales, and Leftover")
-        days_slider = gr.Slider(7, 180, value=30, step=1, label="Generate data for last N days")
+        days_slider = gr.Slider(7, 3650, value=30, step=1, label="Generate data for last N days")
+        with gr.Accordion("Load-test options", open=False):
+            with gr.Row():
+                items_box = gr.Number(value=len(MENU_ITEMS_TEMPLATE), label="Distinct menu items", precision=0, minimum=1)
+                per_day_box = gr.Number(value=1, label="Items prepared per day", precision=0, minimum=1)
+                lines_box = gr.Number(value=1, label="Sale lines per item per day", precision=0, minimum=1)
+            with gr.Row():
+                seed_box = gr.Number(value=None, label="Seed (blank for random)", precision=0)
+                end_date_box = gr.Textbox(label="End date (YYYY-MM-DD, blank for today)", placeholder="YYYY-MM-DD")
         output = gr.Textbox(label="Status", interactive=False, lines=3)
-        generate_btn = gr.Button("Generate Test Data")
-        generate_btn.click(
-            fn=generate_test_data,
-            inputs=days_slider,
-            outputs=output
+        with gr.Row():
+            generate_btn = gr.Button("Generate Test Data")
+            cancel_btn = gr.Button("Cancel")
+        generate_event = generate_btn.click(
+            fn=heavy(generate_test_data),
+            inputs=[days_slider, items_box, per_day_box, lines_box, seed_box, end_date_box],
+            outputs=output,
+            **HEAVY_LANE
         )
+        # Cancelling stops the generator at its next progress checkpoint
+        cancel_btn.click(fn=None, inputs=None, outputs=None, cancels=[generate_event])
     return demo
\ No newline at end of file
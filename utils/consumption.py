@@ -0,0 +1,129 @@
+import json       # Import json to read menu, sales and inventory
+import os         # Import os for file path operations
+import threading  # Import threading to guard the cached projection
+from datetime import datetime, timedelta  # Import datetime for depletion dates
+import numpy as np   # Import NumPy for the usage matrix and the matrix multiply
+import pandas as pd  # Import pandas for the projection table
+from utils import snapshots  # Read data from the pinned snapshot
+from utils.data_watcher import data_version  # Rebuild the projection only when its inputs change
+from utils.retention import day_lines, SALES_ROLLUP_FILE  # Day-level sales survive compaction as the daily tier
+
+RECENT_DAYS = 14  # Days of sales used for the current daily consumption rate
+
+_projections = {}           # Site root -> (data version, depletion DataFrame)
+_lock = threading.Lock()    # Protects _projections
+
+def _load(name, key):
+    path = snapshots.data_path(name)
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f).get(key, [])
+
+def usage_matrix(menu):
+    # Items x materials matrix with 1 where a menu item uses a material (from inventories_used).
+    # Built from (row, col) coordinates; dense storage is a few MB even for 1000 x 1000.
+    items = sorted({entry["menuitem"] for entry in menu})
+    materials = sorted({m for entry in menu for m in entry.get("inventories_used", [])})
+    item_index = {item: i for i, item in enumerate(items)}
+    material_index = {material: j for j, material in enumerate(materials)}
+    rows, cols = [], []
+    for entry in menu:
+        for material in entry.get("inventories_used", []):
+            rows.append(item_index[entry["menuitem"]])
+            cols.append(material_index[material])
+    matrix = np.zeros((len(items), len(materials)))
+    matrix[rows, cols] = 1.0
+    return items, materials, matrix
+
+def sales_matrix(sales, items):
+    # Dates x items matrix of portions sold, summed over sale lines (DataFrame of date, menuitem, quantity_sold)
+    item_index = {item: i for i, item in enumerate(items)}
+    lines = [
+        (date, item_index[menuitem], quantity)
+        for date, menuitem, quantity in zip(sales["date"], sales["menuitem"], sales["quantity_sold"])
+        if menuitem in item_index
+    ]
+    dates = sorted({date for date, _, _ in lines})
+    date_index = {date: d for d, date in enumerate(dates)}
+    matrix = np.zeros((len(dates), len(items)))
+    if lines:
+        d, i, q = zip(*lines)
+        np.add.at(matrix, ([date_index[x] for x in d], list(i)), q)
+    return dates, matrix
+
+def _stock_amounts(inventory):
+    # One row per material: quantities parsed from "93 kg"-style strings, lots combined
+    df = pd.DataFrame(inventory, columns=["material", "type", "quantity", "purchase_date", "remaining_stock", "next_purchase_tentative_date"])
+    df["unit"] = df["remaining_stock"].str.extract(r"([^\d.\s].*)$", expand=False).str.strip().fillna("")
+    for column in ("quantity", "remaining_stock"):
+        df[column] = pd.to_numeric(df[column].str.extract(r"([\d.]+)", expand=False), errors="coerce").fillna(0)
+    return df.groupby("material", as_index=False).agg(
+        type=("type", "first"), unit=("unit", "first"), quantity=("quantity", "sum"),
+        remaining_stock=("remaining_stock", "sum"), purchase_date=("purchase_date", "min"),
+        next_purchase_tentative_date=("next_purchase_tentative_date", "min"),
+    )
+
+def project_depletion(menu, sales, inventory, today=None):
+    # Material consumption = (dates x items sales) @ (items x materials usage), in portions.
+    # Units per portion are calibrated per material from stock used since its purchase date
+    # (quantity - remaining_stock) over portions sold since then; the last RECENT_DAYS of sales
+    # give the daily rate and the date remaining_stock runs out.
+    today = today or datetime.now().date()
+    items, materials, usage = usage_matrix(menu)
+    dates, sold = sales_matrix(sales, items)
+    consumption = sold @ usage  # dates x materials, portions that needed each material
+
+    stock = _stock_amounts(inventory)
+    material_col = {m: j for j, m in enumerate(materials)}
+    cols = stock["material"].map(material_col)
+    known = cols.notna().to_numpy()
+    cols = cols.fillna(0).astype(int).to_numpy()
+
+    dates_arr = np.array(dates, dtype="datetime64[D]")
+    purchase = stock["purchase_date"].to_numpy(dtype="datetime64[D]")
+    # Portions per material since its purchase (cumulative sums over the date axis, then one lookup)
+    cumulative = np.vstack([np.zeros((1, len(materials))), np.cumsum(consumption, axis=0)])
+    since = np.searchsorted(dates_arr, purchase)
+    portions_since = cumulative[-1, cols] - cumulative[since, cols]
+    used = np.maximum(stock["quantity"].to_numpy() - stock["remaining_stock"].to_numpy(), 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        per_portion = np.where(portions_since > 0, used / portions_since, 0.0)
+
+    recent = consumption[-RECENT_DAYS:].mean(axis=0) if len(dates) else np.zeros(len(materials))
+    daily_usage = np.where(known, recent[cols] * per_portion, 0.0)
+    with np.errstate(divide="ignore"):
+        days_left = np.where(daily_usage > 0, stock["remaining_stock"].to_numpy() / daily_usage, np.inf)
+
+    depletion = [
+        (today + timedelta(days=int(d))).strftime("%Y-%m-%d") if np.isfinite(d) else "" for d in days_left
+    ]
+    next_purchase = stock["next_purchase_tentative_date"].to_numpy()
+    status = np.select(
+        [next_purchase < today.strftime("%Y-%m-%d"), ~np.isfinite(days_left), np.array(depletion) < next_purchase],
+        ["Purchase overdue", "No recent use", "Runs out before next purchase"],
+        default="OK"
+    )
+    return pd.DataFrame({
+        "material": stock["material"],
+        "type": stock["type"],
+        "remaining_stock": stock["remaining_stock"].astype(str) + " " + stock["unit"],
+        "daily_usage": daily_usage.round(2).astype(str) + " " + stock["unit"],
+        "days_left": np.where(np.isfinite(days_left), np.floor(days_left), np.nan),
+        "depletion_date": depletion,
+        "next_purchase_tentative_date": stock["next_purchase_tentative_date"],
+        "status": status,
+    }).sort_values(["days_left", "material"], na_position="last").reset_index(drop=True)
+
+def depletion_projection():
+    # Projection for the current site's pinned snapshot; recomputed only after menu, sales or inventory change
+    root = snapshots.default_root()
+    version = (data_version("menu.json", "sales.json", SALES_ROLLUP_FILE, "inventory.json"), datetime.now().date())
+    with _lock:
+        cached = _projections.get(root)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+    projection = project_depletion(_load("menu.json", "menu"), day_lines(), _load("inventory.json", "inventory"))
+    with _lock:
+        _projections[root] = (version, projection)
+    return projection
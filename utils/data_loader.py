@@ -1,9 +1,11 @@
 import json  # Import the json module for parsing JSON files
-import os    # Import the os module for file path operations
+from utils.metrics import instrument  # Record latency, errors and row counts for /metrics
+from utils.snapshots import data_path  # Resolve data files in the pinned snapshot
 
+@instrument
 def load_inventory():
-    # Construct the path to the inventory.json file located in the ../data directory
-    json_path = os.path.join(os.path.dirname(__file__), '..', 'data', 'inventory.json')
+    # Construct the path to the inventory.json file in the current data snapshot
+    json_path = data_path('inventory.json')
     # Open the JSON file in read mode
     with open(json_path, 'r') as f:
         data = json.load(f)  # Load the JSON data from the file into a Python dictionary
@@ -0,0 +1,70 @@
+import os         # Import os for file path operations
+import threading  # Import threading to guard the shared version counters
+from watchdog.events import FileSystemEventHandler  # Base class for file system event callbacks
+from watchdog.observers import Observer              # Background thread that watches a directory
+from utils import snapshots  # Published snapshots record which version last wrote each file
+
+# Directory holding the base JSON data files of the default site
+DATA_DIR = snapshots.DATA_DIR
+
+_versions = {}             # (site root, file name) -> number of in-place edits to the base files since startup
+_lock = threading.Lock()   # Protects _versions, _observer, _watched and _manifests
+_observer = None           # Watchdog observer, started lazily on first use
+_watched = set()           # Site roots the observer watches
+_manifests = {}            # Site root -> (snapshot version, {file name: version that wrote it})
+
+def bump_version(name, root=None):
+    # Record that a data file has changed so every page watching it re-queries
+    key = (root or DATA_DIR, name)
+    with _lock:
+        _versions[key] = _versions.get(key, 0) + 1
+
+class _DataFileHandler(FileSystemEventHandler):
+    def __init__(self, root):
+        self.root = root
+
+    def on_any_event(self, event):
+        if event.is_directory:
+            return
+        # Moves report both the old and the new path; both files have changed
+        for path in (event.src_path, getattr(event, "dest_path", "")):
+            name = os.path.basename(path)
+            if name.endswith(".json"):
+                bump_version(name, self.root)
+
+def start_watcher(root=None):
+    # Watch a site's base data directory for hand edits (safe to call many times).
+    # Published snapshots are never edited in place, so they need no watching.
+    global _observer
+    root = root or snapshots.default_root()
+    with _lock:
+        if root in _watched:
+            return
+        if _observer is None:
+            _observer = Observer()
+            _observer.daemon = True
+            _observer.start()
+        _observer.schedule(_DataFileHandler(root), root, recursive=False)
+        _watched.add(root)
+
+def _snapshot_files(root):
+    # File versions of the snapshot this request reads; the manifest is only re-read after a publish
+    version = snapshots.pinned_version(root)
+    with _lock:
+        cached = _manifests.get(root)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+    files = snapshots.read_manifest(version, root)["files"]
+    with _lock:
+        _manifests[root] = (version, files)
+    return files
+
+def data_version(*names):
+    # Return the current versions of the given data files (e.g. "inventory.json") of the current
+    # site; a value changes whenever a snapshot rewrites that file or the base file is edited by
+    # hand. Versions of different sites never compare equal.
+    root = snapshots.default_root()
+    start_watcher(root)
+    files = _snapshot_files(root)
+    with _lock:
+        return (root,) + tuple((files.get(name, snapshots.BASE_VERSION), _versions.get((root, name), 0)) for name in names)
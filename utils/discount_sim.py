@@ -0,0 +1,118 @@
+import json       # Import json to read menu and sales
+import os         # Import os for file path operations
+import threading  # Import threading to guard the cached history model
+from datetime import datetime  # Import datetime for the current trading hour
+import numpy as np   # Import NumPy for the vectorized simulation
+import pandas as pd  # Import pandas for the history model and the result table
+from utils import snapshots  # Read history from the pinned data snapshot
+from utils.data_watcher import data_version  # Rebuild the history model only when data changes
+from utils.retention import day_lines, SALES_ROLLUP_FILE  # Day-level sales survive compaction as the daily tier
+from utils.sale_events import distinct_events  # Timestamped POS events give the hourly curve
+
+OPEN_HOUR, CLOSE_HOUR = 8, 22  # Trading hours; stock left at close is wasted
+HOURS = np.arange(OPEN_HOUR, CLOSE_HOUR)
+START_TIMES = {"12PM": 12, "3PM": 15, "5PM": 17, "7PM": 19, "9PM": 21}  # Discount start options on the page
+DISCOUNTS = np.array([0] + list(range(25, 101, 5)))  # 0% is the no-discount baseline
+DEFAULT_ELASTICITY = -1.5  # Used when history is too thin to fit one
+MAX_UPLIFT = 5.0           # Demand multiplier cap
+MAX_DEMAND_DISCOUNT = 0.95 # Demand stops responding beyond this; "free to go" only gives away revenue
+MIN_EVENTS = 50            # Timestamped sale events needed to trust the observed hourly curve
+# Share of a day's demand per trading hour when no timestamped sales are available (lunch and dinner peaks)
+DEFAULT_HOURLY_CURVE = np.array([2, 4, 6, 9, 14, 12, 7, 5, 6, 9, 11, 8, 5, 2], dtype=float)
+
+_models = {}              # Site root -> (data version, history model)
+_lock = threading.Lock()  # Protects _model
+
+def _load(name, key):
+    path = snapshots.data_path(name)
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f).get(key, [])
+
+def _fit_elasticity(menu, sold):
+    # Slope of log(sell-through) on log(price) across menu entries, clipped to a sane range
+    if menu.empty:
+        return DEFAULT_ELASTICITY
+    entries = menu.merge(sold, on=["prepared_date", "menuitem"], how="left").fillna({"quantity_sold": 0})
+    entries = entries[(entries["quantity_sold"] > 0) & (entries["available_stock"] > 0) & (entries["price"] > 0)]
+    if len(entries) < 10 or entries["price"].nunique() < 2:
+        return DEFAULT_ELASTICITY
+    slope = np.polyfit(np.log(entries["price"]), np.log(entries["quantity_sold"] / entries["available_stock"]), 1)[0]
+    return float(np.clip(slope, -3.0, -0.3))
+
+def _hourly_curve():
+    # Share of daily demand per trading hour, from journaled POS event times when there are enough
+    counts = np.zeros(len(HOURS))
+    for event in distinct_events():
+        hour = datetime.fromisoformat(event["recorded_at"]).hour if "recorded_at" in event else None
+        if hour is not None and OPEN_HOUR <= hour < CLOSE_HOUR:
+            counts[hour - OPEN_HOUR] += event["quantity_sold"]
+    curve = counts if counts.sum() >= MIN_EVENTS else DEFAULT_HOURLY_CURVE
+    return curve / curve.sum()
+
+def history_model():
+    # Elasticity, hourly curve and mean daily demand per item; cached per site and data version
+    root = snapshots.default_root()
+    version = data_version("menu.json", "sales.json", SALES_ROLLUP_FILE)
+    with _lock:
+        cached = _models.get(root)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+    menu = pd.DataFrame(_load("menu.json", "menu"), columns=["menuitem", "prepared_date", "price", "available_stock"])
+    sold = day_lines().rename(columns={"date": "prepared_date"}).groupby(
+        ["prepared_date", "menuitem"], as_index=False
+    )["quantity_sold"].sum()
+    model = {
+        "elasticity": _fit_elasticity(menu, sold),
+        "curve": _hourly_curve(),
+        "daily_demand": sold.groupby("menuitem")["quantity_sold"].mean().to_dict(),
+    }
+    with _lock:
+        _models[root] = (version, model)
+    return model
+
+def simulate_discount_schedules(remaining, from_hour=OPEN_HOUR, waste_penalty=0.5, model=None):
+    # Evaluate every (discount, start time) schedule for all remaining items at once.
+    # remaining: DataFrame with MenuItem, Price, RemainingStock. Demand for each hour from
+    # `from_hour` to close is the item's mean daily demand times the hourly curve, scaled by
+    # (1 - discount) ** elasticity once the discount starts; sales are capped by stock in hour order.
+    # Returns one row per schedule with expected revenue and waste, best score first, where
+    # score = revenue - waste_penalty * value of the wasted stock.
+    model = model or history_model()
+    stock = remaining["RemainingStock"].to_numpy(dtype=float)                       # (I,)
+    price = remaining["Price"].to_numpy(dtype=float)                                # (I,)
+    daily = remaining["MenuItem"].map(model["daily_demand"]).fillna(0).to_numpy()   # (I,)
+    open_hours = (HOURS >= from_hour).astype(float)                                 # (H,)
+    demand = daily[:, None] * (model["curve"] * open_hours)[None, :]                # (I, H)
+
+    starts = np.array(list(START_TIMES.values()))
+    fraction = DISCOUNTS / 100.0
+    active = HOURS[None, :] >= starts[:, None]                                      # (T, H)
+    uplift = np.minimum(np.power(1.0 - np.minimum(fraction, MAX_DEMAND_DISCOUNT), model["elasticity"]), MAX_UPLIFT)  # (D,)
+    multiplier = np.where(active[None, :, :], uplift[:, None, None], 1.0)          # (D, T, H)
+    price_factor = np.where(active[None, :, :], 1.0 - fraction[:, None, None], 1.0)  # (D, T, H)
+
+    # Cumulative demand capped by stock gives units sold in each hour
+    cumulative = np.cumsum(demand[None, None, :, :] * multiplier[:, :, None, :], axis=-1)  # (D, T, I, H)
+    sold_cum = np.minimum(cumulative, stock[None, None, :, None])
+    sold = np.diff(sold_cum, axis=-1, prepend=0.0)
+    revenue = np.einsum("dtih,i,dth->dt", sold, price, price_factor)
+    wasted = stock[None, None, :] - sold_cum[..., -1]                               # (D, T, I)
+    waste_units = wasted.sum(axis=-1)
+    waste_value = wasted @ price
+    score = revenue - waste_penalty * waste_value
+
+    d_index, t_index = np.meshgrid(np.arange(len(DISCOUNTS)), np.arange(len(starts)), indexing="ij")
+    result = pd.DataFrame({
+        "Discount": DISCOUNTS[d_index.ravel()],
+        "StartTime": np.array(list(START_TIMES))[t_index.ravel()],
+        "ExpectedRevenue": revenue.ravel().round(2),
+        "ExpectedWasteUnits": waste_units.ravel().round(1),
+        "ExpectedWasteValue": waste_value.ravel().round(2),
+        "Score": score.ravel().round(2),
+    })
+    # The no-discount baseline is the same for every start time; keep one row of it
+    result = result[(result["Discount"] > 0) | (result["StartTime"] == next(iter(START_TIMES)))]
+    result.loc[result["Discount"] == 0, "StartTime"] = "-"
+    return result.sort_values("Score", ascending=False, kind="stable").reset_index(drop=True)
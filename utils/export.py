@@ -0,0 +1,121 @@
+import csv   # Import csv to format exported rows
+import io    # Import io to buffer one chunk of CSV text
+import json  # Import json for JSONL rows
+import os    # Import os for file checks
+import zlib  # Import zlib for streaming gzip
+from datetime import datetime  # Import datetime for the default forecast range
+import numpy as np   # Import NumPy to truncate predicted quantities
+import pandas as pd  # Import pandas for the nullable predicted quantity column
+from utils import snapshots    # Exports read the pinned snapshot of a site
+from utils.feature_store import feature_table, expected_demand  # Forecast features and predicted demand per (date, menuitem)
+
+CHUNK_ROWS = 5000  # Rows formatted and sent per chunk
+FORMATS = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+
+# Flattened columns of each dataset
+COLUMNS = {
+    "sales": ["date", "menuitem", "quantity_sold", "total_sales_gbp"],
+    "leftover": ["date", "menuitem", "sold_quantity", "wasted_quantity", "reason"],
+    # History older than the detail window, compacted into daily/weekly/monthly totals (utils/retention.py)
+    "sales_rollup": ["tier", "period", "menuitem", "quantity_sold", "total_sales_gbp"],
+    "leftover_rollup": ["tier", "period", "menuitem", "reason", "sold_quantity", "wasted_quantity"],
+}
+
+def _in_range(date, start, end):
+    # ISO dates compare correctly as strings
+    return (not start or date >= start) and (not end or date <= end)
+
+def _sales_rows(path, start, end, items):
+    # One row per item sold per day, straight from the file; days outside the range are skipped unflattened
+    for day in snapshots.iter_records(path, "daily_sales"):
+        if not _in_range(day["date"], start, end):
+            continue
+        for item in day.get("items_sold", []):
+            if items and item["menuitem"] not in items:
+                continue
+            yield (day["date"], item["menuitem"], item["quantity_sold"], item["total_sales_gbp"])
+
+def _leftover_rows(path, start, end, items):
+    for record in snapshots.iter_records(path, "leftover"):
+        if _in_range(record["date"], start, end) and (not items or record["menuitem"] in items):
+            yield tuple(record.get(column) for column in COLUMNS["leftover"])
+
+def _rollup_rows(dataset):
+    # Rollup rows filtered by period start
+    def flatten(path, start, end, items):
+        for record in snapshots.iter_records(path, dataset):
+            if _in_range(record["period"], start, end) and (not items or record["menuitem"] in items):
+                yield tuple(record.get(column) for column in COLUMNS[dataset])
+    return flatten
+
+def _forecast_rows(table, start, end, items):
+    # Predicted quantity plus the features it came from, per (date, menuitem); by default the
+    # forecast horizon (today onwards). The prediction is the Prediction page's model without its
+    # noise, truncated like the page; empty for items that never sold (the page guesses those).
+    start = start or datetime.now().strftime("%Y-%m-%d")
+    table = table.loc[start:end] if end else table.loc[start:]
+    if items:
+        table = table[table.index.get_level_values("menuitem").isin(items)]
+    for offset in range(0, len(table), CHUNK_ROWS):
+        chunk = table.iloc[offset:offset + CHUNK_ROWS].reset_index()
+        chunk.insert(2, "predicted_quantity", pd.Series(np.trunc(expected_demand(chunk))).astype("Int64"))
+        chunk["date"] = chunk["date"].dt.strftime("%Y-%m-%d")
+        chunk = chunk.astype(object).where(chunk.notna(), None)  # NaN -> empty / null
+        yield from chunk.itertuples(index=False, name=None)
+
+def rows(dataset, root, start=None, end=None, items=None):
+    # (columns, iterator of row tuples) for a dataset of a site, read from the snapshot current right now
+    items = set(items or [])
+    if dataset == "forecast":
+        table = snapshots.call_at(root, feature_table)
+        return ["date", "menuitem", "predicted_quantity"] + list(table.columns), _forecast_rows(table, start, end, items)
+    if dataset not in COLUMNS:
+        raise ValueError(f"Unknown dataset {dataset!r}; choose one of {sorted(COLUMNS) + ['forecast']}")
+    path = snapshots.call_at(root, snapshots.data_path, f"{dataset}.json")
+    if not os.path.exists(path):
+        return COLUMNS[dataset], iter(())
+    flatten = {"sales": _sales_rows, "leftover": _leftover_rows}.get(dataset) or _rollup_rows(dataset)
+    return COLUMNS[dataset], flatten(path, start, end, items)
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _encode(columns, rows, fmt):
+    # Formatted text, one chunk of CHUNK_ROWS rows at a time (CSV starts with a header)
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        for chunk in _chunks(rows, CHUNK_ROWS):
+            writer.writerows(chunk)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()  # Header only: nothing matched
+    else:
+        for chunk in _chunks(rows, CHUNK_ROWS):
+            yield "".join(json.dumps(dict(zip(columns, row)), separators=(",", ":")) + "\n" for row in chunk)
+
+def stream(columns, rows, fmt="csv", compress=False):
+    # Bytes of the export; memory use is bounded by one chunk regardless of the export size
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format {fmt!r}; choose one of {sorted(FORMATS)}")
+    encoder = zlib.compressobj(wbits=31) if compress else None  # wbits=31: gzip container
+    for text in _encode(columns, rows, fmt):
+        data = text.encode("utf-8")
+        if encoder is None:
+            yield data
+        else:
+            data = encoder.compress(data)
+            if data:
+                yield data
+    if encoder is not None:
+        yield encoder.flush()
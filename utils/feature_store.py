@@ -0,0 +1,167 @@
+import json       # Import json to read sales, menu and weather
+import os         # Import os for file path operations
+import threading  # Import threading to guard the cached parts
+from datetime import datetime  # Import datetime for the forecast horizon
+import numpy as np   # Import NumPy for the feature matrix
+import pandas as pd  # Import pandas for the joins
+from utils import snapshots     # Read sources from the pinned snapshot
+from utils import trends_store  # Per-platform trend history
+from utils.retention import day_lines, SALES_ROLLUP_FILE  # Day-level sales survive compaction as the daily tier
+from utils.data_watcher import data_version  # Rebuild a part only when its source changes
+from utils.weather_provider import WEATHER_TYPES, FORECAST_DAYS
+
+HISTORY_DAYS = 365  # Days of sales history kept in the table (plus the forecast horizon)
+PLATFORMS = trends_store.PLATFORMS
+PERIODS = ["forenoon", "afternoon"]
+
+# One cached frame per source, keyed by that source's version; the joined table is keyed by all of them
+_parts = {}               # (site root, part name) -> (version, frame)
+_tables = {}              # Site root -> (part versions, feature table)
+_lock = threading.Lock()  # Protects _parts and _tables
+
+def _load(name, key):
+    path = snapshots.data_path(name)
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f).get(key, [])
+
+def _daily_sales():
+    # Quantity sold per (date, menuitem), summed over POS lines and daily rollups
+    frame = day_lines()[["date", "menuitem", "quantity_sold"]].copy()
+    frame["date"] = pd.to_datetime(frame["date"])
+    return frame.groupby(["menuitem", "date"], as_index=False)["quantity_sold"].sum()
+
+def _menu_items():
+    return sorted({entry["menuitem"] for entry in _load("menu.json", "menu")})
+
+def _weather():
+    # One row per date: weather code (index into WEATHER_TYPES, -1 unknown) and temperature per period
+    frame = pd.DataFrame(_load("weather.json", "weather"), columns=["date", "period", "weather", "temperature"])
+    if frame.empty:
+        columns = [f"{p}_{m}" for p in PERIODS for m in ("weather", "temp")] + ["rain_periods", "sunny_periods"]
+        return pd.DataFrame(columns=["date"] + columns).astype({"date": "datetime64[ns]"})
+    frame["date"] = pd.to_datetime(frame["date"])
+    frame["period"] = frame["period"].str.lower()
+    frame["code"] = frame["weather"].map({w: i for i, w in enumerate(WEATHER_TYPES)}).fillna(-1)
+    wide = frame.pivot_table(index="date", columns="period", values=["code", "temperature"], aggfunc="last")
+    result = pd.DataFrame(index=wide.index)
+    for period in PERIODS:
+        result[f"{period}_weather"] = wide.get(("code", period), pd.Series(-1, index=wide.index)).fillna(-1)
+        result[f"{period}_temp"] = wide.get(("temperature", period), pd.Series(np.nan, index=wide.index))
+    codes = result[[f"{p}_weather" for p in PERIODS]]
+    result["rain_periods"] = (codes == WEATHER_TYPES.index("Rain")).sum(axis=1)
+    result["sunny_periods"] = (codes == WEATHER_TYPES.index("Sunny")).sum(axis=1)
+    return result.reset_index()
+
+def _trends():
+    # Per (date, menuitem): each platform's score, whether it is Trending and its 7-day trending share
+    records = trends_store.window(HISTORY_DAYS + FORECAST_DAYS)
+    names = trends_store.items()
+    if len(records) == 0:
+        return pd.DataFrame(columns=["menuitem", "date"])
+    frame = pd.DataFrame({
+        "menuitem": [names[i] for i in records["item"]],
+        "date": pd.to_datetime(records["day"].astype(np.int64) - 719163, unit="D"),  # Ordinal -> datetime
+    })
+    trending = records["status"] == trends_store.STATUSES.index("Trending")
+    for i, platform in enumerate(PLATFORMS):
+        frame[f"{platform}_score"] = records["score"][:, i].astype(float)
+        frame[f"{platform}_trending"] = trending[:, i].astype(float)
+    frame = frame.sort_values(["menuitem", "date"])
+    rolled = frame.set_index("date").groupby("menuitem")[[f"{p}_trending" for p in PLATFORMS]].rolling("7D").mean()
+    for platform in PLATFORMS:
+        frame[f"{platform}_trending_7d"] = rolled[f"{platform}_trending"].to_numpy()
+    return frame.reset_index(drop=True)
+
+def _part(name, version, build):
+    # Cached frame for one source, rebuilt only when its version changes
+    key = (snapshots.default_root(), name)
+    with _lock:
+        cached = _parts.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+    frame = build()
+    with _lock:
+        _parts[key] = (version, frame)
+    return frame
+
+def _as_of(grid, series, columns, strict):
+    # Latest value of `columns` per item at each grid date (strictly before it when `strict`)
+    if series.empty:
+        return pd.DataFrame(np.nan, index=grid.index, columns=columns)
+    merged = pd.merge_asof(
+        grid.sort_values("date"), series[["date", "menuitem"] + columns].sort_values("date"),
+        on="date", by="menuitem", allow_exact_matches=not strict
+    )
+    return merged.set_index(["date", "menuitem"]).reindex(pd.MultiIndex.from_frame(grid))[columns].reset_index(drop=True)
+
+def build_table(sales, items, weather, trends, today):
+    # Join the source frames on a (date, menuitem) grid of recent sales dates plus the forecast horizon
+    horizon = pd.date_range(pd.Timestamp(today).normalize(), periods=FORECAST_DAYS)
+    history = pd.DatetimeIndex(sales["date"].unique())
+    history = history[history > history.max() - pd.Timedelta(days=HISTORY_DAYS)] if len(history) else history
+    dates = history.union(horizon)
+    grid = pd.MultiIndex.from_product([dates, items], names=["date", "menuitem"]).to_frame(index=False)
+
+    table = grid.copy()
+    table["dow"] = table["date"].dt.dayofweek
+    # Lagged sales: NaN beyond the last recorded sales day, 0 when the item didn't sell that day
+    daily = sales.set_index(["date", "menuitem"])["quantity_sold"]
+    last_sales_day = sales["date"].max() if len(sales) else pd.Timestamp.min
+    for lag in (1, 7):
+        lag_dates = table["date"] - pd.Timedelta(days=lag)
+        values = daily.reindex(pd.MultiIndex.from_arrays([lag_dates, table["menuitem"]])).fillna(0).to_numpy()
+        table[f"sales_lag_{lag}"] = np.where(lag_dates <= last_sales_day, values, np.nan)
+    # Rolling means over the item's last 7 / 28 selling days, as of the day before each row
+    rolling = sales.sort_values(["menuitem", "date"]).copy()
+    grouped = rolling.groupby("menuitem")["quantity_sold"]
+    rolling["sales_mean_7"] = grouped.transform(lambda s: s.rolling(7, min_periods=1).mean())
+    rolling["sales_mean_28"] = grouped.transform(lambda s: s.rolling(28, min_periods=1).mean())
+    table[["sales_mean_7", "sales_mean_28"]] = _as_of(grid, rolling, ["sales_mean_7", "sales_mean_28"], strict=True).to_numpy()
+    # Weather for the row's date
+    table = table.merge(weather, on="date", how="left")
+    for period in PERIODS:
+        table[f"{period}_weather"] = table[f"{period}_weather"].fillna(-1)
+    table[["rain_periods", "sunny_periods"]] = table[["rain_periods", "sunny_periods"]].fillna(0)
+    # Latest trend status on or before the row's date
+    trend_columns = [f"{p}_{m}" for p in PLATFORMS for m in ("score", "trending", "trending_7d")]
+    table[trend_columns] = _as_of(grid, trends, trend_columns, strict=False).to_numpy() if not trends.empty else np.nan
+    return table.set_index(["date", "menuitem"]).sort_index()
+
+def feature_table():
+    # Feature table for the current site's pinned snapshot; each source is re-read only when it changed
+    today = datetime.now().date()
+    versions = (
+        data_version("sales.json", SALES_ROLLUP_FILE), data_version("menu.json"), data_version("weather.json"),
+        data_version("trends.json", trends_store.HISTORY_FILE), today
+    )
+    root = snapshots.default_root()
+    with _lock:
+        cached = _tables.get(root)
+        if cached is not None and cached[0] == versions:
+            return cached[1]
+    sales = _part("sales", versions[0], _daily_sales)
+    items = _part("menu", versions[1], _menu_items)
+    weather = _part("weather", versions[2], _weather)
+    trends = _part("trends", versions[3], _trends)
+    table = build_table(sales, items, weather, trends, today)
+    with _lock:
+        _tables[root] = (versions, table)
+    return table
+
+def expected_demand(features, baseline=None):
+    # Demand model of the Prediction page, without its noise: the item's average over its last 7
+    # selling days (or `baseline`), boosted by the share of the last 7 days it trended on Facebook
+    # and by rainy/sunny periods. NaN for items that never sold, unless a baseline is given.
+    baseline = features["sales_mean_7"].to_numpy() if baseline is None else baseline
+    trend_boost = 1.0 + 0.2 * features["facebook_trending_7d"].fillna(0).to_numpy()
+    weather_boost = 1.0 + 0.1 * features["rain_periods"].to_numpy() + 0.05 * features["sunny_periods"].to_numpy()
+    return baseline * trend_boost * weather_boost
+
+def feature_matrix(dates=None):
+    # (index, column names, float matrix) for the given dates ("YYYY-MM-DD"), or every row
+    table = feature_table()
+    if dates is not None:
+        table = table.loc[pd.to_datetime(list(dates))]
+    return table.index, list(table.columns), table.to_numpy(dtype=float)
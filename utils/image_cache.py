@@ -0,0 +1,183 @@
+import hashlib    # Import hashlib for content-hash file names
+import io         # Import io to decode and encode images in memory
+import os         # Import os for the cache directory and settings
+import re         # Import re to validate cached file names
+import threading  # Import threading so each image is fetched once
+import urllib.parse    # Import urllib to validate and rewrite image URLs
+import urllib.request  # Import urllib to fetch images without extra dependencies
+from PIL import Image, ImageDraw, ImageFont  # Import Pillow to resize and render thumbnails
+
+# Thumbnails of remote images (menu pictures, UI icons), named by the hash of their content
+IMAGE_CACHE_DIR = os.environ.get("ZEROBITE_IMAGE_CACHE", os.path.join(os.path.dirname(__file__), "..", "image_cache"))
+THUMBNAIL_SIZE = 120    # Longest side in pixels
+MAX_IMAGE_BYTES = 5 * 1024 * 1024
+FETCH_TIMEOUT = 5       # Seconds per fetch
+# Source URLs kept in the cache; beyond this the least recently used ones (and thumbnails no kept
+# source points to) are removed, so requests for ever new URLs can't fill the disk
+MAX_CACHED_IMAGES = int(os.environ.get("ZEROBITE_IMAGE_CACHE_MAX", "2000"))
+# Where images come from: "remote" fetches them, "local" renders stand-ins offline (e.g. a kitchen without internet)
+IMAGE_ORIGIN = os.environ.get("ZEROBITE_IMAGE_ORIGIN", "remote")
+# Only these hosts are proxied, so the route can't be used to reach arbitrary URLs
+IMAGE_HOSTS = frozenset(h.strip() for h in os.environ.get(
+    "ZEROBITE_IMAGE_HOSTS", "placehold.co,cdn-icons-png.flaticon.com"
+).split(",") if h.strip())
+CACHED_NAME = re.compile(r"^[0-9a-f]{20}\.png$")
+
+_locks = {}                     # Source URL -> [lock, requests using it], so concurrent requests fetch an image once
+_locks_lock = threading.Lock()  # Protects _locks
+_evict_lock = threading.Lock()  # One eviction pass at a time
+
+def _source_key(src):
+    return hashlib.sha1(src.encode("utf-8")).hexdigest()
+
+def _source_path(src):
+    # Small pointer file: source URL -> name of its cached thumbnail
+    return os.path.join(IMAGE_CACHE_DIR, "sources", _source_key(src))
+
+def cached_path(name):
+    # Path of a cached thumbnail, or None for names that are not cache files
+    return os.path.join(IMAGE_CACHE_DIR, name) if CACHED_NAME.match(name) else None
+
+def cached_name(src):
+    path = _source_path(src)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            name = f.read().strip()
+        os.utime(path)  # Mark as recently used for eviction
+    except FileNotFoundError:
+        return None
+    # An eviction running alongside the fetch may have removed the thumbnail; fetch it again then
+    return name if os.path.exists(os.path.join(IMAGE_CACHE_DIR, name)) else None
+
+def _proxied(parsed):
+    return parsed.scheme in ("http", "https") and parsed.hostname in IMAGE_HOSTS
+
+def local_url(src):
+    # URL the browser should load for an image: the cached file when we have it, else the proxy.
+    # Images from hosts that are not proxied are left as they are.
+    if not src or not _proxied(urllib.parse.urlparse(src)):
+        return src
+    name = cached_name(src)
+    if name:
+        return f"/img/{name}"
+    return "/img?" + urllib.parse.urlencode({"src": src})
+
+def check_source(src):
+    parsed = urllib.parse.urlparse(src)
+    if not _proxied(parsed):
+        raise ValueError(f"Images from {parsed.hostname or src!r} are not proxied")
+    return parsed
+
+class _CheckedRedirects(urllib.request.HTTPRedirectHandler):
+    # Follow redirects only to proxied hosts, so an allowed host can't forward a fetch elsewhere
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        check_source(newurl)
+        return super().redirect_request(req, fp, code, msg, headers, newurl)
+
+_opener = urllib.request.build_opener(_CheckedRedirects)
+
+def _fetch(src):
+    # Original bytes from the remote origin. placehold.co serves SVG unless PNG is asked for.
+    parsed = check_source(src)
+    if parsed.hostname == "placehold.co" and not parsed.path.rstrip("/").endswith(("/png", "/jpg", "/jpeg", "/webp")):
+        src = urllib.parse.urlunparse(parsed._replace(path=parsed.path.rstrip("/") + "/png"))
+    request = urllib.request.Request(src, headers={"User-Agent": "ZeroBite image cache"})
+    with _opener.open(request, timeout=FETCH_TIMEOUT) as response:
+        data = response.read(MAX_IMAGE_BYTES + 1)
+    if len(data) > MAX_IMAGE_BYTES:
+        raise ValueError("Image is too large")
+    return data
+
+def render_stand_in(src, size=THUMBNAIL_SIZE):
+    # Offline image for a URL: a tile coloured from the URL with its text (placehold.co ?text=) or file name
+    parsed = urllib.parse.urlparse(src)
+    text = urllib.parse.parse_qs(parsed.query).get("text", [""])[0]
+    if not text:
+        text = os.path.splitext(os.path.basename(parsed.path))[0] or "?"
+    digest = hashlib.md5(src.encode("utf-8")).digest()
+    image = Image.new("RGB", (size, size), (64 + digest[0] // 2, 64 + digest[1] // 2, 64 + digest[2] // 2))
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default(size=max(10, size // 8))
+    lines = [" ".join(text.split()[i:i + 2]) for i in range(0, len(text.split()), 2)] or [text]
+    y = (size - len(lines) * (size // 7)) // 2
+    for line in lines:
+        draw.text((size // 2, y), line, fill="white", font=font, anchor="ma")
+        y += size // 7
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+def _thumbnail(data):
+    # Decode, shrink to THUMBNAIL_SIZE and re-encode as PNG
+    with Image.open(io.BytesIO(data)) as image:
+        image = image.convert("RGBA")
+        image.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "wb") as f:
+        f.write(data)
+    os.replace(path + ".tmp", path)
+
+def _evict(keep=MAX_CACHED_IMAGES):
+    # Drop the least recently used sources beyond `keep`, then thumbnails no remaining source points to
+    sources_dir = os.path.join(IMAGE_CACHE_DIR, "sources")
+    with _evict_lock:
+        with os.scandir(sources_dir) as entries:
+            sources = [(entry.stat().st_mtime, entry.path) for entry in entries if entry.is_file()]
+        if len(sources) <= keep:
+            return
+        sources.sort()
+        for _, path in sources[:len(sources) - keep]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        names = set()
+        for _, path in sources[len(sources) - keep:]:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    names.add(f.read().strip())
+            except FileNotFoundError:
+                pass
+        for name in os.listdir(IMAGE_CACHE_DIR):
+            if CACHED_NAME.match(name) and name not in names:
+                try:
+                    os.remove(os.path.join(IMAGE_CACHE_DIR, name))
+                except FileNotFoundError:
+                    pass
+
+def thumbnail(src):
+    # Name of the cached thumbnail for `src`, fetching and resizing it on first use.
+    # Raises ValueError for sources that are not proxied and OSError when the origin is unreachable.
+    check_source(src)
+    name = cached_name(src)
+    if name:
+        return name
+    with _locks_lock:
+        entry = _locks.setdefault(src, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            name = cached_name(src)  # Another request may have fetched it meanwhile
+            if name:
+                return name
+            data = render_stand_in(src) if IMAGE_ORIGIN == "local" else _fetch(src)
+            try:
+                thumb = _thumbnail(data)
+            except Exception as e:  # Not an image Pillow can read
+                raise OSError(f"Can't decode image from {src}: {e}")
+            name = hashlib.sha256(thumb).hexdigest()[:20] + ".png"
+            if not os.path.exists(os.path.join(IMAGE_CACHE_DIR, name)):
+                _write_atomic(os.path.join(IMAGE_CACHE_DIR, name), thumb)
+            _write_atomic(_source_path(src), name.encode("utf-8"))
+        _evict()
+        return name
+    finally:
+        with _locks_lock:  # The last request for a URL drops its lock, so _locks doesn't grow per URL
+            entry[1] -= 1
+            if not entry[1]:
+                del _locks[src]
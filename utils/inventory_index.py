@@ -0,0 +1,158 @@
+import bisect     # Import bisect to keep the expiry order sorted
+import json       # Import json to read the menu
+import threading  # Import threading to guard the shared index
+from collections import Counter  # Number identical lots in the order they are listed
+from datetime import date, datetime, timedelta  # Import datetime to parse expiry dates
+from utils.data_loader import load_inventory  # Stock lots from the pinned snapshot
+from utils.data_watcher import data_version   # Sync the index only when inventory or menu change
+from utils import snapshots  # Read menu.json for ingredient lookups; one index per site
+
+def _ordinal(date_text):
+    return date.fromisoformat(date_text).toordinal()
+
+def _in_stock(lot):
+    # remaining_stock is a "93 kg"-style string; unparseable amounts count as in stock
+    try:
+        return float(str(lot.get("remaining_stock", "")).split()[0]) > 0
+    except (IndexError, ValueError):
+        return True
+
+def lot_id(lot, n=0):
+    # A stock lot is one purchase of one material with one expiry date; `n` tells apart lots that
+    # agree on all three (the n-th such lot in inventory.json), so none of them overwrites another
+    return (lot["material"], lot.get("purchase_date", ""), lot["expiry_date"], n)
+
+def _lot_ids(lots):
+    # (lot id, lot) for each record in listed order
+    seen = Counter()
+    for lot in lots:
+        base = lot_id(lot)[:3]
+        yield lot_id(lot, seen[base]), lot
+        seen[base] += 1
+
+class InventoryIndex:
+    # Stock lots ordered by parsed expiry date: a sorted list of (expiry ordinal, lot id) overall
+    # and per type, updated with bisect on every upsert/remove. Queries are a bisect plus a slice,
+    # O(log n + results), so they stay well under a millisecond for tens of thousands of lots.
+    def __init__(self):
+        self._lots = {}      # lot id -> lot record
+        self._keys = {}      # lot id -> (expiry ordinal, lot id)
+        self._order = []     # Sorted keys of every lot
+        self._by_type = {}   # type -> sorted keys of that type's lots
+        self._uses = {}      # material -> menu items using it (from inventories_used)
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()  # One snapshot sync at a time
+        self._synced = None  # data_version() the index reflects
+
+    def _insert(self, lid, lot):
+        key = (_ordinal(lot["expiry_date"]), lid)
+        self._lots[key[1]] = lot
+        self._keys[key[1]] = key
+        bisect.insort(self._order, key)
+        bisect.insort(self._by_type.setdefault(lot.get("type", ""), []), key)
+
+    def _delete(self, lid):
+        key = self._keys.pop(lid)
+        lot = self._lots.pop(lid)
+        for keys in (self._order, self._by_type[lot.get("type", "")]):
+            del keys[bisect.bisect_left(keys, key)]
+
+    def upsert(self, lot, lid=None):
+        # Add or replace a lot; lots with no remaining stock leave the index
+        lid = lid or lot_id(lot)
+        with self._lock:
+            if lid in self._lots:
+                self._delete(lid)
+            if _in_stock(lot):
+                self._insert(lid, lot)
+
+    def remove(self, lid):
+        with self._lock:
+            if lid in self._lots:
+                self._delete(lid)
+
+    def set_menu(self, menu):
+        uses = {}
+        for entry in menu:
+            for material in entry.get("inventories_used", []):
+                uses.setdefault(material, set()).add(entry["menuitem"])
+        with self._lock:
+            self._uses = uses
+
+    def _build(self, lots):
+        # Initial load: one sort instead of n inserts
+        with self._lock:
+            for lid, lot in lots:
+                if _in_stock(lot):
+                    key = (_ordinal(lot["expiry_date"]), lid)
+                    self._lots[key[1]] = lot
+                    self._keys[key[1]] = key
+            self._order = sorted(self._keys.values())
+            self._by_type = {}
+            for key in self._order:
+                self._by_type.setdefault(self._lots[key[1]].get("type", ""), []).append(key)
+
+    def sync(self, lots):
+        # Apply only the differences between the indexed lots and `lots`
+        incoming = dict(_lot_ids(lots))
+        if not self._lots:
+            self._build(incoming.items())
+            return
+        for lid in [lid for lid in self._lots if lid not in incoming]:
+            self.remove(lid)
+        for lid, lot in incoming.items():
+            if self._lots.get(lid) != lot:
+                self.upsert(lot, lid)
+
+    def __len__(self):
+        return len(self._order)
+
+    def expiring_within(self, days, today=None):
+        # Lots expiring on or before today + days (already expired lots first), soonest first
+        today = today or datetime.now().date()
+        horizon = (today + timedelta(days=days)).toordinal()
+        with self._lock:
+            end = bisect.bisect_left(self._order, (horizon + 1,))
+            return [self._lots[lid] for _, lid in self._order[:end]]
+
+    def fefo(self, lot_type=None, limit=None):
+        # First-expiry-first-out order for one type (or every lot)
+        with self._lock:
+            keys = self._order if lot_type is None else self._by_type.get(lot_type, [])
+            return [self._lots[lid] for _, lid in keys[:limit]]
+
+    def types(self):
+        with self._lock:
+            return sorted(t for t, keys in self._by_type.items() if keys)
+
+    def menu_items_expiring(self, days, today=None):
+        # Menu item -> (material, expiry_date) of its soonest-expiring ingredient within the window
+        at_risk = {}
+        for lot in self.expiring_within(days, today):
+            for item in sorted(self._uses.get(lot["material"], ())):
+                at_risk.setdefault(item, (lot["material"], lot["expiry_date"]))
+        return at_risk
+
+    def ensure_current(self):
+        # Pick up a new inventory/menu snapshot by diffing it into the index
+        version = data_version("inventory.json", "menu.json")
+        if version == self._synced:
+            return self
+        with self._sync_lock:
+            if version != self._synced:
+                with open(snapshots.data_path("menu.json"), "r", encoding="utf-8") as f:
+                    self.set_menu(json.load(f)["menu"])
+                self.sync(load_inventory())
+                self._synced = version
+        return self
+
+_indexes = {}                     # Site root -> InventoryIndex
+_indexes_lock = threading.Lock()  # Protects _indexes
+
+def site_index(root=None):
+    # Index used by the inventory page for a site (the current one by default)
+    root = root or snapshots.default_root()
+    with _indexes_lock:
+        if root not in _indexes:
+            _indexes[root] = InventoryIndex()
+        return _indexes[root]
@@ -0,0 +1,51 @@
+import gradio as gr   # Import Gradio for the timer and state components
+from gradio.context import Context  # Page (root Blocks) being built, for its load event
+import pandas as pd   # Import pandas to fingerprint table rows
+from utils.data_watcher import data_version  # Version counters bumped when data files change
+from utils.worker_lanes import interactive, latest, INTERACTIVE_LANE  # Ticks are cheap; keep them in the interactive lane
+from utils.metrics import instrument  # Record latency, errors and row counts for /metrics
+
+LIVE_UPDATE_INTERVAL = 5  # Seconds between checks for changed data files
+
+def _row_fingerprints(df):
+    # One hash per displayed row; cast to str so list columns (e.g. inventories_used) can be hashed
+    return pd.util.hash_pandas_object(df.astype(str), index=False).tolist()
+
+def live_refresh(files, update_fn, inputs, outputs, group=None):
+    # Push changes to the open page when any of `files` changes on disk.
+    # update_fn(*inputs) must return a tuple whose first element is the table DataFrame.
+    # Ticks are free while the files are unchanged, and the table is only re-sent
+    # when at least one of its displayed rows differs from what the session has.
+    # Pass the latest() group of the listeners that render the same outputs, so a tick that
+    # started before a newer filter query never overwrites that query's result.
+    timer = gr.Timer(LIVE_UPDATE_INTERVAL)
+    last_seen = gr.State(None)  # (data version, input values, row fingerprints) for this session
+    no_change = [gr.skip()] * (len(outputs) + 1)
+
+    def on_tick(*args):
+        *values, seen = args
+        version = data_version(*files)
+        if seen is not None and seen[0] == version:
+            return no_change  # Nothing changed on disk, nothing to send
+        try:
+            result = update_fn(*values)
+        except (OSError, ValueError):
+            return no_change  # File is being rewritten; try again on the next tick
+        fingerprints = _row_fingerprints(result[0])
+        same_rows = seen is not None and seen[1] == values and seen[2] == fingerprints
+        table = gr.skip() if same_rows else result[0]
+        return [table, *result[1:], (version, values, fingerprints)]
+
+    # Recorded per page, e.g. "leftoverreport.table.tick", so each page's refreshes show apart in /metrics
+    on_tick = instrument(on_tick, (group or f"{update_fn.__module__}.{update_fn.__name__}") + ".tick")
+    # Check on every tick, and once when the page opens so the first values are the browser's site
+    handler = latest(on_tick, group, len(outputs) + 1, delay=0, supersede=False) if group else interactive(on_tick)
+    gr.on(
+        [timer.tick, Context.root_block.load],
+        handler,
+        inputs + [last_seen],
+        outputs + [last_seen],
+        show_progress="hidden",
+        **INTERACTIVE_LANE
+    )
+    return timer
@@ -0,0 +1,188 @@
+import gc         # Import gc to collect cyclic garbage (e.g. closed figures) before measuring
+import os         # Import os for the repository path and environment settings
+import sys        # Import sys to size plain return values
+import threading  # Import threading for the tracking and stats locks
+import tracemalloc  # Import tracemalloc for allocation snapshots
+import weakref    # Import weakref to count live figures without keeping them alive
+from collections import Counter  # Sum retained bytes per allocation site
+import matplotlib.figure  # Figures are registered as they are created
+import numpy as np   # Arrays returned by handlers are sized by their buffers
+import pandas as pd  # Frames returned by handlers are sized with memory_usage(deep=True)
+
+REPO_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+TRACE_FRAMES = int(os.environ.get("ZEROBITE_MEMORY_FRAMES", "25"))  # Stack depth kept per allocation
+TOP_SITES = 15  # Allocation sites reported per handler
+
+# Memory diagnostics mode; seeded from ZEROBITE_MEMORY=1, switched at runtime via /admin/memory.
+# While on, each instrumented handler call is bracketed by tracemalloc snapshots and the retained
+# difference is attributed to the innermost frame in this repository, e.g. a df.copy() in a page
+# module. One call is tracked at a time; calls overlapping it run untracked, so a long heavy job
+# never holds up the interactive lane. tracemalloc records no thread per allocation, so memory
+# those overlapping calls keep still lands in the tracked call: measure on a quiet server.
+_enabled = False
+_frames = TRACE_FRAMES
+_busy = threading.Lock()  # One tracked call at a time, so snapshots don't nest
+_lock = threading.Lock()  # Protects _stats
+_stats = {}               # Handler name -> _HandlerMemory
+
+# Every matplotlib figure created since the mode was first switched on
+_figures = weakref.WeakSet()
+_figures_created = 0
+_figure_init = None
+
+class _HandlerMemory:
+    def __init__(self):
+        self.calls = 0
+        self.retained_total = 0  # Net bytes still allocated after calls returned (and gc ran), less the result
+        self.retained_last = 0
+        self.result_last = 0     # Approximate size of the returned value, still alive at the second snapshot
+        self.result_max = 0
+        self.peak_max = 0        # Largest extra traced memory during one call
+        self.figures_created = 0
+        self.sites = Counter()   # "file:line" -> net retained bytes over all calls
+        self.site_counts = Counter()
+
+def _register_figures():
+    # Wrap Figure.__init__ once so every new figure lands in the WeakSet
+    global _figure_init
+    if _figure_init is not None:
+        return
+    _figure_init = matplotlib.figure.Figure.__init__
+
+    def init(self, *args, **kwargs):
+        global _figures_created
+        _figure_init(self, *args, **kwargs)
+        _figures.add(self)
+        _figures_created += 1
+
+    matplotlib.figure.Figure.__init__ = init
+
+def configure(enabled, frames=None):
+    # Switch diagnostics on/off at runtime; switching off stops tracing and frees its overhead
+    global _enabled, _frames
+    if frames is not None and not 1 <= int(frames) <= 100:
+        raise ValueError("Frames must be between 1 and 100")
+    _frames = int(frames) if frames is not None else _frames
+    _enabled = bool(enabled)
+    if _enabled:
+        _register_figures()
+        if tracemalloc.is_tracing() and tracemalloc.get_traceback_limit() != _frames:
+            tracemalloc.stop()
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(_frames)
+    elif tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+def reset():
+    with _lock:
+        _stats.clear()
+
+def should_track():
+    # Cheap check done on every instrumented call
+    return _enabled
+
+def _site(traceback):
+    # Innermost frame in this repository (the line that asked for the memory), else the innermost frame
+    for frame in reversed(traceback):
+        if frame.filename.startswith(REPO_DIR) and os.sep + "utils" + os.sep + "memory.py" not in frame.filename:
+            return f"{os.path.relpath(frame.filename, REPO_DIR)}:{frame.lineno}"
+    frame = traceback[-1]
+    return f"{frame.filename}:{frame.lineno}"
+
+def _snapshot():
+    return tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<unknown>"),
+    ))
+
+def _result_bytes(value, depth=0):
+    # Approximate bytes held by a handler's return value (frames, arrays and containers of them).
+    # The caller still holds it when the second snapshot is taken, so it is reported on its own
+    # instead of as retained memory. Figures are counted under figures_created.
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if depth < 3 and isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(_result_bytes(v, depth + 1) for v in value)
+    if depth < 3 and isinstance(value, dict):
+        return sys.getsizeof(value) + sum(_result_bytes(v, depth + 1) for v in value.values())
+    return sys.getsizeof(value)
+
+def track_call(name, fn, args, kwargs):
+    # Run fn between two snapshots and record what it left behind. Calls made while another is
+    # tracked (including instrumented calls nested in it) run untracked instead of waiting.
+    if not tracemalloc.is_tracing() or not _busy.acquire(blocking=False):
+        return fn(*args, **kwargs)
+    try:
+        gc.collect()
+        before = _snapshot()
+        start_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        figures_before = _figures_created
+        result = fn(*args, **kwargs)
+        peak = tracemalloc.get_traced_memory()[1] - start_bytes
+        gc.collect()
+        after = _snapshot()
+    finally:
+        _busy.release()
+    diff = after.compare_to(before, "traceback")
+    result_bytes = _result_bytes(result)
+    sites = Counter()
+    counts = Counter()
+    for stat in diff:
+        if stat.size_diff:
+            site = _site(stat.traceback)
+            sites[site] += stat.size_diff
+            counts[site] += stat.count_diff
+    with _lock:
+        stats = _stats.get(name)
+        if stats is None:
+            stats = _stats[name] = _HandlerMemory()
+        stats.calls += 1
+        stats.retained_last = sum(stat.size_diff for stat in diff) - result_bytes
+        stats.retained_total += stats.retained_last
+        stats.result_last = result_bytes
+        stats.result_max = max(stats.result_max, result_bytes)
+        stats.peak_max = max(stats.peak_max, peak)
+        stats.figures_created += _figures_created - figures_before
+        stats.sites.update(sites)
+        stats.site_counts.update(counts)
+    return result
+
+def report(top=TOP_SITES):
+    # Settings, traced totals, live figures and per-handler retained and result bytes with their top allocation sites
+    import matplotlib.pyplot as plt  # pyplot keeps every figure that was never closed
+    current, peak = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (0, 0)
+    with _lock:
+        handlers = {
+            name: {
+                "tracked_calls": s.calls,
+                "retained_bytes_total": s.retained_total,
+                "retained_bytes_last": s.retained_last,
+                "retained_bytes_per_call": s.retained_total // s.calls if s.calls else 0,
+                "result_bytes_last": s.result_last,
+                "result_bytes_max": s.result_max,
+                "peak_bytes_max": s.peak_max,
+                "figures_created": s.figures_created,
+                "top_sites": [
+                    {"site": site, "retained_bytes": size, "blocks": s.site_counts[site]}
+                    for site, size in sorted(s.sites.items(), key=lambda kv: -abs(kv[1]))[:top]
+                ],
+            }
+            for name, s in sorted(_stats.items(), key=lambda kv: -kv[1].retained_total)
+        }
+    return {
+        "enabled": _enabled,
+        "frames": _frames,
+        "traced_bytes": current,
+        "traced_peak_bytes": peak,
+        "figures": {"created": _figures_created, "alive": len(_figures), "open_in_pyplot": len(plt.get_fignums())},
+        "handlers": handlers,
+    }
+
+if os.environ.get("ZEROBITE_MEMORY", "").lower() in ("1", "true", "yes"):
+    configure(True)
@@ -0,0 +1,116 @@
+import bisect     # Import bisect to find the histogram bucket for a latency
+import functools  # Import functools to keep handler names and signatures
+import threading  # Import threading to guard the shared counters
+import time       # Import time for high resolution timers
+import pandas as pd  # Import pandas to count DataFrame rows
+from utils import profiler  # Opt-in profiling hooks into the same wrapper
+from utils import memory    # Opt-in memory accounting hooks into the same wrapper
+
+# Upper bounds (seconds) of the latency histogram buckets; +Inf is implicit
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_stats = {}               # Handler name -> _HandlerStats
+_superseded = {}          # (group, stage) -> calls skipped by last-writer-wins (utils/worker_lanes.latest)
+_lock = threading.Lock()  # Protects _stats and _superseded
+
+class _HandlerStats:
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)  # Non-cumulative counts; last slot is +Inf
+        self.latency_sum = 0.0
+        self.calls = 0
+        self.errors = 0
+        self.rows = 0        # Rows returned by the most recent call
+        self.rows_total = 0  # Rows returned by all calls
+
+def _row_count(result):
+    # Number of data rows in a handler/loader result (largest table for tuple results)
+    if isinstance(result, (pd.DataFrame, list)):
+        return len(result)
+    if isinstance(result, tuple):
+        return max((len(part) for part in result if isinstance(part, (pd.DataFrame, list))), default=None)
+    return None
+
+def record(name, seconds, rows=None, error=False):
+    # Add one observation for a handler; cheap enough to run on every call
+    with _lock:
+        stats = _stats.get(name)
+        if stats is None:
+            stats = _stats[name] = _HandlerStats()
+        stats.buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        stats.latency_sum += seconds
+        stats.calls += 1
+        if error:
+            stats.errors += 1
+        if rows is not None:
+            stats.rows = rows
+            stats.rows_total += rows
+
+def record_superseded(group, stage):
+    # A debounced call that a newer one replaced: "queued" (never ran) or "running" (result dropped)
+    with _lock:
+        _superseded[(group, stage)] = _superseded.get((group, stage), 0) + 1
+
+def instrument(fn, name=None):
+    # Decorator recording latency, calls, errors and row counts for a page handler or data loader.
+    # The metric name is "<module>.<function>", e.g. "leftoverreport.update_table", unless `name`
+    # is given; the same name selects the handler for opt-in profiling (see utils/profiler.py).
+    name = name or f"{fn.__module__}.{fn.__name__}"
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            if profiler.should_profile(name):
+                result = profiler.profile_call(name, fn, args, kwargs)
+            elif memory.should_track():
+                result = memory.track_call(name, fn, args, kwargs)
+            else:
+                result = fn(*args, **kwargs)
+        except Exception:
+            record(name, time.perf_counter() - start, error=True)
+            raise
+        record(name, time.perf_counter() - start, _row_count(result))
+        return result
+    return wrapper
+
+def render_metrics():
+    # Format all counters in the Prometheus text exposition format (only done on scrape)
+    with _lock:
+        snapshot = {name: (list(s.buckets), s.latency_sum, s.calls, s.errors, s.rows, s.rows_total)
+                    for name, s in _stats.items()}
+        superseded = dict(_superseded)
+    lines = [
+        "# HELP zerobite_handler_duration_seconds Latency of page handlers and data loaders.",
+        "# TYPE zerobite_handler_duration_seconds histogram",
+    ]
+    for name, (buckets, latency_sum, calls, _, _, _) in sorted(snapshot.items()):
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), buckets):
+            cumulative += count
+            lines.append(f'zerobite_handler_duration_seconds_bucket{{handler="{name}",le="{bound}"}} {cumulative}')
+        lines.append(f'zerobite_handler_duration_seconds_sum{{handler="{name}"}} {latency_sum:.6f}')
+        lines.append(f'zerobite_handler_duration_seconds_count{{handler="{name}"}} {calls}')
+    lines += [
+        "# HELP zerobite_handler_errors_total Calls that raised an exception.",
+        "# TYPE zerobite_handler_errors_total counter",
+    ]
+    lines += [f'zerobite_handler_errors_total{{handler="{name}"}} {s[3]}' for name, s in sorted(snapshot.items())]
+    lines += [
+        "# HELP zerobite_handler_rows Rows returned by the most recent call.",
+        "# TYPE zerobite_handler_rows gauge",
+    ]
+    lines += [f'zerobite_handler_rows{{handler="{name}"}} {s[4]}' for name, s in sorted(snapshot.items())]
+    lines += [
+        "# HELP zerobite_handler_rows_total Rows returned by all calls.",
+        "# TYPE zerobite_handler_rows_total counter",
+    ]
+    lines += [f'zerobite_handler_rows_total{{handler="{name}"}} {s[5]}' for name, s in sorted(snapshot.items())]
+    lines += [
+        "# HELP zerobite_superseded_calls_total Debounced calls replaced by a newer call from the same session.",
+        "# TYPE zerobite_superseded_calls_total counter",
+    ]
+    lines += [
+        f'zerobite_superseded_calls_total{{group="{group}",stage="{stage}"}} {count}'
+        for (group, stage), count in sorted(superseded.items())
+    ]
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,91 @@
+import cProfile   # Import cProfile for deterministic per-call profiles
+import os         # Import os for the output directory and environment settings
+import random     # Import random to sample a fraction of calls
+import sys        # Import sys to read other threads' stacks when stack sampling
+import threading  # Import threading for the sampler thread and the profiler lock
+from collections import Counter  # Count identical folded stacks
+from datetime import datetime    # Import datetime for timestamped file names
+
+# Where profiles are written (override with ZEROBITE_PROFILE_DIR)
+PROFILE_DIR = os.environ.get("ZEROBITE_PROFILE_DIR", os.path.join(os.path.dirname(__file__), "..", "profiles"))
+PROFILE_MODES = ("cprofile", "sample")  # .pstats files or flamegraph-ready .folded stacks
+SAMPLE_INTERVAL = 0.005  # Seconds between stack samples in "sample" mode
+
+# Runtime settings; seeded from ZEROBITE_PROFILE ("leftoverreport.update_table,..." or "*"),
+# ZEROBITE_PROFILE_RATE (fraction of calls, 0-1) and ZEROBITE_PROFILE_MODE
+_handlers = frozenset(h.strip() for h in os.environ.get("ZEROBITE_PROFILE", "").split(",") if h.strip())
+_rate = float(os.environ.get("ZEROBITE_PROFILE_RATE", "0.1"))
+_mode = os.environ.get("ZEROBITE_PROFILE_MODE", "cprofile")
+_busy = threading.Lock()  # Only one profile at a time; concurrent calls just run unprofiled
+
+def configure(handlers, rate=None, mode=None):
+    # Change which handlers are profiled at runtime (an empty list switches profiling off)
+    global _handlers, _rate, _mode
+    if mode is not None and mode not in PROFILE_MODES:
+        raise ValueError(f"Unknown profile mode: {mode}")
+    if rate is not None and not 0 <= rate <= 1:
+        raise ValueError("Profile rate must be between 0 and 1")
+    _handlers = frozenset(handlers)
+    _rate = _rate if rate is None else rate
+    _mode = mode or _mode
+
+def settings():
+    # Current settings plus the most recent profile files, for the admin route
+    files = sorted(os.listdir(PROFILE_DIR)) if os.path.isdir(PROFILE_DIR) else []
+    return {"handlers": sorted(_handlers), "rate": _rate, "mode": _mode, "recent_files": files[-20:]}
+
+def should_profile(name):
+    # Cheap check done on every instrumented call
+    return bool(_handlers) and ("*" in _handlers or name in _handlers) and random.random() < _rate
+
+def _output_path(name, extension):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    return os.path.join(PROFILE_DIR, f"{name}-{stamp}.{extension}")
+
+def _folded_stack(frame):
+    # "module:function;module:function" from the outermost frame to the innermost
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{os.path.splitext(os.path.basename(code.co_filename))[0]}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+def _run_sampled(name, fn, args, kwargs):
+    thread_id = threading.get_ident()
+    stacks = Counter()
+    done = threading.Event()
+
+    def sample():
+        while not done.wait(SAMPLE_INTERVAL):
+            frame = sys._current_frames().get(thread_id)
+            if frame is not None:
+                stacks[_folded_stack(frame)] += 1
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        done.set()
+        sampler.join()
+        # Brendan Gregg's folded format: feed to flamegraph.pl or speedscope
+        with open(_output_path(name, "folded"), "w", encoding="utf-8") as f:
+            for stack, count in stacks.items():
+                f.write(f"{stack} {count}\n")
+
+def profile_call(name, fn, args, kwargs):
+    # Run fn under the profiler and save a timestamped file named after the handler
+    if not _busy.acquire(blocking=False):
+        return fn(*args, **kwargs)
+    try:
+        if _mode == "sample":
+            return _run_sampled(name, fn, args, kwargs)
+        profile = cProfile.Profile()
+        try:
+            return profile.runcall(fn, *args, **kwargs)
+        finally:
+            profile.dump_stats(_output_path(name, "pstats"))
+    finally:
+        _busy.release()
@@ -0,0 +1,199 @@
+import asyncio    # Import asyncio for the background compaction loop
+import logging    # Import logging to report failed background compactions
+import os         # Import os for file checks and settings
+import threading  # Import threading to guard the cached query frames
+from datetime import datetime, timedelta  # Import datetime for the tier cutoffs
+import numpy as np   # Import NumPy to assign tiers
+import pandas as pd  # Import pandas to aggregate rows into rollups
+from utils import sites, snapshots  # Compaction publishes a new snapshot per site
+from utils.data_watcher import data_version  # Rebuild the query frames only when a tier changes
+from utils.sale_events import carry_events  # Live sale events still apply after compaction
+
+# History tiers by age in days: full detail, then one row per item and day, per week, per month.
+# Weeks are cut at month starts, so daily -> weekly -> monthly rollups always sum exactly.
+# Detail older than DETAIL_DAYS is compacted; weeks whose last day is older than DAILY_DAYS and
+# months whose last day is older than WEEKLY_DAYS are rolled up further.
+DETAIL_DAYS = int(os.environ.get("ZEROBITE_DETAIL_DAYS", "90"))
+DAILY_DAYS = int(os.environ.get("ZEROBITE_DAILY_DAYS", "365"))
+WEEKLY_DAYS = int(os.environ.get("ZEROBITE_WEEKLY_DAYS", "730"))
+COMPACT_EVERY_HOURS = float(os.environ.get("ZEROBITE_COMPACT_EVERY_HOURS", "0"))  # 0: compact only on request
+
+SALES_ROLLUP_FILE = "sales_rollup.json"
+LEFTOVER_ROLLUP_FILE = "leftover_rollup.json"
+SALES_MEASURES = ["quantity_sold", "total_sales_gbp"]
+LEFTOVER_MEASURES = ["sold_quantity", "wasted_quantity"]
+SALES_COLUMNS = ["date", "menuitem"] + SALES_MEASURES + ["tier", "days"]
+PERIOD_LABELS = {"detail": "day", "daily": "day", "weekly": "week", "monthly": "month"}  # Tier -> shown period
+LEFTOVER_COLUMNS = ["date", "menuitem", "sold_quantity", "wasted_quantity", "reason", "tier", "days"]
+
+DAY_TIERS = ["detail", "daily"]  # Tiers with one row per item and day
+
+log = logging.getLogger(__name__)
+
+_frames = {}              # (site root, dataset) -> (data version, DataFrame)
+_lock = threading.Lock()  # Protects _frames
+
+def _load(name, key, version=None, root=None):
+    path = os.path.join(snapshots.snapshot_dir(version, root), name) if version is not None else snapshots.data_path(name)
+    if not os.path.exists(path):
+        return []
+    return list(snapshots.iter_records(path, key))
+
+def cutoffs(today=None):
+    # First date (ISO) kept in each tier: (detail, daily, weekly); anything older is monthly.
+    # Ages count back from `today`, which compact() sets to the newest day in the data.
+    today = pd.Timestamp(today or datetime.now().date())
+    return tuple((today - timedelta(days=days)).strftime("%Y-%m-%d") for days in (DETAIL_DAYS, DAILY_DAYS, WEEKLY_DAYS))
+
+def _buckets(dates):
+    # Month start, week start (weeks are cut at month starts) and the first day after each, per date
+    month = dates.dt.to_period("M").dt.start_time
+    next_month = (dates.dt.to_period("M") + 1).dt.start_time
+    week = np.maximum(dates - pd.to_timedelta(dates.dt.dayofweek, unit="D"), month)
+    next_week = np.minimum(week + pd.Timedelta(days=7), next_month)
+    return month, next_month, week, next_week
+
+def _tiers(dates, today=None):
+    # Tier and period start (ISO) of each date. A week or month moves to its tier only once all of
+    # its days are past the cutoff, so every day of a period (and its rollup row) ages together.
+    detail, daily, weekly = (pd.Timestamp(cutoff) for cutoff in cutoffs(today))
+    dates = pd.to_datetime(pd.Series(dates, dtype=str))
+    month, next_month, week, next_week = _buckets(dates)
+    tier = np.select([next_month <= weekly, next_week <= daily, dates < detail], ["monthly", "weekly", "daily"], "detail")
+    period = np.select([tier == "weekly", tier == "monthly"], [week, month], dates)
+    return tier, pd.to_datetime(period).strftime("%Y-%m-%d")
+
+def period_days(tier, period):
+    # Calendar days each (tier, period start) row covers, used to show rollups as per-day averages
+    start = pd.to_datetime(pd.Series(period, dtype=str))
+    tier = pd.Series(tier, index=start.index)
+    month, next_month, week, next_week = _buckets(start)
+    days = np.select([tier == "weekly", tier == "monthly"], [(next_week - start).dt.days, (next_month - start).dt.days], 1)
+    return pd.Series(days, index=start.index, dtype=int)
+
+def _roll(detail, rollups, keys, measures, today):
+    # Fold old detail rows and existing rollup rows (re-tiered as they age) into rollup records
+    frames = [
+        pd.DataFrame(detail, columns=["date"] + keys + measures),
+        pd.DataFrame(rollups, columns=["period"] + keys + measures).rename(columns={"period": "date"}),
+    ]
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return []
+    frame = pd.concat(frames, ignore_index=True)
+    frame["tier"], frame["period"] = _tiers(frame["date"], today)
+    frame.loc[frame["tier"] == "detail", "tier"] = "daily"  # Rollups newer than the detail window stay daily
+    grouped = frame.groupby(["tier", "period"] + keys, sort=True, dropna=False)[measures].sum().reset_index()
+    counts = [m for m in measures if m != "total_sales_gbp"]
+    grouped[counts] = grouped[counts].astype(int)
+    if "total_sales_gbp" in measures:
+        grouped["total_sales_gbp"] = grouped["total_sales_gbp"].round(2)
+    grouped = grouped.sort_values(["period", "tier"] + keys, kind="stable")
+    return grouped.astype(object).where(grouped.notna(), None).to_dict("records")
+
+def _aged(rollups, today):
+    # Whether any rollup row has moved into an older tier since it was written
+    if not rollups:
+        return False
+    tier = _tiers([r["period"] for r in rollups], today)[0]
+    tier[tier == "detail"] = "daily"
+    return list(tier) != [r["tier"] for r in rollups]
+
+def compact(root=None, today=None):
+    # Move sales days and leftover rows older than the detail window into the rollup files and
+    # re-tier rollups that aged, as one snapshot. Returns what was compacted; publishes nothing
+    # when there is nothing to move.
+    root = root or snapshots.default_root()
+    with snapshots.merge_lock:
+        # Always compact the latest snapshot, so no import published meanwhile is dropped
+        version = snapshots.current_version(root)
+        sales = _load("sales.json", "daily_sales", version, root)
+        leftover = _load("leftover.json", "leftover", version, root)
+        sales_rollup = _load(SALES_ROLLUP_FILE, "sales_rollup", version, root)
+        leftover_rollup = _load(LEFTOVER_ROLLUP_FILE, "leftover_rollup", version, root)
+        # Age history from its newest day, not the clock: a dataset that stopped in the past keeps
+        # its last DETAIL_DAYS in detail, so the feature look-backs never find it compacted away
+        today = today or max([day["date"] for day in sales] + [r["date"] for r in leftover], default=None)
+        detail_cutoff = cutoffs(today)[0]
+
+        old_days = [day for day in sales if day["date"] < detail_cutoff]
+        old_leftover = [record for record in leftover if record["date"] < detail_cutoff]
+        if not old_days and not old_leftover and not _aged(sales_rollup, today) and not _aged(leftover_rollup, today):
+            return {"detail_since": detail_cutoff, "sales_days_compacted": 0, "leftover_rows_compacted": 0,
+                    "sales_rollup_rows": len(sales_rollup), "leftover_rollup_rows": len(leftover_rollup)}
+
+        old_lines = [
+            {"date": day["date"], **{k: line.get(k) for k in ["menuitem"] + SALES_MEASURES}}
+            for day in old_days for line in day.get("items_sold", [])
+        ]
+        sales_rollup = _roll(old_lines, sales_rollup, ["menuitem"], SALES_MEASURES, today)
+        leftover_rollup = _roll(old_leftover, leftover_rollup, ["menuitem", "reason"], LEFTOVER_MEASURES, today)
+        with snapshots.publish(root) as staging:
+            staging.write_records("sales.json", "daily_sales", [day for day in sales if day["date"] >= detail_cutoff])
+            staging.write_records("leftover.json", "leftover", [r for r in leftover if r["date"] >= detail_cutoff])
+            staging.write_records(SALES_ROLLUP_FILE, "sales_rollup", sales_rollup)
+            staging.write_records(LEFTOVER_ROLLUP_FILE, "leftover_rollup", leftover_rollup)
+            carry_events(staging, covered=lambda event: False)  # Only moves history; no live sale is added
+    return {"detail_since": detail_cutoff, "sales_days_compacted": len(old_days), "leftover_rows_compacted": len(old_leftover),
+            "sales_rollup_rows": len(sales_rollup), "leftover_rollup_rows": len(leftover_rollup)}
+
+async def run_compactor(interval_hours=COMPACT_EVERY_HOURS):
+    # Compact every site periodically; runs in a thread so the event loop never blocks
+    while True:
+        for site in sites.list_sites():
+            try:
+                await asyncio.to_thread(compact, sites.site_root(site))
+            except Exception:
+                log.exception("Compaction failed for %s", site)
+        await asyncio.sleep(interval_hours * 3600)
+
+def _cached(dataset, names, build):
+    # Frame for the current site's pinned snapshot, rebuilt only after one of `names` changes
+    root = snapshots.default_root()
+    version = data_version(*names)
+    with _lock:
+        cached = _frames.get((root, dataset))
+        if cached is not None and cached[0] == version:
+            return cached[1]
+    frame = build()
+    with _lock:
+        _frames[(root, dataset)] = (version, frame)
+    return frame
+
+def _rollup_frame(records, columns):
+    # Rollup records as query rows: the period start as the date, plus the calendar days it covers
+    frame = pd.DataFrame(records, columns=["tier", "period"] + columns)
+    frame["days"] = period_days(frame["tier"], frame["period"])
+    return frame.rename(columns={"period": "date"})
+
+def sales_lines():
+    # One row per item sold: detail days as they are, older history from the rollup tiers.
+    # Rows are (date, menuitem, quantity_sold, total_sales_gbp, tier, days), sorted by date;
+    # `days` > 1 marks a weekly/monthly total.
+    def build():
+        detail = pd.DataFrame(
+            [(day["date"], s["menuitem"], s["quantity_sold"], s["total_sales_gbp"])
+             for day in _load("sales.json", "daily_sales") for s in day.get("items_sold", [])],
+            columns=["date", "menuitem"] + SALES_MEASURES,
+        ).assign(tier="detail", days=1)
+        rolled = _rollup_frame(_load(SALES_ROLLUP_FILE, "sales_rollup"), ["menuitem"] + SALES_MEASURES)
+        frames = [f for f in (rolled, detail) if not f.empty]
+        lines = pd.concat(frames, ignore_index=True) if frames else detail
+        return lines[SALES_COLUMNS].sort_values("date", kind="stable").reset_index(drop=True)
+    return _cached("sales", ("sales.json", SALES_ROLLUP_FILE), build)
+
+def leftover_rows():
+    # Leftover records combined with the leftover rollup tiers, in the same layout as sales_lines
+    def build():
+        detail = pd.DataFrame(_load("leftover.json", "leftover"), columns=LEFTOVER_COLUMNS[:5]).assign(tier="detail", days=1)
+        rolled = _rollup_frame(_load(LEFTOVER_ROLLUP_FILE, "leftover_rollup"), ["menuitem", "reason"] + LEFTOVER_MEASURES)
+        frames = [f for f in (rolled, detail) if not f.empty]
+        rows = pd.concat(frames, ignore_index=True) if frames else detail
+        return rows[LEFTOVER_COLUMNS].sort_values("date", kind="stable").reset_index(drop=True)
+    return _cached("leftover", ("leftover.json", LEFTOVER_ROLLUP_FILE), build)
+
+def day_lines():
+    # Sale lines with one row per item and day (detail plus the daily rollup tier), for readers that
+    # need per-day history: demand features, discount modelling, depletion and the stock ledger
+    lines = sales_lines()
+    return lines[lines["tier"].isin(DAY_TIERS)]
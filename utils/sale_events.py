@@ -0,0 +1,76 @@
+import json  # Import json to read and write journaled sale events
+import os    # Import os for the journal file
+from utils import snapshots  # Events are journaled against the snapshot whose sales they add to
+
+# Live POS sale events that are not in sales.json yet, one JSON object per line. Each event records
+# the version of sales.json it adds to, and readers replay only the events of the sales they read,
+# so regenerated data, a rollback or an import never has another dataset's events replayed on it.
+EVENTS_FILE = "sales_events.jsonl"
+VERSION_KEY = "sales_version"
+
+def events_path(root=None):
+    # Event journal of a site (the current site by default)
+    return os.path.join(root or snapshots.default_root(), EVENTS_FILE)
+
+def sales_version(version=None, root=None):
+    # Version of the snapshot that last wrote sales.json, as seen from `version` (the pinned one by default)
+    return snapshots.file_version("sales.json", version, root)
+
+def applies(event, sales):
+    # Whether an event adds to the sales of version `sales` (events journaled before versions count as current)
+    return event.get(VERSION_KEY, sales) == sales
+
+def _read(root):
+    path = events_path(root)
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def load_events(root=None, version=None):
+    # Journaled events that add to the sales of `version` (the pinned snapshot by default)
+    sales = sales_version(version, root)
+    return [event for event in _read(root) if applies(event, sales)]
+
+def distinct_events(root=None):
+    # Every journaled sale once, whichever sales it adds to (carried copies collapse), for statistics
+    # such as the time-of-day curve that don't depend on the dataset
+    seen = {}
+    for event in _read(root):
+        event = {k: v for k, v in event.items() if k != VERSION_KEY}
+        seen.setdefault(json.dumps(event, sort_keys=True), event)
+    return list(seen.values())
+
+def append_event(event, root=None):
+    # Journal one event against the sales that are current now; no publish can swap them meanwhile
+    root = root or snapshots.default_root()
+    with snapshots.between_publishes():
+        event = {**event, VERSION_KEY: sales_version(snapshots.current_version(root), root)}
+        with open(events_path(root), "a", encoding="utf-8") as f:
+            f.write(json.dumps(event, separators=(",", ":")) + "\n")
+    return event
+
+def carry_events(staging, covered):
+    # Call while staging a snapshot that rewrites sales.json. As it publishes, the events of the
+    # current sales that the new sales don't include (covered(event) is False) are re-journaled
+    # against it, and events of sales no kept snapshot holds any more are dropped, so the journal
+    # stays bounded by the snapshots a reader or a rollback can still reach.
+    root = staging.root
+
+    def fold(version):
+        events = _read(root)
+        if not events:
+            return
+        current = sales_version(snapshots.current_version(root), root)
+        kept = {sales_version(v, root) for v in snapshots.list_versions(root)} | {snapshots.BASE_VERSION, current}
+        events = [{VERSION_KEY: current, **event} for event in events]
+        events = [e for e in events if e[VERSION_KEY] in kept] + [
+            {**e, VERSION_KEY: version} for e in events if e[VERSION_KEY] == current and not covered(e)
+        ]
+        # Rewritten as a new file, so readers that tail the journal by offset notice and start over
+        path = events_path(root)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(e, separators=(",", ":")) + "\n" for e in events)
+        os.replace(path + ".tmp", path)
+
+    staging.on_publish(fold)
@@ -0,0 +1,132 @@
+import io         # Import io to parse uploaded batches
+import os         # Import os for file checks
+import numpy as np   # Import NumPy for the validation masks
+import pandas as pd  # Import pandas to validate a whole batch at once
+from utils import snapshots  # Merge valid rows into a new published snapshot
+from utils.sale_events import load_events, carry_events  # Live sales already counted against stock
+
+FORMATS = ("csv", "jsonl")
+REQUIRED = ["date", "menuitem", "quantity_sold"]  # total_sales_gbp is optional and checked against price
+PRICE_TOLERANCE = 0.01  # GBP a line total may differ from quantity x price (rounding)
+
+def parse_batch(data, fmt):
+    # POS sale lines (bytes or text) -> DataFrame of strings/numbers, one row per line
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format {fmt!r}; choose one of {list(FORMATS)}")
+    buffer = io.BytesIO(data if isinstance(data, bytes) else data.encode("utf-8"))
+    if fmt == "csv":
+        batch = pd.read_csv(buffer, dtype={"date": str, "menuitem": str})
+    else:
+        batch = pd.read_json(buffer, lines=True, dtype={"date": str, "menuitem": str}, convert_dates=False)
+    missing = [column for column in REQUIRED if column not in batch.columns]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+    return batch.reset_index(drop=True)
+
+def _load(name, key, version, root):
+    path = os.path.join(snapshots.snapshot_dir(version, root), name)
+    if not os.path.exists(path):
+        return []
+    return list(snapshots.iter_records(path, key))
+
+def _sold_so_far(sales, events):
+    # Quantity already sold per (date, menuitem): the store plus journaled live sale events
+    lines = [(day["date"], s["menuitem"], s["quantity_sold"]) for day in sales for s in day.get("items_sold", [])]
+    lines += [(e["date"], e["menuitem"], e["quantity_sold"]) for e in events]
+    sold = pd.DataFrame(lines, columns=["date", "menuitem", "quantity_sold"])
+    return sold.groupby(["date", "menuitem"])["quantity_sold"].sum()
+
+def validate(batch, menu, sold):
+    # Per-row error message ("" for valid rows), checked for the whole batch at once:
+    # known menu item, valid date, whole non-negative quantity, total consistent with the day's price,
+    # and the day's quantity (already sold + earlier valid rows of the batch) within available_stock
+    errors = pd.Series("", index=batch.index, dtype=object)
+
+    def fail(mask, message):
+        # First error wins for each row
+        mask = np.asarray(mask) & (errors == "").to_numpy()
+        errors[mask] = message if isinstance(message, str) else message[mask]
+
+    stock = pd.DataFrame(menu, columns=["prepared_date", "menuitem", "price", "available_stock"])
+    stock = stock.groupby(["prepared_date", "menuitem"]).agg(price=("price", "last"), available=("available_stock", "sum"))
+    dates = pd.to_datetime(batch["date"], format="%Y-%m-%d", errors="coerce")
+    quantity = pd.to_numeric(batch["quantity_sold"], errors="coerce")
+    fail(~batch["menuitem"].isin(stock.index.get_level_values("menuitem")), "Unknown menu item")
+    fail(dates.isna(), "Invalid date (expected YYYY-MM-DD)")
+    fail(quantity.isna() | (quantity < 0) | (quantity % 1 != 0), "Quantity must be a whole number >= 0")
+
+    # Price and stock of the item on that day
+    keys = pd.MultiIndex.from_arrays([batch["date"], batch["menuitem"]])
+    day_stock = stock.reindex(keys)
+    fail(day_stock["available"].isna().to_numpy(), "Not on the menu for that date")
+    price = day_stock["price"].to_numpy(dtype=float)
+    if "total_sales_gbp" in batch.columns:
+        total = pd.to_numeric(batch["total_sales_gbp"], errors="coerce").to_numpy()
+        expected = quantity.to_numpy() * price
+        inconsistent = ~np.isnan(total) & ~(np.abs(total - expected) <= PRICE_TOLERANCE)
+        fail(inconsistent, "total_sales_gbp does not match quantity x price")
+
+    # Running daily quantity over the rows still valid, in batch order
+    counted = quantity.where(errors == "", 0).fillna(0)
+    running = counted.groupby([batch["date"], batch["menuitem"]]).cumsum()
+    already = sold.reindex(keys).fillna(0).to_numpy()
+    available = day_stock["available"].fillna(0).to_numpy()
+    over = (already + running.to_numpy()) > available
+    left = np.maximum(available - already - (running - counted).to_numpy(), 0).astype(int)
+    fail(over, pd.Series([f"Exceeds available stock ({n} left)" for n in left], index=batch.index))
+    return errors, price
+
+def merge(sales, lines):
+    # Add (date, menuitem, quantity_sold, total_sales_gbp) lines to the daily sales records:
+    # into the item's line for that day when there is one, otherwise as a new line/day
+    by_date = {day["date"]: day for day in sales}
+    by_line = {(day["date"], s["menuitem"]): s for day in sales for s in day.get("items_sold", [])}
+    totals = lines.groupby(["date", "menuitem"], sort=False)[["quantity_sold", "total_sales_gbp"]].sum()
+    for (date, menuitem), row in totals.iterrows():
+        day = by_date.get(date)
+        if day is None:
+            day = by_date[date] = {"date": date, "total_sales_gbp": 0.0, "items_sold": []}
+        line = by_line.get((date, menuitem))
+        if line is None:
+            line = by_line[(date, menuitem)] = {"menuitem": menuitem, "quantity_sold": 0, "total_sales_gbp": 0.0}
+            day.setdefault("items_sold", []).append(line)
+        line["quantity_sold"] += int(row["quantity_sold"])
+        line["total_sales_gbp"] = round(line["total_sales_gbp"] + float(row["total_sales_gbp"]), 2)
+        day["total_sales_gbp"] = round(day["total_sales_gbp"] + float(row["total_sales_gbp"]), 2)
+    return [by_date[date] for date in sorted(by_date)]
+
+def import_sales(batch, root=None, dry_run=False):
+    # Validate a batch and publish the valid rows into sales.json as one snapshot.
+    # Returns {"received", "imported", "rejected", "errors": [{"row", "date", "menuitem", "error"}]},
+    # with rows numbered from 1 in batch order.
+    root = root or snapshots.default_root()
+    with snapshots.merge_lock:  # One merge at a time, so each starts from the latest sales
+        # Always merge into the latest snapshot (not one pinned earlier), so no import is lost
+        version = snapshots.current_version(root)
+        menu = _load("menu.json", "menu", version, root)
+        sales = _load("sales.json", "daily_sales", version, root)
+        # A batch line for an item and day includes the live sales journaled for it (the POS export
+        # of that day), so those events are not counted twice here, nor carried over once imported
+        batch_keys = set(zip(batch["date"].astype(str), batch["menuitem"].astype(str)))
+        events = [e for e in load_events(root, version) if (e["date"], e["menuitem"]) not in batch_keys]
+        errors, price = validate(batch, menu, _sold_so_far(sales, events))
+        valid = (errors == "").to_numpy()
+        lines = batch.loc[valid, ["date", "menuitem"]].copy()
+        lines["quantity_sold"] = pd.to_numeric(batch.loc[valid, "quantity_sold"]).astype(int)
+        lines["total_sales_gbp"] = (lines["quantity_sold"] * price[valid]).round(2)  # Priced from the menu
+        if valid.any() and not dry_run:
+            with snapshots.publish(root) as staging:
+                staging.write_records("sales.json", "daily_sales", merge(sales, lines))
+                imported = set(zip(lines["date"], lines["menuitem"]))
+                carry_events(staging, covered=lambda event: (event["date"], event["menuitem"]) in imported)
+    rejected = batch.loc[~valid, ["date", "menuitem"]].assign(error=errors[~valid])
+    rejected = rejected.astype(object).where(rejected.notna(), None)  # Blank cells -> null
+    return {
+        "received": len(batch),
+        "imported": int(valid.sum()),
+        "rejected": len(rejected),
+        "errors": [
+            {"row": int(i) + 1, "date": date, "menuitem": menuitem, "error": error}
+            for i, date, menuitem, error in rejected.itertuples(name=None)
+        ],
+    }
@@ -0,0 +1,189 @@
+import json       # Import json to read journaled sale events
+import os         # Import os for the event journal
+import threading  # Import threading to guard the ring buffers
+from datetime import date as Date  # Day ordinals <-> dates
+import numpy as np   # Import NumPy for the ring buffers and running sums
+import pandas as pd  # Import pandas for the chart frames
+from utils import snapshots  # Seed from the pinned data snapshot
+from utils.data_watcher import data_version  # Re-seed only when sales change
+from utils.retention import day_lines, SALES_ROLLUP_FILE  # Day-level sale lines (detail and daily rollups)
+from utils.sale_events import events_path, sales_version, applies  # Live POS sales not in sales.json yet
+
+WINDOWS = (7, 30, 90)     # Rolling windows in days
+RING_DAYS = max(WINDOWS)  # Days held in the ring buffers
+
+class SalesWindows:
+    # Rolling last-N-day sales for one site. The last RING_DAYS days live in ring buffers
+    # (day ordinal % RING_DAYS -> row of per-item quantity and GBP), and each window keeps running
+    # per-item sums. When a newer day arrives the days leaving each window are subtracted and the
+    # oldest slot is cleared, so window figures cost O(items) to read and O(items) per new day,
+    # independent of how much history the store holds. Windows end at the newest day with sales.
+    def __init__(self, root):
+        self.root = root
+        self._lock = threading.Lock()    # Protects the buffers
+        self._update = threading.Lock()  # One re-seed / journal read at a time
+        self._seeded = None    # data_version() of the sales the buffers were built from
+        self._sales = None     # sales.json version whose journaled events apply
+        self._journal = None   # Inode of the journal being tailed (a fold rewrites it as a new file)
+        self._events_read = 0  # Bytes of the event journal already applied
+        self.version = 0       # Bumped on every change so pages can skip unchanged refreshes
+        self._reset([], None)
+
+    def _reset(self, items, day):
+        self.items = list(items)
+        self._index = {item: i for i, item in enumerate(self.items)}
+        self.day = day  # Ordinal of the newest day in the ring (None while empty)
+        self.quantity = np.zeros((RING_DAYS, len(self.items)), dtype=np.int64)
+        self.sales = np.zeros((RING_DAYS, len(self.items)))
+        self.window_quantity = {w: np.zeros(len(self.items), dtype=np.int64) for w in WINDOWS}
+        self.window_sales = {w: np.zeros(len(self.items)) for w in WINDOWS}
+
+    def _column(self, menuitem):
+        # Column of an item, widening every buffer for items not seen before
+        i = self._index.get(menuitem)
+        if i is None:
+            i = self._index[menuitem] = len(self.items)
+            self.items.append(menuitem)
+            self.quantity = np.pad(self.quantity, ((0, 0), (0, 1)))
+            self.sales = np.pad(self.sales, ((0, 0), (0, 1)))
+            for w in WINDOWS:
+                self.window_quantity[w] = np.append(self.window_quantity[w], 0)
+                self.window_sales[w] = np.append(self.window_sales[w], 0.0)
+        return i
+
+    def _advance(self, ordinal):
+        # Move the newest day forward to `ordinal`, one day at a time
+        if self.day is None or ordinal - self.day >= RING_DAYS:
+            self._reset(self.items, ordinal)  # Every buffered day has left every window
+            return
+        while self.day < ordinal:
+            self.day += 1
+            for w in WINDOWS:
+                leaving = (self.day - w) % RING_DAYS  # Day that just dropped out of the w-day window
+                self.window_quantity[w] -= self.quantity[leaving]
+                self.window_sales[w] -= self.sales[leaving]
+            slot = self.day % RING_DAYS  # Held the day RING_DAYS ago, already subtracted above
+            self.quantity[slot] = 0
+            self.sales[slot] = 0
+
+    def _add(self, ordinal, menuitem, quantity, sales_gbp):
+        # Apply one sale line; lines older than the ring are ignored
+        if self.day is None or ordinal > self.day:
+            self._advance(ordinal)
+        age = self.day - ordinal
+        if age >= RING_DAYS:
+            return
+        i = self._column(menuitem)
+        self.quantity[ordinal % RING_DAYS, i] += quantity
+        self.sales[ordinal % RING_DAYS, i] += sales_gbp
+        for w in WINDOWS:
+            if age < w:
+                self.window_quantity[w][i] += quantity
+                self.window_sales[w][i] += sales_gbp
+
+    def seed(self, lines, events=()):
+        # Rebuild from the store (date, menuitem, quantity_sold, total_sales_gbp lines) plus journaled events
+        ordinals = np.array([Date.fromisoformat(d).toordinal() for d in lines["date"]], dtype=np.int64)
+        with self._lock:
+            newest = int(ordinals.max()) if len(ordinals) else None
+            recent = ordinals > newest - RING_DAYS if newest is not None else ordinals.astype(bool)
+            lines, ordinals = lines[recent], ordinals[recent]
+            self._reset(sorted(lines["menuitem"].unique()), newest)
+            columns = lines["menuitem"].map(self._index).to_numpy(dtype=np.int64)
+            quantity = lines["quantity_sold"].to_numpy(dtype=np.int64)
+            sales = lines["total_sales_gbp"].to_numpy(dtype=float)
+            np.add.at(self.quantity, (ordinals % RING_DAYS, columns), quantity)
+            np.add.at(self.sales, (ordinals % RING_DAYS, columns), sales)
+            for w in WINDOWS:
+                inside = newest - ordinals < w if newest is not None else recent
+                self.window_quantity[w] = np.bincount(columns[inside], quantity[inside], len(self.items)).astype(np.int64)
+                self.window_sales[w] = np.bincount(columns[inside], sales[inside], len(self.items))
+            for event in events:
+                self._add(Date.fromisoformat(event["date"]).toordinal(), event["menuitem"],
+                          event["quantity_sold"], event["total_sales_gbp"])
+            self.version += 1
+
+    def _read_events(self):
+        # Sale events for the seeded sales journaled since the last read (only complete lines)
+        path = events_path(self.root)
+        if not os.path.exists(path):
+            return []
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_ino != self._journal:
+                return []  # Rewritten since the check; the next call replays it from the start
+            f.seek(self._events_read)
+            data = f.read()
+        data = data[:data.rfind(b"\n") + 1]
+        self._events_read += len(data)
+        events = (json.loads(line) for line in data.splitlines() if line.strip())
+        return [event for event in events if applies(event, self._sales)]
+
+    def ensure_current(self):
+        # Re-seed when a new snapshot changed the sales, then apply new sale events
+        with self._update, snapshots.using_root(self.root):
+            version = data_version("sales.json", SALES_ROLLUP_FILE)
+            path = events_path(self.root)
+            journal = os.stat(path).st_ino if os.path.exists(path) else None
+            if version != self._seeded or journal != self._journal:  # Replay the journal from the start
+                self._events_read = 0
+                self._sales = sales_version(root=self.root)
+                self._journal = journal
+                self.seed(day_lines(), self._read_events())
+                self._seeded = version
+                return
+            events = self._read_events()
+            if events:
+                with self._lock:
+                    for event in events:
+                        self._add(Date.fromisoformat(event["date"]).toordinal(), event["menuitem"],
+                                  event["quantity_sold"], event["total_sales_gbp"])
+                    self.version += 1
+
+    def window(self, days):
+        # (daily totals, per-item totals) for the last `days` days up to the newest day with sales,
+        # as of the last ensure_current() (callers check once, then read as many windows as they need)
+        if days not in WINDOWS:
+            raise ValueError(f"Unknown window {days!r}; choose one of {list(WINDOWS)}")
+        with self._lock:
+            if self.day is None:
+                return (pd.DataFrame({"date": pd.to_datetime([]), "total_sales_gbp": pd.Series(dtype=float)}),
+                        pd.DataFrame({"menuitem": pd.Series(dtype=str), "quantity_sold": pd.Series(dtype=np.int64),
+                                      "total_sales_gbp": pd.Series(dtype=float)}))
+            ordinals = np.arange(self.day - days + 1, self.day + 1)
+            df_trend = pd.DataFrame({
+                "date": pd.to_datetime([Date.fromordinal(int(o)) for o in ordinals]),
+                "total_sales_gbp": self.sales[ordinals % RING_DAYS].sum(axis=1).round(2),
+            })
+            df_items = pd.DataFrame({
+                "menuitem": self.items,
+                "quantity_sold": self.window_quantity[days].copy(),
+                "total_sales_gbp": self.window_sales[days].round(2),
+            })
+        return df_trend, df_items[df_items["quantity_sold"] > 0].reset_index(drop=True)
+
+    def summary(self):
+        # One row per window: its dates, items sold, sales and best-selling item (as of ensure_current())
+        with self._lock:
+            rows = []
+            for w in WINDOWS:
+                quantity = self.window_quantity[w]
+                rows.append({
+                    "window": f"Last {w} days",
+                    "from": Date.fromordinal(self.day - w + 1).isoformat() if self.day is not None else "",
+                    "to": Date.fromordinal(self.day).isoformat() if self.day is not None else "",
+                    "items_sold": int(quantity.sum()),
+                    "sales_gbp": round(float(self.window_sales[w].sum()), 2),
+                    "top_item": self.items[int(quantity.argmax())] if quantity.any() else "",
+                })
+        return pd.DataFrame(rows)
+
+_windows = {}                    # Site root -> SalesWindows
+_windows_lock = threading.Lock()  # Protects _windows
+
+def site_windows(root=None):
+    # Rolling sales windows of a site (the current one by default)
+    root = root or snapshots.default_root()
+    with _windows_lock:
+        if root not in _windows:
+            _windows[root] = SalesWindows(root)
+        return _windows[root]
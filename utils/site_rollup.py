@@ -0,0 +1,54 @@
+import multiprocessing  # Import multiprocessing for the spawn start method
+import os    # Import os for file paths and the CPU count
+from concurrent.futures import ProcessPoolExecutor  # One worker process per site partition
+from datetime import datetime  # Import datetime for the forecast window
+import numpy as np   # Import NumPy to truncate predicted quantities
+import pandas as pd  # Import pandas to merge the per-site results
+from utils import sites, snapshots  # Site partitions and their pinned snapshots
+from utils.waste_cube import waste_cube  # Per-site waste totals
+from utils.retention import sales_lines  # Per-site sale lines across the detail and rollup tiers
+from utils.feature_store import feature_table, expected_demand  # Per-site demand features and the shared demand model
+
+FORECAST_DAYS = 7  # Days of forecast demand in the rollup
+COLUMNS = ["site", "sales_gbp", "items_sold", "wasted_items", "waste_loss_gbp", "forecast_demand"]
+
+def _summarize(site):
+    # Totals for one site, computed from its current snapshot
+    lines = sales_lines()  # Detail days plus the rollup tiers, so compacted history still counts
+    cube = waste_cube().cube
+    # Forecast demand: predicted quantity per item and day over the next FORECAST_DAYS days, as in
+    # the forecast export (items that never sold count as 0)
+    features = feature_table()
+    today = pd.Timestamp(datetime.now().date())
+    horizon = features.loc[today:today + pd.Timedelta(days=FORECAST_DAYS - 1)]
+    return {
+        "site": site,
+        "sales_gbp": round(float(lines["total_sales_gbp"].sum()), 2),
+        "items_sold": int(lines["quantity_sold"].sum()),
+        "wasted_items": int(cube["wasted_quantity"].sum()),
+        "waste_loss_gbp": round(float(cube["estimated_loss_gbp"].sum()), 2),
+        "forecast_demand": int(np.nansum(np.trunc(expected_demand(horizon)))),
+    }
+
+def site_summary(site):
+    # Runs in a worker process: pin the site's root and current snapshot, then summarize it
+    return snapshots.call_at(sites.site_root(site), _summarize, site)
+
+def rollup(workers=None):
+    # Sales, waste and forecast demand per site, computed in parallel across site partitions,
+    # plus an "All sites" total row
+    site_list = sites.list_sites()
+    workers = workers or min(len(site_list), os.cpu_count() or 1)
+    if workers <= 1:
+        results = [site_summary(site) for site in site_list]
+    else:
+        # Spawned, not forked: a fork of this multithreaded server could inherit a lock some other
+        # thread holds (data watcher, lane pools, frame caches) and hang on it forever
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            results = list(executor.map(site_summary, site_list))
+    df = pd.DataFrame(results, columns=COLUMNS)
+    total = df.drop(columns="site").sum().to_dict()
+    df.loc[len(df)] = {"site": "All sites", **total}
+    df = df.astype({"items_sold": int, "wasted_items": int, "forecast_demand": int})
+    df["site"] = [sites.site_name(s) if s != "All sites" else s for s in df["site"]]
+    return df.round({"sales_gbp": 2, "waste_loss_gbp": 2})
@@ -0,0 +1,50 @@
+import os  # Import os for site directories and settings
+from utils import snapshots  # Each site is its own snapshot root
+
+# The default site keeps using the data directory itself; other sites live in data/sites/<site>/
+DEFAULT_SITE = os.environ.get("ZEROBITE_DEFAULT_SITE", "hive-kitchen")
+SITES_DIRNAME = "sites"
+SITE_COOKIE = "zerobite_site"  # Cookie holding the site a browser has selected
+
+def sites_dir():
+    return os.path.join(snapshots.DATA_DIR, SITES_DIRNAME)
+
+def list_sites():
+    # Default site first, then every directory under data/sites/
+    directory = sites_dir()
+    others = sorted(
+        name for name in os.listdir(directory)
+        if not name.startswith(".") and os.path.isdir(os.path.join(directory, name))
+    ) if os.path.isdir(directory) else []
+    return [DEFAULT_SITE] + [name for name in others if name != DEFAULT_SITE]
+
+def site_root(site=None):
+    # Data directory of a site (ValueError for unknown sites)
+    site = site or DEFAULT_SITE
+    if site == DEFAULT_SITE:
+        return snapshots.DATA_DIR
+    if site not in list_sites():
+        raise ValueError(f"Unknown site {site!r}")
+    return os.path.join(sites_dir(), site)
+
+def site_name(site):
+    # Display name, e.g. "hive-kitchen" -> "Hive Kitchen"
+    return site.replace("-", " ").replace("_", " ").title()
+
+def current_site():
+    # Site whose data the current callback reads
+    root = snapshots.default_root()
+    for site in list_sites():
+        if site_root(site) == root:
+            return site
+    return DEFAULT_SITE
+
+def site_from_cookies(cookies):
+    # Site selected by a browser, falling back to the default for missing or unknown cookies
+    site = (cookies or {}).get(SITE_COOKIE)
+    return site if site in list_sites() else DEFAULT_SITE
+
+def request_root(request):
+    # Data root for a Gradio/FastAPI request (default site when there is no request)
+    cookies = getattr(request, "cookies", None) if request is not None else None
+    return site_root(site_from_cookies(cookies))
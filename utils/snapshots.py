@@ -0,0 +1,245 @@
+import contextlib  # Import contextlib for the pin/publish context managers
+import contextvars # Import contextvars to pin a snapshot for the duration of a request
+import json        # Import json to read and write manifests and data files
+import os          # Import os for file and directory operations
+import shutil      # Import shutil to remove staging and pruned snapshots
+import tempfile    # Import tempfile for unique staging directories
+import threading   # Import threading to serialize publishes
+import uuid        # Import uuid to make snapshot versions unique
+from datetime import datetime  # Import datetime for time-ordered versions
+
+# Root data directory; the committed JSON files here act as the base before the first snapshot
+DATA_DIR = os.path.abspath(os.environ.get("ZEROBITE_DATA_DIR", os.path.join(os.path.dirname(__file__), "..", "data")))
+SNAPSHOTS_DIRNAME = "snapshots"  # Published snapshots live in <root>/snapshots/<version>/
+CURRENT_FILE = "CURRENT"         # Pointer file holding the published version
+MANIFEST_FILE = "manifest.json"  # Per-snapshot record of which version last wrote each file
+KEEP_SNAPSHOTS = 5               # Older snapshots of each kind (data, cache) are pruned; kept data ones allow rollback
+BASE_VERSION = ""                # Version id of the unversioned base files in the root directory
+DATA_SUFFIXES = (".json", ".bin")  # Data files carried from snapshot to snapshot (e.g. the trend history)
+
+_pinned = contextvars.ContextVar("zerobite_snapshot", default=None)  # (root, version) pinned for this request
+_root = contextvars.ContextVar("zerobite_root", default=None)         # Data root (site) selected for this request
+_publish_lock = threading.Lock()  # One publish at a time so pointer swaps never interleave
+# Held by read-modify-write publishers (sales imports, compaction) so neither overwrites the other
+merge_lock = threading.Lock()
+
+def default_root():
+    # Root used when none is passed: the site selected for this request, else DATA_DIR
+    return _root.get() or DATA_DIR
+
+@contextlib.contextmanager
+def using_root(root):
+    # Make `root` the default data root for the block (e.g. the site a request selected)
+    token = _root.set(root)
+    try:
+        yield root
+    finally:
+        _root.reset(token)
+
+def snapshots_dir(root=None):
+    return os.path.join(root or default_root(), SNAPSHOTS_DIRNAME)
+
+def current_version(root=None):
+    # Version the pointer currently publishes (BASE_VERSION before the first snapshot)
+    try:
+        with open(os.path.join(snapshots_dir(root), CURRENT_FILE), "r", encoding="utf-8") as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return BASE_VERSION
+
+def snapshot_dir(version, root=None):
+    if version == BASE_VERSION:
+        return root or default_root()
+    return os.path.join(snapshots_dir(root), version)
+
+def read_manifest(version, root=None):
+    # {"version", "parent", "created", "files": {name: version that wrote it}, "cache", "base", "restore"}.
+    # Cache snapshots (e.g. a refreshed forecast) only refresh derived files: "base" is the newest
+    # data snapshot in a snapshot's lineage and "restore" is where rolling that data snapshot back goes.
+    if version == BASE_VERSION:
+        return {"version": BASE_VERSION, "parent": None, "files": {}, "cache": False, "base": BASE_VERSION}
+    with open(os.path.join(snapshot_dir(version, root), MANIFEST_FILE), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def file_version(name, version=None, root=None):
+    # Version of the snapshot that last wrote `name`, as seen from `version` (the pinned one by default)
+    version = pinned_version(root) if version is None else version
+    return read_manifest(version, root)["files"].get(name, BASE_VERSION)
+
+def pinned_version(root=None):
+    # Snapshot pinned for this request, or the current one when nothing is pinned
+    pin = _pinned.get()
+    if pin is not None and pin[0] == (root or default_root()):
+        return pin[1]
+    return current_version(root)
+
+@contextlib.contextmanager
+def between_publishes():
+    # Hold off publishes and rollbacks for the block, so the current version cannot change inside it
+    with _publish_lock:
+        yield
+
+@contextlib.contextmanager
+def pinned(root=None):
+    # Read every data file from one snapshot for the duration of the block (nested pins reuse it)
+    root = root or default_root()
+    if _pinned.get() is not None and _pinned.get()[0] == root:
+        yield _pinned.get()[1]
+        return
+    token = _pinned.set((root, current_version(root)))
+    try:
+        yield _pinned.get()[1]
+    finally:
+        _pinned.reset(token)
+
+def call_pinned(fn, *args, **kwargs):
+    # Run fn with the current snapshot pinned (used by the worker lanes for every callback)
+    with pinned():
+        return fn(*args, **kwargs)
+
+def call_at(root, fn, *args, **kwargs):
+    # Run fn with `root` as the default data root and its current snapshot pinned
+    with using_root(root):
+        return call_pinned(fn, *args, **kwargs)
+
+def data_path(name, root=None):
+    # Path of a data file (e.g. "menu.json") in the snapshot pinned for this request
+    return os.path.join(snapshot_dir(pinned_version(root), root), name)
+
+def write_records(path, key, records):
+    # Write {"key": [...]} with one compact record per line: valid JSON and streamable line by line
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{"%s":[' % key)
+        for i, record in enumerate(records):
+            f.write(("\n" if i == 0 else ",\n") + json.dumps(record, separators=(",", ":")))
+        f.write("\n]}\n")
+
+def iter_records(path, key):
+    # Yield the records of a data file one at a time. Files in the write_records layout are read
+    # line by line in constant memory; any other JSON (e.g. hand-edited, pretty-printed files)
+    # falls back to json.load.
+    with open(path, "r", encoding="utf-8") as f:
+        if f.readline().rstrip("\n") == '{"%s":[' % key:
+            for line in f:
+                line = line.rstrip(",\n")
+                if line and line != "]}":
+                    yield json.loads(line)
+            return
+        f.seek(0)
+        yield from json.load(f).get(key, [])
+
+class Staging:
+    # A snapshot being built. Write each changed file to staging.path(name); files that are not
+    # written are carried over from whatever is current when the snapshot is published.
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(snapshots_dir(root), exist_ok=True)
+        self.dir = tempfile.mkdtemp(prefix=".staging-", dir=snapshots_dir(root))
+        self.written = set()
+        self.callbacks = []
+
+    def on_publish(self, fn):
+        # Call fn(version) as the snapshot is published, before readers can see it
+        self.callbacks.append(fn)
+
+    def path(self, name):
+        self.written.add(name)
+        return os.path.join(self.dir, name)
+
+    def write_records(self, name, key, records):
+        write_records(self.path(name), key, records)
+
+def _link_or_copy(src, dst):
+    # Unchanged files are shared between snapshots via hard links (copied if links are unsupported).
+    # Snapshot files are never modified in place, so sharing the inode is safe.
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+def _new_version():
+    return datetime.now().strftime("%Y%m%dT%H%M%S%f") + "-" + uuid.uuid4().hex[:6]
+
+def _swap_pointer(version, root):
+    # Atomically point readers at `version`
+    pointer = os.path.join(snapshots_dir(root), CURRENT_FILE)
+    with open(pointer + ".tmp", "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(pointer + ".tmp", pointer)
+
+def _prune(root):
+    # Drop the oldest snapshots of each kind, never the published one. Cache publishes are counted
+    # separately, so frequent forecast refreshes never push data snapshots (rollback points) out.
+    current = current_version(root)
+    kinds = {}
+    for version in list_versions(root):
+        kinds.setdefault(read_manifest(version, root).get("cache", False), []).append(version)
+    for versions in kinds.values():
+        for version in versions[:-KEEP_SNAPSHOTS]:
+            if version != current:
+                shutil.rmtree(os.path.join(snapshots_dir(root), version), ignore_errors=True)
+
+@contextlib.contextmanager
+def publish(root=None, cache=False):
+    # Stage a new snapshot and publish it atomically when the block exits without error.
+    #   with snapshots.publish(cache=True) as staging:
+    #       snapshots.write_records(staging.path("weather.json"), "weather", records)
+    # Readers keep seeing the previous snapshot until the pointer is swapped. Pass cache=True for
+    # periodic refreshes of fetched data: they are pruned on their own and skipped by rollback.
+    root = root or default_root()
+    staging = Staging(root)
+    try:
+        yield staging
+        with _publish_lock:
+            parent = current_version(root)
+            parent_dir = snapshot_dir(parent, root)
+            parent_manifest = read_manifest(parent, root)
+            files = dict(parent_manifest["files"])
+            version = _new_version()
+            # Carry over the files this publish didn't write from the latest snapshot
+            for name in os.listdir(parent_dir):
+                if name.endswith(DATA_SUFFIXES) and name != MANIFEST_FILE and name not in staging.written:
+                    _link_or_copy(os.path.join(parent_dir, name), os.path.join(staging.dir, name))
+                    files.setdefault(name, parent)
+            for name in staging.written:
+                files[name] = version
+            manifest = {"version": version, "parent": parent, "created": datetime.now().isoformat(), "files": files, "cache": cache}
+            if cache:
+                manifest["base"] = parent_manifest.get("base", parent)
+            else:
+                manifest["base"] = version
+                manifest["restore"] = parent_manifest.get("base", parent)  # Cache snapshots in between are skipped
+            with open(os.path.join(staging.dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+                json.dump(manifest, f, indent=2)
+            for fn in staging.callbacks:
+                fn(version)
+            os.rename(staging.dir, os.path.join(snapshots_dir(root), version))
+            _swap_pointer(version, root)
+            _prune(root)
+    finally:
+        shutil.rmtree(staging.dir, ignore_errors=True)
+
+def list_versions(root=None):
+    # Published snapshot versions, oldest first
+    directory = snapshots_dir(root)
+    if not os.path.isdir(directory):
+        return []
+    return sorted(v for v in os.listdir(directory) if not v.startswith(".") and os.path.isdir(os.path.join(directory, v)))
+
+def rollback(root=None):
+    # Undo the newest data publish by pointing back at the data snapshot it was built on; cache
+    # publishes since then are undone with it (the forecast refresher fetches again when stale).
+    # Returns the version now current.
+    root = root or default_root()
+    with _publish_lock:
+        current = current_version(root)
+        base = read_manifest(current, root).get("base", current)
+        manifest = read_manifest(base, root)
+        parent = manifest.get("restore", manifest["parent"])
+        if parent is None or (parent != BASE_VERSION and parent not in list_versions(root)):
+            raise ValueError("No earlier snapshot to roll back to")
+        if parent == BASE_VERSION:
+            os.remove(os.path.join(snapshots_dir(root), CURRENT_FILE))
+        else:
+            _swap_pointer(parent, root)
+        return parent
@@ -0,0 +1,108 @@
+import json       # Import json to read the store
+import os         # Import os for file path operations
+import threading  # Import threading to guard the ledger
+from datetime import datetime  # Import datetime to timestamp sale events
+from utils import snapshots    # Seed from the pinned data snapshot
+from utils.data_watcher import data_version  # Re-seed only when menu or sales change
+from utils.retention import day_lines, SALES_ROLLUP_FILE  # Day-level sales survive compaction as the daily tier
+from utils.sale_events import append_event, load_events  # Live POS sales not in sales.json yet, replayed on every re-seed
+
+class StockLedger:
+    # Remaining stock keyed by (date, menuitem) for one site: seeded from menu available_stock
+    # minus the sales in the store, then decremented per sale event in O(1).
+    def __init__(self, root):
+        self.root = root
+        self._days = {}     # date -> {menuitem: {"price", "available", "sold"}}
+        self._lock = threading.Lock()
+        self._seeded = None # data_version() of menu/sales the ledger was built from
+        self.version = 0    # Bumped on every change so pages can skip unchanged refreshes
+
+    def _apply(self, date, menuitem, quantity):
+        entry = self._days.get(date, {}).get(menuitem)
+        if entry is None:
+            return None
+        entry["sold"] += quantity
+        return entry
+
+    def seed(self, menu, sales, events=()):
+        # Rebuild from the store: one pass over menu entries, sale lines (DataFrame of date, menuitem,
+        # quantity_sold) and journaled events
+        days = {}
+        for item in menu:
+            entry = days.setdefault(item.get("prepared_date"), {}).setdefault(
+                item["menuitem"], {"price": 0.0, "available": 0, "sold": 0}
+            )
+            entry["price"] = float(item.get("price", 0))
+            entry["available"] += item.get("available_stock", 0)
+        with self._lock:
+            self._days = days
+            for date, menuitem, quantity in zip(sales["date"], sales["menuitem"], sales["quantity_sold"]):
+                self._apply(date, menuitem, int(quantity))
+            for event in events:
+                self._apply(event["date"], event["menuitem"], event["quantity_sold"])
+            self.version += 1
+
+    def ensure_current(self):
+        # Re-seed when a new snapshot changed the menu or the sales (detail or rollups)
+        with snapshots.using_root(self.root):
+            version = data_version("menu.json", "sales.json", SALES_ROLLUP_FILE)
+            if version == self._seeded:
+                return
+            self.seed(_load("menu.json", "menu"), day_lines(), load_events(self.root))
+        self._seeded = version
+
+    def record_sale(self, menuitem, quantity, date=None):
+        # Apply one POS sale and journal it; returns the remaining stock for that item and day
+        date = date or datetime.now().strftime("%Y-%m-%d")
+        self.ensure_current()
+        with self._lock:
+            entry = self._days.get(date, {}).get(menuitem)
+            if entry is None:
+                raise KeyError(f"{menuitem} is not on the menu for {date}")
+            if quantity <= 0:
+                raise ValueError("Quantity must be positive")
+            event = {
+                "date": date,
+                "menuitem": menuitem,
+                "quantity_sold": quantity,
+                "total_sales_gbp": round(quantity * entry["price"], 2),
+                "recorded_at": datetime.now().isoformat(timespec="seconds")
+            }
+            append_event(event, self.root)
+            self._apply(date, menuitem, quantity)
+            self.version += 1
+            return max(entry["available"] - entry["sold"], 0)
+
+    def business_date(self, today=None):
+        # Latest date with menu entries on or before today (today itself when it has a menu)
+        today = today or datetime.now().strftime("%Y-%m-%d")
+        self.ensure_current()
+        with self._lock:
+            return max((d for d in self._days if d and d <= today), default=None)
+
+    def remaining(self, date):
+        # Rows for one day, O(items prepared that day)
+        self.ensure_current()
+        with self._lock:
+            return [
+                {"MenuItem": menuitem, "Price": e["price"], "RemainingStock": max(e["available"] - e["sold"], 0)}
+                for menuitem, e in self._days.get(date, {}).items()
+            ]
+
+def _load(name, key):
+    path = snapshots.data_path(name)
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f).get(key, [])
+
+_ledgers = {}                    # Site root -> StockLedger
+_ledgers_lock = threading.Lock()  # Protects _ledgers
+
+def site_ledger(root=None):
+    # Ledger shared by the Current Day Sales page and the sale event API for a site (the current one by default)
+    root = root or snapshots.default_root()
+    with _ledgers_lock:
+        if root not in _ledgers:
+            _ledgers[root] = StockLedger(root)
+        return _ledgers[root]
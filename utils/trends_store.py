@@ -0,0 +1,152 @@
+import json       # Import json for the item dictionary and trends.json
+import os         # Import os for file path operations
+from datetime import date  # Import date to encode days as ordinals
+import numpy as np   # Import NumPy for the fixed-width records and windowed reads
+import pandas as pd  # Import pandas for query results
+from utils import snapshots  # History is a file of each data snapshot, published with trends.json
+
+# Trend history per site: fixed-width binary records sorted by day plus a dictionary of menu item
+# names. Both are snapshot files written by the same publish as trends.json, so a rollback or a
+# regenerated dataset always reads the history that belongs to its trends.json.
+HISTORY_FILE = "trends_history.bin"
+ITEMS_FILE = "trends_items.json"
+TRENDS_FILE = "trends.json"
+PLATFORMS = ["facebook", "instagram", "tiktok", "twitter"]
+STATUSES = ["Trending", "Non-Trending", "Similar"]  # Status codes are indexes into this list
+RECORD = np.dtype([
+    ("day", "<i4"),                          # date.toordinal()
+    ("item", "<i4"),                         # Index into the item dictionary
+    ("status", "u1", (len(PLATFORMS),)),     # Status code per platform
+    ("score", "u1", (len(PLATFORMS),)),      # Score (0-100) per platform
+])
+MAX_CACHED_ITEMS = 32  # Item dictionaries kept in memory (one per snapshot read)
+
+_items_cache = {}  # path -> ((mtime, size), [item names])
+
+def history_path(root=None):
+    # History file of the pinned snapshot
+    return snapshots.data_path(HISTORY_FILE, root)
+
+def _snapshot(root=None):
+    # Directory of the pinned snapshot
+    return os.path.dirname(history_path(root))
+
+def _trend_rows(directory):
+    path = os.path.join(directory, TRENDS_FILE)
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f).get("trends", [])
+
+def _encode(trends, names):
+    # Trend rows ({"menuitem", "date", "<platform>_status", "<platform>_score"}) as records, adding
+    # unknown items to the end of `names`, so existing codes never change
+    names = list(names)
+    codes = {name: i for i, name in enumerate(names)}
+    for row in trends:
+        if row["menuitem"] not in codes:
+            codes[row["menuitem"]] = len(names)
+            names.append(row["menuitem"])
+    records = np.zeros(len(trends), dtype=RECORD)
+    records["day"] = [date.fromisoformat(row["date"]).toordinal() for row in trends]
+    records["item"] = [codes[row["menuitem"]] for row in trends]
+    records["status"] = [[STATUSES.index(row[f"{p}_status"]) for p in PLATFORMS] for row in trends]
+    records["score"] = [[row[f"{p}_score"] for p in PLATFORMS] for row in trends]
+    return records[np.argsort(records["day"], kind="stable")], names
+
+def _items(directory):
+    # Item dictionary (code -> name) of a snapshot; snapshots older than the history use trends.json
+    path = os.path.join(directory, ITEMS_FILE)
+    if not os.path.exists(path):
+        return _encode(_trend_rows(directory), [])[1]
+    stat = os.stat(path)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    cached = _items_cache.get(path)
+    if cached is None or cached[0] != stamp:
+        with open(path, "r", encoding="utf-8") as f:
+            cached = (stamp, json.load(f))
+        if len(_items_cache) >= MAX_CACHED_ITEMS:
+            _items_cache.clear()
+        _items_cache[path] = cached
+    return cached[1]
+
+def _records(directory):
+    # Memory-mapped view of a snapshot's history (nothing is read until it is sliced); snapshots
+    # published before the history existed hold trends.json's rows only
+    path = os.path.join(directory, HISTORY_FILE)
+    if not os.path.exists(path):
+        return _encode(_trend_rows(directory), [])[0]
+    count = os.path.getsize(path) // RECORD.itemsize
+    if count == 0:
+        return np.zeros(0, dtype=RECORD)
+    return np.memmap(path, dtype=RECORD, mode="r", shape=(count,))
+
+def items(root=None):
+    # Item dictionary (code -> name) of the pinned snapshot
+    return _items(_snapshot(root))
+
+def stage(staging, trends):
+    # Call while staging a snapshot that writes trends.json: as it publishes, its history becomes
+    # the history of the snapshot it replaces plus `trends`. Rows for a day already stored
+    # supersede the earlier ones, whatever order the days arrive in.
+    history_file, items_file = staging.path(HISTORY_FILE), staging.path(ITEMS_FILE)
+
+    def fold(version):
+        parent = snapshots.snapshot_dir(snapshots.current_version(staging.root), staging.root)
+        records, names = _encode(trends, _items(parent))
+        records = np.concatenate([_records(parent), records])
+        with open(history_file, "wb") as f:
+            f.write(records[np.argsort(records["day"], kind="stable")].tobytes())
+        with open(items_file, "w", encoding="utf-8") as f:
+            json.dump(names, f)
+
+    staging.on_publish(fold)
+
+def window(days=7, end=None, root=None):
+    # Records for the `days` days ending at `end` (default: latest stored day), latest row per
+    # (day, item). Two binary searches on the day column; only the window is read from disk.
+    records = _records(_snapshot(root))
+    if len(records) == 0:
+        return records
+    last = date.fromisoformat(end).toordinal() if end else int(records["day"][-1])
+    day_column = records["day"]
+    lo = np.searchsorted(day_column, last - days + 1, side="left")
+    hi = np.searchsorted(day_column, last, side="right")
+    chunk = np.array(records[lo:hi])
+    # Keep the last occurrence of each (day, item) when a day was generated more than once
+    keys = chunk["day"].astype(np.int64) * (1 << 32) + chunk["item"]
+    _, last_index = np.unique(keys[::-1], return_index=True)
+    return chunk[np.sort(len(chunk) - 1 - last_index)]
+
+def latest(root=None):
+    # Rows for the latest day in the same shape as trends.json
+    chunk = window(1, root=root)
+    names = items(root)
+    rows = []
+    for record in chunk:
+        row = {"menuitem": names[record["item"]], "date": date.fromordinal(int(record["day"])).isoformat()}
+        for i, platform in enumerate(PLATFORMS):
+            row[f"{platform}_status"] = STATUSES[record["status"][i]]
+            row[f"{platform}_score"] = int(record["score"][i])
+        rows.append(row)
+    return rows
+
+def moving_summary(days=7, end=None, root=None):
+    # Per menu item and platform: mean score and number of days Trending over the window
+    chunk = window(days, end, root)
+    names = items(root)
+    columns = ["menuitem"] + [f"{p}_{m}" for p in PLATFORMS for m in ("avg_score", "days_trending")]
+    if len(chunk) == 0:
+        return pd.DataFrame(columns=columns + ["days"])
+    frame = pd.DataFrame({"item": chunk["item"], "day": chunk["day"]})
+    trending = chunk["status"] == STATUSES.index("Trending")
+    for i, platform in enumerate(PLATFORMS):
+        frame[f"{platform}_avg_score"] = chunk["score"][:, i].astype(float)
+        frame[f"{platform}_days_trending"] = trending[:, i].astype(int)
+    summary = frame.groupby("item").agg(
+        {**{c: "mean" for c in columns if c.endswith("avg_score")},
+         **{c: "sum" for c in columns if c.endswith("days_trending")},
+         "day": "nunique"}
+    ).rename(columns={"day": "days"})
+    summary.insert(0, "menuitem", [names[i] for i in summary.index])
+    return summary.round(1).reset_index(drop=True)
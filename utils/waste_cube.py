@@ -0,0 +1,81 @@
+import json       # Import json to read leftover and menu data
+import os         # Import os for file path operations
+import threading  # Import threading to guard the cached cube
+import pandas as pd  # Import pandas for the cube
+from utils import snapshots  # Read leftover and prices from the pinned data snapshot
+from utils.data_watcher import data_version  # Rebuild the cube only when leftover or prices change
+from utils.retention import leftover_rows, LEFTOVER_ROLLUP_FILE, PERIOD_LABELS  # Leftover across the detail and rollup tiers
+
+MEASURES = ["sold_quantity", "wasted_quantity", "estimated_loss_gbp"]
+
+_cubes = {}               # Site root -> (data version, WasteCube)
+_lock = threading.Lock()  # Protects _cubes
+
+def _load(name, key):
+    path = snapshots.data_path(name)
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f).get(key, [])
+
+def price_map(menu):
+    # Menu item -> price (the last menu entry for an item wins)
+    prices = pd.DataFrame(menu, columns=["menuitem", "price"]).drop_duplicates("menuitem", keep="last")
+    return prices.set_index("menuitem")["price"].astype(float)
+
+class WasteCube:
+    # Leftover rows priced once, plus a (date, menuitem, reason) cube of sold, wasted and loss totals.
+    # Rows older than the detail window are rollup totals dated by their period start ("period": week/month).
+    # Table filters, per-item totals and per-date stacks are all slices of these two frames.
+    def __init__(self, leftover, menu):
+        rows = pd.DataFrame(leftover, columns=["date", "menuitem", "sold_quantity", "wasted_quantity", "reason", "period"])
+        rows["estimated_loss_gbp"] = rows["menuitem"].map(price_map(menu)).fillna(0) * rows["wasted_quantity"]
+        self.rows = rows
+        self.cube = rows.groupby(["date", "menuitem", "reason"], sort=True)[MEASURES].sum()
+        self.dates = sorted(rows["date"].dropna().unique())
+
+    def _mask(self, items, reasons, dates, filter_text, date):
+        # Match the filter text against the distinct items/reasons once, then select by membership
+        mask = pd.Series(True, index=items.index)
+        if filter_text:
+            unique_items = pd.Series(items.unique())
+            unique_reasons = pd.Series(reasons.dropna().unique())
+            matched_items = unique_items[unique_items.str.contains(filter_text, case=False, regex=False)]
+            matched_reasons = unique_reasons[unique_reasons.str.contains(filter_text, case=False, regex=False)]
+            mask &= items.isin(matched_items) | reasons.isin(matched_reasons)
+        if date:
+            mask &= dates == date
+        return mask
+
+    def filter_rows(self, filter_text="", date=None):
+        # Leftover rows matching the menu item/reason text and the date
+        rows = self.rows
+        return rows[self._mask(rows["menuitem"], rows["reason"], rows["date"], filter_text, date)]
+
+    def slice(self, filter_text="", date=None):
+        # Cube cells matching the same filters
+        index = self.cube.index.to_frame(index=False)
+        mask = self._mask(index["menuitem"], index["reason"], index["date"], filter_text, date)
+        return self.cube[mask.to_numpy()]
+
+    def per_item(self, filter_text="", date=None):
+        # Sold and wasted quantity per menu item
+        return self.slice(filter_text, date).groupby(level="menuitem")[["sold_quantity", "wasted_quantity"]].sum()
+
+    def per_date(self, filter_text="", date=None):
+        # Estimated loss per date (rows) and menu item (columns)
+        return self.slice(filter_text, date)["estimated_loss_gbp"].groupby(level=["date", "menuitem"]).sum().unstack(fill_value=0)
+
+def waste_cube():
+    # Cube for the current site's pinned snapshot; rebuilt only after leftover, its rollups or menu.json change
+    root = snapshots.default_root()
+    version = data_version("leftover.json", LEFTOVER_ROLLUP_FILE, "menu.json")
+    with _lock:
+        cached = _cubes.get(root)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+    leftover = leftover_rows()
+    cube = WasteCube(leftover.assign(period=leftover["tier"].map(PERIOD_LABELS)), _load("menu.json", "menu"))
+    with _lock:
+        _cubes[root] = (version, cube)
+    return cube
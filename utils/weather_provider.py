@@ -0,0 +1,160 @@
+import asyncio    # Import asyncio for the background refresher
+import json       # Import json to parse provider responses and the cache metadata
+import logging    # Import logging to report failed background refreshes
+import os         # Import os to read provider settings from the environment
+import random     # Import random for the offline stub provider
+import urllib.parse    # Import urllib to build provider requests
+import urllib.request  # Import urllib to call the provider without extra dependencies
+from datetime import datetime, timedelta  # Import datetime for forecast dates and cache age
+from utils import snapshots  # Forecasts are cached as a published data snapshot
+from utils import sites      # Each site keeps its own forecast cache
+
+WEATHER_FILE = "weather.json"        # Cached forecast read by the weather and prediction pages
+WEATHER_META_FILE = "weather_meta.json"  # {"provider", "fetched_at"} of the cached forecast
+WEATHER_TYPES = ["Sunny", "Rain", "Cloudy", "Thunderstorm", "Snow", "Fog", "Windy"]
+PERIODS = {"Forenoon": range(8, 12), "Afternoon": range(12, 18)}  # Local hours in each period
+FORECAST_DAYS = 14
+
+# Provider selection and cache lifetime, e.g. ZEROBITE_WEATHER_PROVIDER=open-meteo
+WEATHER_PROVIDER = os.environ.get("ZEROBITE_WEATHER_PROVIDER", "stub")
+WEATHER_TTL = int(os.environ.get("ZEROBITE_WEATHER_TTL", str(3 * 60 * 60)))  # Seconds a cached forecast stays fresh
+REFRESH_CHECK_INTERVAL = 60  # Seconds between cache age checks in the background refresher
+
+log = logging.getLogger(__name__)
+
+class WeatherProvider:
+    # Source of forecasts: fetch(days) returns one record per date and period
+    # ({"date", "period", "weather", "temperature", "feels_like"}), oldest first.
+    name = "base"
+
+    def fetch(self, days=FORECAST_DAYS):
+        raise NotImplementedError
+
+class StubProvider(WeatherProvider):
+    # Offline provider: plausible weather, stable for a given date so refreshes don't flicker
+    name = "stub"
+
+    def fetch(self, days=FORECAST_DAYS):
+        today = datetime.now()
+        records = []
+        for i in range(days):
+            date = (today + timedelta(days=i)).strftime("%Y-%m-%d")
+            for period in PERIODS:
+                rng = random.Random(f"{date}:{period}")
+                weather = rng.choice(WEATHER_TYPES)
+                temp = round(rng.uniform(10, 35), 1) if weather != "Snow" else round(rng.uniform(-5, 5), 1)
+                records.append({
+                    "date": date,
+                    "period": period,
+                    "weather": weather,
+                    "temperature": temp,
+                    "feels_like": round(temp + rng.uniform(-2, 2), 1)
+                })
+        return records
+
+class OpenMeteoProvider(WeatherProvider):
+    # Free Open-Meteo forecast API (no key); location from ZEROBITE_WEATHER_LAT / ZEROBITE_WEATHER_LON
+    name = "open-meteo"
+    URL = "https://api.open-meteo.com/v1/forecast"
+
+    def __init__(self, latitude=None, longitude=None, timeout=10):
+        self.latitude = latitude or float(os.environ.get("ZEROBITE_WEATHER_LAT", "51.5074"))
+        self.longitude = longitude or float(os.environ.get("ZEROBITE_WEATHER_LON", "-0.1278"))
+        self.timeout = timeout
+
+    @staticmethod
+    def _weather_type(code, wind):
+        # WMO weather code -> the app's weather types
+        if code >= 95:
+            return "Thunderstorm"
+        if code in (71, 73, 75, 77, 85, 86):
+            return "Snow"
+        if code >= 51:
+            return "Rain"
+        if code in (45, 48):
+            return "Fog"
+        if wind >= 40:
+            return "Windy"
+        return "Sunny" if code <= 1 else "Cloudy"
+
+    def fetch(self, days=FORECAST_DAYS):
+        query = urllib.parse.urlencode({
+            "latitude": self.latitude,
+            "longitude": self.longitude,
+            "hourly": "temperature_2m,apparent_temperature,weathercode,windspeed_10m",
+            "forecast_days": min(days, 16),
+            "timezone": "auto",
+        })
+        with urllib.request.urlopen(f"{self.URL}?{query}", timeout=self.timeout) as response:
+            hourly = json.load(response)["hourly"]
+        # Average each period's hours; the period's weather is its most severe hourly code
+        buckets = {}
+        for i, stamp in enumerate(hourly["time"]):
+            moment = datetime.fromisoformat(stamp)
+            for period, hours in PERIODS.items():
+                if moment.hour in hours:
+                    buckets.setdefault((moment.strftime("%Y-%m-%d"), period), []).append(i)
+        records = []
+        for (date, period), indexes in sorted(buckets.items(), key=lambda kv: (kv[0][0], list(PERIODS).index(kv[0][1]))):
+            mean = lambda key: round(sum(hourly[key][i] for i in indexes) / len(indexes), 1)
+            records.append({
+                "date": date,
+                "period": period,
+                "weather": self._weather_type(max(hourly["weathercode"][i] for i in indexes), max(hourly["windspeed_10m"][i] for i in indexes)),
+                "temperature": mean("temperature_2m"),
+                "feels_like": mean("apparent_temperature")
+            })
+        return records
+
+PROVIDERS = {provider.name: provider for provider in (StubProvider, OpenMeteoProvider)}
+
+def get_provider(name=None):
+    name = name or WEATHER_PROVIDER
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown weather provider {name!r}; choose one of {sorted(PROVIDERS)}")
+    return PROVIDERS[name]()
+
+def publish_forecast(records, provider_name):
+    # Cache a forecast and when it was fetched in one cache snapshot (kept out of the rollback
+    # rotation); returns the cache metadata written
+    info = {"provider": provider_name, "fetched_at": datetime.now().isoformat(timespec="seconds")}
+    with snapshots.publish(cache=True) as staging:
+        staging.write_records(WEATHER_FILE, "weather", records)
+        with open(staging.path(WEATHER_META_FILE), "w", encoding="utf-8") as f:
+            json.dump(info, f)
+    return info
+
+def cache_info():
+    # Metadata of the cached forecast in the pinned snapshot ({} before the first fetch)
+    path = snapshots.data_path(WEATHER_META_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def is_stale(ttl=None):
+    fetched_at = cache_info().get("fetched_at")
+    if fetched_at is None:
+        return True
+    age = datetime.now() - datetime.fromisoformat(fetched_at)
+    return age.total_seconds() >= (WEATHER_TTL if ttl is None else ttl)
+
+def refresh(provider=None, force=False):
+    # Fetch and cache a new forecast when the cached one has expired. Returns (records, cache
+    # metadata) of what it published, or None when the cache was still fresh; callers running with
+    # a pinned snapshot use these, since their pin still shows the previous forecast.
+    if not force and not is_stale():
+        return None
+    provider = provider or get_provider()
+    records = provider.fetch(FORECAST_DAYS)
+    return records, publish_forecast(records, provider.name)
+
+async def run_refresher(interval=REFRESH_CHECK_INTERVAL):
+    # Keep every site's cache fresh in the background; fetches run in a thread so the event loop never blocks
+    while True:
+        for site in sites.list_sites():
+            try:
+                await asyncio.to_thread(snapshots.call_at, sites.site_root(site), refresh)
+            except Exception as e:  # Provider down or offline: keep serving the cached forecast
+                log.warning("Weather refresh failed for %s: %s", site, e)
+        await asyncio.sleep(interval)
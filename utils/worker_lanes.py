@@ -0,0 +1,130 @@
+import asyncio    # Import asyncio to hand work off to the lane executors
+import functools  # Import functools to build the wrappers
+import inspect    # Import inspect to rewrite handler signatures for Gradio
+import os         # Import os to read lane sizes from the environment
+import threading  # Import threading for the per-job cancel flag
+from collections import OrderedDict  # Newest call per session, oldest sessions dropped first
+from concurrent.futures import ThreadPoolExecutor  # Separate thread pool per lane
+import gradio as gr  # Import Gradio for progress reporting
+from utils.snapshots import call_at  # Each callback reads one consistent data snapshot of its site
+from utils.sites import request_root  # Site selected by the browser that triggered the event
+from utils.metrics import record_superseded  # Count the calls last-writer-wins skipped
+
+# Number of worker threads (and queue slots) for each lane
+INTERACTIVE_WORKERS = int(os.environ.get("ZEROBITE_INTERACTIVE_WORKERS", "8"))
+HEAVY_WORKERS = int(os.environ.get("ZEROBITE_HEAVY_WORKERS", "2"))
+# Quiet time a filter query waits for before running; a newer query from the session supersedes it
+DEBOUNCE_SECONDS = float(os.environ.get("ZEROBITE_DEBOUNCE_MS", "300")) / 1000
+MAX_TRACKED_SESSIONS = 10000  # (session, group) sequence numbers kept for last-writer-wins
+
+# Executors: a long heavy job can only ever occupy heavy threads
+_interactive_pool = ThreadPoolExecutor(max_workers=INTERACTIVE_WORKERS, thread_name_prefix="interactive")
+_heavy_pool = ThreadPoolExecutor(max_workers=HEAVY_WORKERS, thread_name_prefix="heavy")
+
+# Keyword arguments for Gradio event listeners in each lane, e.g. btn.click(fn, ..., **HEAVY_LANE)
+INTERACTIVE_LANE = {"concurrency_limit": INTERACTIVE_WORKERS, "concurrency_id": "interactive"}
+HEAVY_LANE = {"concurrency_limit": HEAVY_WORKERS, "concurrency_id": "heavy"}
+
+_latest = OrderedDict()         # (session hash, group) -> sequence number of the newest call
+_latest_lock = threading.Lock() # Protects _latest
+
+class JobCancelled(BaseException):
+    # Raised inside a heavy job at its next progress checkpoint once the user cancels it.
+    # Derives from BaseException (like asyncio.CancelledError) so `except Exception` blocks let it through.
+    pass
+
+def _with_request(wrapper, fn, params):
+    # Expose `request: gr.Request` as the first parameter so Gradio passes it ahead of the inputs
+    request_param = inspect.Parameter("request", inspect.Parameter.POSITIONAL_OR_KEYWORD, annotation=gr.Request)
+    wrapper.__signature__ = inspect.signature(fn).replace(parameters=[request_param] + params)
+    wrapper.__annotations__ = {**getattr(fn, "__annotations__", {}), "request": gr.Request}
+    return wrapper
+
+def interactive(fn):
+    # Run a cheap filter/paging callback on the interactive executor, pinned to the current
+    # snapshot of the site the browser selected
+    @functools.wraps(fn)
+    async def wrapper(request, *args):
+        loop = asyncio.get_running_loop()
+        root = request_root(request)
+        return await loop.run_in_executor(_interactive_pool, functools.partial(call_at, root, fn, *args))
+    return _with_request(wrapper, fn, list(inspect.signature(fn).parameters.values()))
+
+def _next_call(key):
+    # Register a new call for (session, group) and return its sequence number
+    with _latest_lock:
+        seq = _latest.pop(key, 0) + 1
+        _latest[key] = seq  # Re-inserted last, so the oldest sessions are dropped first
+        if len(_latest) > MAX_TRACKED_SESSIONS:
+            _latest.popitem(last=False)
+        return seq
+
+def _last_call(key):
+    # Sequence number of the newest call registered for (session, group), without registering one
+    with _latest_lock:
+        return _latest.get(key, 0)
+
+def _is_newest(key, seq):
+    with _latest_lock:
+        return _latest.get(key, seq) == seq
+
+def latest(fn, group, outputs, delay=DEBOUNCE_SECONDS, supersede=True):
+    # Interactive callback with server-side debounce and last-writer-wins per browser session.
+    # Every listener that renders the same outputs shares a `group` (e.g. one page's table), so a
+    # filter keystroke, a page change and a refresh all supersede each other. A call first waits
+    # `delay` seconds and returns gr.skip() for its `outputs` if a newer call in the group arrived
+    # meanwhile; a call that was superseded while running is not rendered either, so results never
+    # land out of order. Debounced listeners need trigger_mode="multiple", otherwise the browser
+    # holds back every event while one call of the listener is in flight.
+    # With supersede=False (background ticks) the call never cancels others; it only yields to
+    # calls that arrive while it runs.
+    @functools.wraps(fn)
+    async def wrapper(request, *args):
+        key = (request.session_hash, group)
+        seq = _next_call(key) if supersede else _last_call(key)
+        skip = gr.skip() if outputs == 1 else tuple(gr.skip() for _ in range(outputs))
+        if delay:
+            await asyncio.sleep(delay)
+        if not _is_newest(key, seq):
+            record_superseded(group, "queued")
+            return skip
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(_interactive_pool, functools.partial(call_at, request_root(request), fn, *args))
+        if not _is_newest(key, seq):
+            record_superseded(group, "running")
+            return skip
+        return result
+    return _with_request(wrapper, fn, list(inspect.signature(fn).parameters.values()))
+
+def heavy(fn):
+    # Run a long callback on the heavy executor with progress and cancellation, pinned to the current
+    # snapshot of the browser's site.
+    # If fn accepts a `progress` argument it receives progress(fraction, desc=None), which
+    # forwards to the Gradio progress bar and raises JobCancelled after the event is cancelled.
+    signature = inspect.signature(fn)
+    wants_progress = "progress" in signature.parameters
+    params = [p for p in signature.parameters.values() if p.name != "progress"]
+
+    async def wrapper(request, *args):
+        *inputs, progress = args  # Gradio appends the tracked gr.Progress as the last argument
+        root = request_root(request)
+        cancelled = threading.Event()
+
+        def report(fraction, desc=None):
+            if cancelled.is_set():
+                raise JobCancelled()
+            progress(fraction, desc=desc)
+
+        kwargs = {"progress": report} if wants_progress else {}
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(_heavy_pool, functools.partial(call_at, root, fn, *inputs, **kwargs))
+        try:
+            return await future
+        except asyncio.CancelledError:
+            cancelled.set()  # Stop the worker thread at its next checkpoint
+            raise
+
+    functools.update_wrapper(wrapper, fn)
+    # Expose a trailing `progress=gr.Progress()` parameter so Gradio tracks progress for this event
+    progress_param = inspect.Parameter("progress", inspect.Parameter.POSITIONAL_OR_KEYWORD, default=gr.Progress())
+    return _with_request(wrapper, fn, params + [progress_param])
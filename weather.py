@@ -5,9 +5,13 @@ import random
 from datetime import datetime, timedelta
 import matplotlib.pyplot as plt
 import pandas as pd
+from utils.worker_lanes import heavy, HEAVY_LANE  # Chart regeneration runs on the heavy lane
+from utils.metrics import instrument  # Record latency, errors and row counts for /metrics
+from utils import snapshots  # Weather is published as a new data snapshot
+from utils import weather_provider  # Cached provider forecasts, refreshed in the background
 
-WEATHER_PATH = os.path.join(os.path.dirname(__file__), "data", "weather.json")
-WEATHER_TYPES = ["Sunny", "Rain", "Cloudy", "Thunderstorm", "Snow", "Fog", "Windy"]
+WEATHER_FILE = weather_provider.WEATHER_FILE
+WEATHER_TYPES = weather_provider.WEATHER_TYPES
 
 def generate_weather_data():
     today = datetime.now()
@@ -25,17 +29,31 @@ def generate_weather_data():
                 "temperature": temp,
                 "feels_like": round(feels_like, 1)
             })
-    with open(WEATHER_PATH, "w", encoding="utf-8") as f:
-        json.dump({"weather": weather_data}, f, indent=2)
+    weather_provider.publish_forecast(weather_data, "random")
     return weather_data
 
+@instrument
 def load_weather_data():
-    if not os.path.exists(WEATHER_PATH):
-        return generate_weather_data()
-    with open(WEATHER_PATH, "r", encoding="utf-8") as f:
+    # Read the cached forecast only; the background refresher keeps it current
+    weather_path = snapshots.data_path(WEATHER_FILE)
+    if not os.path.exists(weather_path):
+        return []
+    with open(weather_path, "r", encoding="utf-8") as f:
         return json.load(f)["weather"]
 
+def forecast_status(info=None):
+    info = info or weather_provider.cache_info()
+    if not info:
+        return "No cached forecast yet."
+    return f"Forecast from {info['provider']} fetched at {info['fetched_at']}."
+
 def plot_weather_graph(weather_data):
+    if not weather_data:
+        fig, ax = plt.subplots(figsize=(12, 5))
+        ax.text(0.5, 0.5, "No forecast cached yet", ha="center", va="center", fontsize=12)
+        ax.set_axis_off()
+        plt.close(fig)
+        return fig
     df = pd.DataFrame(weather_data)
     df["date_period"] = df["date"] + " " + df["period"].str[0]
     fig, ax1 = plt.subplots(figsize=(12, 5))
@@ -69,14 +87,24 @@ def weather_page():
         gr.Markdown("## 14-Day Weather Forecast (Forenoon & Afternoon)")
         with gr.Row():
             generate_btn = gr.Button("Generate Random Weather Data")
+            refresh_btn = gr.Button("Refresh Forecast")
             output = gr.Textbox(label="Status", interactive=False)
         weather_plot = gr.Plot(label="Weather Forecast Graph")
+        @instrument
         def on_generate():
             data = generate_weather_data()
             return "Weather data generated for next 14 days.", plot_weather_graph(data)
+        @instrument
+        def on_refresh():
+            # Fetch from the configured provider now instead of waiting for the cache to expire.
+            # Show what was fetched: this handler's pinned snapshot predates the publish.
+            records, info = weather_provider.refresh(force=True)
+            return forecast_status(info), plot_weather_graph(records)
+        @instrument
         def on_load():
             data = load_weather_data()
-            return plot_weather_graph(data)
-        generate_btn.click(fn=on_generate, inputs=[], outputs=[output, weather_plot])
-        demo.load(fn=on_load, inputs=[], outputs=weather_plot)
+            return forecast_status(), plot_weather_graph(data)
+        generate_btn.click(fn=heavy(on_generate), inputs=[], outputs=[output, weather_plot], **HEAVY_LANE)
+        refresh_btn.click(fn=heavy(on_refresh), inputs=[], outputs=[output, weather_plot], **HEAVY_LANE)
+        demo.load(fn=heavy(on_load), inputs=[], outputs=[output, weather_plot], **HEAVY_LANE)
     return demo
\ No newline at end of file